@@ -1,19 +1,49 @@
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, Header, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, PlainTextResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sse_starlette.sse import EventSourceResponse
 from .db import get_db, create_all_tables, create_extensions
 from .services import DataCollectionService
 from .services.agent_flow import run_trip_planner
+from .services.chat_sessions import chat_sessions
+from .services.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, SORTS, clamp_limit, parse_fields, parse_ids
+from .services.geo import MAX_KNN_RADIUS_M, get_geo_index, parse_lat_lng
+from .services.catalog import CATALOG_SNAPSHOT_ENABLED, CatalogSnapshot, catalog_store
+from .services.response_cache import serve_cached, etag_matches, make_etag, ATTRACTIONS_TTL, SEARCH_TTL, NEAR_BY_TTL
+from .services.serialization import dumps, encode_attractions
+from .services.facets import DEFAULT_FACET_LIMIT, parse_facet_filters
+from .services.opening_hours import parse_open_at
+from .services.trending import trending_service
+from .services.export import export_lines, gzip_stream, parse_since, zstd_stream
+from .services.negotiation import choose_encoding, negotiated_response, wants_compact
+from .services.admission import AdmissionRejected, chat_admission, subscription_priority
+from .services.coalesce import coalesce_tokens
+from .services.chat_streams import ChatStream, chat_streams, event_id
+from .services.cancellation import ClientDisconnected, count_cancelled, unless_disconnected
+from .services.metrics import metrics
+from .services.loop_monitor import LOOP_LAG_MONITOR, loop_monitor
+from .services.photos import DEFAULT_PHOTO_VARIANT, PHOTO_MAX_AGE, PHOTO_VARIANTS, PhotoNotFound, get_photo_cache
+from .services.photos import cache_key, photo_reference
 from .models.atractions import Attraction
 import psycopg  
-import json
+import asyncio
+from contextlib import aclosing
+import aiohttp
+from pydantic import BaseModel
+from typing import List, Optional
+from datetime import datetime, timezone
 from .routes.auth import endpoints
+from .routes.feed import endpoints as feed_endpoints
+from .routes.trending import endpoints as trending_endpoints
 from .routes.auth.auth_middleware import TokenRefreshMiddleware
+from .routes.auth.logic import get_optional_user_id
 from .__init__ import logger
 
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 app.include_router(endpoints.router)
+app.include_router(feed_endpoints.router)
+app.include_router(trending_endpoints.router)
 
 app.add_middleware(TokenRefreshMiddleware)
 
@@ -23,6 +53,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
 
@@ -31,11 +62,16 @@ async def on_startup():
     # Run extension + table creation at startup. Be defensive about
     # psycopg prepared-statement / duplicate-index errors which can happen
     # under --reload or when multiple processes race.
+    if LOOP_LAG_MONITOR:
+        loop_monitor.start()
     try:
         logger.info("Creating/Checking tables in DB")
         await create_extensions()
         await create_all_tables()
         logger.info("Finished setting up tables in DB")
+        if CATALOG_SNAPSHOT_ENABLED:
+            catalog_store.schedule_rebuild()
+        await trending_service.start()
     except Exception as e:
         # unwrap __cause__ if SQLAlchemy wrapped the driver error
         cause = getattr(e, "__cause__", None)
@@ -51,69 +87,442 @@ async def on_startup():
 # Initialize data collection service
 data_service = DataCollectionService()
 
+
+async def get_snapshot(db: AsyncSession) -> Optional[CatalogSnapshot]:
+    """In-memory catalog snapshot, or None when CATALOG_SNAPSHOT is disabled (read from the DB instead)."""
+    if not CATALOG_SNAPSHOT_ENABLED:
+        return None
+    return await catalog_store.get(db)
+
+def open_filter_vary(open_now: bool, open_at: Optional[str]) -> Optional[str]:
+    """Response cache key material for open_now, which changes meaning every minute."""
+    if open_now and not open_at:
+        return datetime.now(timezone.utc).strftime("%Y%m%d%H%M")
+    return None
+
 @app.get("/")
 async def root():
     logger.debug("called /")
     return {"message": "NYC Tourist Attractions API"}
 
 @app.get("/attractions")
-async def get_attractions(db: AsyncSession = Depends(get_db)):
-    """Get all attractions from the database"""
+async def get_attractions(
+    request: Request,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    sort: str = "id",
+    fields: Optional[str] = None,
+    type: Optional[str] = None,
+    min_rating: Optional[float] = None,
+    open_now: bool = False,
+    open_at: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Get a page of attractions.
+
+    - sort: id (default), rating or popularity
+    - cursor: X-Next-Cursor header value from the previous page
+    - fields: comma separated projection, e.g. fields=id,location,rating
+    - type / min_rating: optional filters
+    - open_now / open_at (ISO 8601, NYC time if no offset): only attractions open at that time
+    """
     logger.debug("/attractions called")
     try:
-            
-        attractions = await data_service.get_all_attractions(db)
-        return [attraction.__json__() for attraction in attractions]
+        projection = parse_fields(fields, wants_compact(request))
+        if sort not in SORTS:
+            raise ValueError(f"Unknown sort: {sort}")
+        at = parse_open_at(open_now, open_at)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def build():
+        if snapshot is not None:
+            attractions, next_page = snapshot.page(limit, cursor, sort, snapshot.mask(type, min_rating, at))
+        else:
+            attractions, next_page = await data_service.get_attractions_page(
+                db, limit, cursor, sort, projection, place_type=type, min_rating=min_rating
+            )
+        headers = {"X-Next-Cursor": next_page} if next_page else {}
+        return encode_attractions(attractions, projection), headers
+
+    try:
+        # Opening hours are only compiled into the snapshot
+        snapshot = await catalog_store.get(db) if at is not None else await get_snapshot(db)
+        return await serve_cached(
+            request, db, ATTRACTIONS_TTL, build,
+            version=snapshot and snapshot.version,
+            vary=open_filter_vary(open_now, open_at),
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error occured in /attractions: {e}")
         return HTTPException(status_code=401, detail=e)
 
+@app.get("/attractions/facets")
+async def attraction_facets(
+    request: Request,
+    types: Optional[List[str]] = Query(None),
+    primary_type: Optional[List[str]] = Query(None),
+    price_level: Optional[List[str]] = Query(None),
+    rating_band: Optional[List[str]] = Query(None),
+    business_status: Optional[List[str]] = Query(None),
+    vicinity: Optional[List[str]] = Query(None),
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    sort: str = "rating",
+    fields: Optional[str] = None,
+    facet_limit: int = DEFAULT_FACET_LIMIT,
+    open_now: bool = False,
+    open_at: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Filter attractions by category facets and return per-value facet counts.
+
+    Each facet may be repeated or comma separated (values are OR-ed, facets AND-ed).
+    rating_band is one of 4.5+, 4+, 3.5+, 3+. open_now / open_at restrict everything,
+    counts included, to attractions open at that time. The next page cursor is in X-Next-Cursor.
+    """
+    logger.debug("/attractions/facets called")
+    try:
+        projection = parse_fields(fields, wants_compact(request))
+        if sort not in SORTS:
+            raise ValueError(f"Unknown sort: {sort}")
+        filters = parse_facet_filters({
+            "types": types,
+            "primary_type": primary_type,
+            "price_level": price_level,
+            "rating_band": rating_band,
+            "business_status": business_status,
+            "vicinity": vicinity,
+        })
+        at = parse_open_at(open_now, open_at)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    snapshot = await catalog_store.get(db)
+
+    async def build():
+        index = snapshot.facets
+        base = index.from_mask(snapshot.hours.open_at(at)) if at is not None else None
+        rows = index.select(filters, base)
+        attractions, next_page = snapshot.page(limit, cursor, sort, index.to_mask(rows))
+        body = (
+            b'{"total":' + dumps(rows.bit_count())
+            + b',"facets":' + dumps(index.counts(filters, base, limit=facet_limit))
+            + b',"items":' + encode_attractions(attractions, projection)
+            + b"}"
+        )
+        headers = {"X-Next-Cursor": next_page} if next_page else {}
+        return body, headers
+
+    try:
+        return await serve_cached(
+            request, db, ATTRACTIONS_TTL, build,
+            version=snapshot.version,
+            vary=open_filter_vary(open_now, open_at),
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+class BatchRequest(BaseModel):
+    ids: List[int]
+    fields: Optional[str] = None
+
+async def encode_batch(db: AsyncSession, ids: List[int], projection) -> bytes:
+    """Attractions for `ids` in the requested order (unknown ids are skipped)."""
+    snapshot = await get_snapshot(db)
+    if snapshot is not None:
+        attractions = snapshot.get_many(ids)
+    else:
+        attractions = await data_service.get_attractions_by_ids(db, ids, projection)
+    return encode_attractions(attractions, projection)
+
+@app.get("/attractions/batch")
+async def attractions_batch(
+    request: Request,
+    ids: List[str] = Query(...),
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Resolve many attractions by id in one call, e.g. ids=12,7,31 (may be repeated).
+    Results keep the requested order; unknown ids are left out.
+    """
+    logger.debug("/attractions/batch called")
+    try:
+        projection = parse_fields(fields, wants_compact(request))
+        attraction_ids = parse_ids(ids)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def build():
+        return await encode_batch(db, attraction_ids, projection), {}
+
+    snapshot = await get_snapshot(db)
+    return await serve_cached(request, db, ATTRACTIONS_TTL, build, version=snapshot and snapshot.version)
+
+@app.post("/attractions/batch")
+async def attractions_batch_post(request: Request, body: BatchRequest, db: AsyncSession = Depends(get_db)):
+    """POST variant of /attractions/batch for id lists too long for a URL."""
+    logger.debug("POST /attractions/batch called")
+    try:
+        projection = parse_fields(body.fields, wants_compact(request))
+        attraction_ids = parse_ids(body.ids)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return negotiated_response(request, await encode_batch(db, attraction_ids, projection))
+
+
+@app.get("/attractions/export")
+async def export_attractions(request: Request, since: Optional[str] = None):
+    """
+    Stream the whole catalog as NDJSON for offline caching (zstd or gzip compressed
+    when the client accepts it). Pass the final line's "since" back as since= to get
+    only what changed afterwards, including {"op": "delete"} tombstones.
+    """
+    logger.debug("/attractions/export called")
+    try:
+        since = parse_since(since)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    body = export_lines(since)
+    headers = {"Vary": "Accept-Encoding"}
+    encoding = choose_encoding(request.headers.get("accept-encoding"))
+    if encoding == "zstd":
+        body = zstd_stream(body)
+    elif encoding == "gzip":
+        body = gzip_stream(body)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return StreamingResponse(body, media_type="application/x-ndjson", headers=headers)
+
+
 @app.get("/attractions/search")
-async def search_attractions(query: str, db: AsyncSession = Depends(get_db)):
-    """Search attractions by query"""
+async def search_attractions(
+    request: Request,
+    query: str,
+    open_now: bool = False,
+    open_at: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """Search attractions by query, optionally only those open now / at open_at"""
     logger.debug("/attractions/search called")
+    try:
+        at = parse_open_at(open_now, open_at)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
     try:
         query.strip(" ")
         if not query:
             return HTTPException(status_code=401, detail="empty input")
-        attractions = await data_service.search_attractions(db, query)
-        return attractions
+
+        async def build():
+            attractions = await data_service.search_attractions(db, query)
+            trending_service.search_hits.remember(query, [a.id for a in attractions])
+            if at is not None:
+                snapshot = await catalog_store.get(db)
+                open_ids = set(snapshot.ids[snapshot.hours.open_at(at)].tolist())
+                attractions = [a for a in attractions if a.id in open_ids]
+            return encode_attractions(attractions, parse_fields(None, wants_compact(request))), {}
+
+        response = await serve_cached(request, db, SEARCH_TTL, build, vary=open_filter_vary(open_now, open_at))
+        trending_service.record_search(query)
+        return response
     except Exception as e:
         logger.error(f"Error occured in /attractions/search: {e}")
         return HTTPException(status_code=401, detail=e)
 
 
 @app.get("/near_by")
-async def near_by(location: str, distance: int, db: AsyncSession = Depends(get_db)):
-    """Find attractions near a location (legacy endpoint)"""
+async def near_by(
+    request: Request,
+    location: Optional[str] = None,
+    distance: int = 1000,
+    lat: Optional[float] = None,
+    lng: Optional[float] = None,
+    k: Optional[int] = None,
+    type: Optional[str] = None,
+    min_rating: Optional[float] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Find attractions within `distance` meters of a point, nearest first.
+
+    The point is lat/lng, a "lat,lng" location, or the name of a known attraction.
+    With k, the k nearest attractions are returned regardless of distance.
+    Each result carries its distance_m from the point.
+    """
     logger.debug("/near_by called")
-    attractions = await data_service.search_attractions(db, location)
-    return [attraction.__json__() for attraction in attractions]
+    try:
+        projection = parse_fields(fields, wants_compact(request))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if distance <= 0 or distance > MAX_KNN_RADIUS_M:
+        raise HTTPException(status_code=400, detail=f"distance must be between 1 and {MAX_KNN_RADIUS_M} meters")
+
+    snapshot = await get_snapshot(db)
+    if lat is not None and lng is not None:
+        center = (lat, lng)
+    else:
+        center = parse_lat_lng(location)
+    if center is None and location and location.strip():
+        if snapshot is not None:
+            anchor = snapshot.find_by_name(location)
+        else:
+            anchor = await data_service.find_attraction_by_name(db, location)
+        if anchor is not None and anchor.latitude is not None and anchor.longitude is not None:
+            center = (anchor.latitude, anchor.longitude)
+    if center is None:
+        raise HTTPException(status_code=404, detail="Unknown location")
+
+    async def build():
+        index = snapshot.geo if snapshot is not None else await get_geo_index(db)
+        if k:
+            hits = index.nearest(*center, k=min(k, MAX_PAGE_SIZE), place_type=type, min_rating=min_rating)
+        else:
+            hits = index.within(*center, distance, limit=clamp_limit(limit), place_type=type, min_rating=min_rating)
+
+        ids = [i for i, _ in hits]
+        if snapshot is not None:
+            attractions = snapshot.get_many(ids)
+        else:
+            attractions = await data_service.get_attractions_by_ids(db, ids, projection)
+        distances = dict(hits)
+        extras = [{"distance_m": round(distances[a.id], 1)} for a in attractions]
+        return encode_attractions(attractions, projection, extras), {}
+
+    return await serve_cached(request, db, NEAR_BY_TTL, build, version=snapshot and snapshot.version)
+
+
+@app.get("/photos/{attraction_id}/{idx}")
+async def attraction_photo(
+    request: Request,
+    attraction_id: int,
+    idx: int,
+    size: str = DEFAULT_PHOTO_VARIANT,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    The idx-th photo of an attraction, proxied and cached.
+    size: thumb (160px), card (480px, default) or full (1600px wide).
+    """
+    logger.debug("/photos called")
+    snapshot = await get_snapshot(db)
+    if snapshot is not None:
+        attraction = snapshot.get(attraction_id)
+    else:
+        found = await data_service.get_attractions_by_ids(db, [attraction_id], ("photos", "images"))
+        attraction = found[0] if found else None
+    ref = attraction and photo_reference(attraction.photos, attraction.images, idx)
+    if not ref:
+        raise HTTPException(status_code=404, detail="Photo not found")
+
+    if size not in PHOTO_VARIANTS:
+        raise HTTPException(status_code=400, detail=f"Unknown size: {size} (use one of {', '.join(PHOTO_VARIANTS)})")
+
+    # The ETag depends only on the reference and variant, so revalidations never touch the cache or Google
+    headers = {"ETag": make_etag(cache_key(ref, size)), "Cache-Control": f"public, max-age={PHOTO_MAX_AGE}"}
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    try:
+        (body, content_type), _ = await get_photo_cache().get(ref, size)
+    except (PhotoNotFound, aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logger.error(f"Photo fetch failed for attraction {attraction_id}/{idx}: {e}")
+        raise HTTPException(status_code=502, detail="Photo unavailable")
+    return Response(body, media_type=content_type, headers=headers)
 
 
 @app.get("/chat")
-async def chat(query: str):
+async def chat(
+    request: Request,
+    query: Optional[str] = None,
+    timing: bool = False,
+    session_id: Optional[str] = None,
+    user_id: Optional[int] = Depends(get_optional_user_id),
+    last_event_id: Optional[str] = Header(None),
+):
     """
     Multi-agent trip planner chat endpoint with SSE streaming.
     
     Uses two agents working together:
     1. Search Agent - Finds relevant attractions via semantic search
     2. Planner Agent - Creates personalized itineraries using Gemini
+
+    With timing=true a `timing` event with the per-stage latency breakdown
+    is sent right before `complete`.
+
+    Concurrent generations are capped; excess requests queue by subscription
+    level and get a 429 with Retry-After when they cannot be admitted in time.
+    A client that disconnects while queued is dropped right away. While streaming,
+    the generation keeps running for CHAT_STREAM_GRACE seconds (2.5 by default)
+    so a quick reconnect can resume it. After that it is cancelled, which stops
+    the Gemini stream and releases the slot.
+    Token events are coalesced per CHAT_COALESCE_MS / CHAT_COALESCE_BYTES.
+
+    Every event has an SSE id "<stream id>:<seq>". Reconnecting with
+    Last-Event-ID resumes the stream (replayed from its buffer, then live)
+    without running the pipeline again; the query can be omitted then.
+
+    The first event is `session` with a session_id. Passing it back as
+    session_id makes the query a follow-up that revises the previous answer,
+    reusing that session's retrieved attractions (unknown, expired or other
+    users' ids start a new session).
     """
+    resume = chat_streams.resume_point(last_event_id)
+    if resume is not None:
+        stream, last_seq = resume
+        logger.info(f"/chat resuming stream {stream.id} after event {last_seq}")
+        return EventSourceResponse(sse_frames(stream, last_seq))
+
     logger.info(f"/chat called with query: {query}")
     
     if not query or not query.strip():
         raise HTTPException(status_code=400, detail="Query cannot be empty")
-    
-    async def event_generator():
-        try:
-            async for event in run_trip_planner(query.strip()):
-                if isinstance(event, dict):
-                    yield {"data": json.dumps(event)}
-        except Exception as e:
-            logger.error(f"Error in chat endpoint: {e}")
-            yield {"data": json.dumps({"type": "error", "message": str(e), "done": True})}
-    
-    return EventSourceResponse(event_generator())
 
+    try:
+        priority = await subscription_priority(user_id)
+        slot = await unless_disconnected(request, chat_admission.acquire(priority=priority))
+    except AdmissionRejected as e:
+        logger.warning(f"/chat rejected: {e}")
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except ClientDisconnected:
+        count_cancelled("queued")
+        return Response(status_code=499)
+
+    session = chat_sessions.get_or_create(session_id, user_id)
+
+    # The generation runs detached from this connection and holds the slot until it ends;
+    # tokens are coalesced into fewer, larger frames
+    stream = chat_streams.start(
+        coalesce_tokens(run_trip_planner(query.strip(), timing=timing, session=session)),
+        on_done=slot.release,
+    )
+    return EventSourceResponse(sse_frames(stream))
+
+
+async def sse_frames(stream: ChatStream, after_seq: int = -1):
+    """SSE frames for a chat stream's events after `after_seq`."""
+    async with aclosing(stream.follow(after_seq)) as events:
+        async for seq, data in events:
+            yield {"id": event_id(stream.id, seq), "data": data}
+
+
+@app.get("/metrics")
+async def get_metrics(format: str = Query("json", pattern="^(json|prometheus)$")):
+    """
+    Process metrics: chat stage latency histograms (with estimated p50/p95/p99),
+    time to first token and generation throughput. format=prometheus returns the
+    Prometheus text exposition format.
+    """
+    if format == "prometheus":
+        return PlainTextResponse(metrics.prometheus(), media_type="text/plain; version=0.0.4")
+    return metrics.snapshot()
@@ -97,11 +97,55 @@ async def create_embedding_index():
         # Log but don't raise — index creation can be retried next startup.
         logging.exception("Error creating embedding indexes: %s", e)
 
+# Create attraction list indexes (idempotent; uses IF NOT EXISTS SQL)
+async def create_attraction_indexes():
+    try:
+        async with engine.begin() as conn:
+            # Keyset pagination indexes; expressions must match pagination.SORTS
+            await conn.execute(
+                text(
+                    """
+                    CREATE INDEX IF NOT EXISTS attraction_rating_keyset_idx
+                    ON attraction ((COALESCE(rating, 0.0)) DESC, id DESC);
+                    """
+                )
+            )
+            await conn.execute(
+                text(
+                    """
+                    CREATE INDEX IF NOT EXISTS attraction_popularity_keyset_idx
+                    ON attraction ((COALESCE(user_ratings_total, 0)) DESC, id DESC);
+                    """
+                )
+            )
+    except Exception as e:
+        # Log but don't raise — index creation can be retried next startup.
+        logging.exception("Error creating attraction indexes: %s", e)
+
+# Columns added to existing tables after they were first created (create_all never alters tables)
+ADDED_COLUMNS = [
+    ("attraction", "open_intervals", "JSON"),
+    ("attraction", "summary", "TEXT"),
+]
+
+# Add missing columns (idempotent; uses IF NOT EXISTS SQL)
+async def add_missing_columns():
+    try:
+        async with engine.begin() as conn:
+            for table, column, ddl_type in ADDED_COLUMNS:
+                await conn.execute(text(f'ALTER TABLE "{table}" ADD COLUMN IF NOT EXISTS {column} {ddl_type};'))
+    except Exception as e:
+        # Log but don't raise — can be retried next startup.
+        logging.exception("Error adding attraction columns: %s", e)
+
 # Create all tables and indexes (idempotent)
 async def create_all_tables():
     async with engine.begin() as conn:
         # create_all via run_sync to use SQLAlchemy metadata (works with async engine)
         await conn.run_sync(Base.metadata.create_all)
 
+    await add_missing_columns()
+
     # attempt to create indexes (safe to call repeatedly)
     await create_embedding_index()
+    await create_attraction_indexes()
@@ -1,7 +1,7 @@
 from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, JSON, ARRAY, Table, Text, Float
 from sqlalchemy.orm import relationship
 import datetime
-from typing import Optional
+from typing import Iterable, Optional
 from .__init__ import Base
 
 # Try to import Vector from pgvector, fallback to JSON if not available
@@ -15,6 +15,39 @@ except ImportError:
 # Number of dimensions for embeddings
 N_DIM = 256
 
+# Serialized attraction fields, in output order
+JSON_FIELDS = (
+    "id",
+    "location",
+    "description",
+    "address",
+    "latitude",
+    "longitude",
+    "place_id",
+    "types",
+    "primary_type",
+    "rating",
+    "user_ratings_total",
+    "price_level",
+    "website",
+    "phone",
+    "international_phone",
+    "opening_hours",
+    "business_status",
+    "vicinity",
+    "plus_code",
+    "formatted_address",
+    "photos",
+    "videos",
+    "utc_offset",
+    "created",
+    "last_updated",
+    # Legacy fields for backward compatibility
+    "type",
+    "tags",
+    "images",
+)
+
 class Attraction(Base):
     __tablename__ = "attraction"
     id = Column(Integer, primary_key=True, autoincrement=True)
@@ -44,6 +77,8 @@ class Attraction(Base):
     # Business hours
     opening_hours = Column(JSON, nullable = True)  # Store opening hours as JSON
     business_status = Column(String, nullable = True)  # OPERATIONAL, CLOSED_TEMPORARILY, etc.
+    open_intervals = Column(JSON, nullable = True)  # opening_hours compiled to [start, end) minutes of the week
+    summary = Column(Text, nullable = True)  # Compact planner summary, built at ingest
     
     # Location details
     vicinity = Column(String, nullable = True)  # Neighborhood/area
@@ -79,38 +114,9 @@ class Attraction(Base):
         lazy="select"
     )
 
-    def __json__(self):
-        return {
-            "id": self.id,
-            "location": self.location,
-            "description": self.description,
-            "address": self.address,
-            "latitude": self.latitude,
-            "longitude": self.longitude,
-            "place_id": self.place_id,
-            "types": self.types,
-            "primary_type": self.primary_type,
-            "rating": self.rating,
-            "user_ratings_total": self.user_ratings_total,
-            "price_level": self.price_level,
-            "website": self.website,
-            "phone": self.phone,
-            "international_phone": self.international_phone,
-            "opening_hours": self.opening_hours,
-            "business_status": self.business_status,
-            "vicinity": self.vicinity,
-            "plus_code": self.plus_code,
-            "formatted_address": self.formatted_address,
-            "photos": self.photos,
-            "videos": self.videos,
-            "utc_offset": self.utc_offset,
-            "created": self.created,
-            "last_updated": self.last_updated,
-            # Legacy fields for backward compatibility
-            "type": self.type,
-            "tags": self.tags,
-            "images": self.images,
-        }
+    def __json__(self, fields: Optional[Iterable[str]] = None):
+        """Serialize the attraction. `fields` limits the output to a projection of JSON_FIELDS."""
+        return {name: getattr(self, name) for name in (fields or JSON_FIELDS)}
 
 class Embedding(Base):
     __tablename__ = "embedding"
@@ -133,3 +139,10 @@ class Embedding(Base):
         lazy="selectin"
     )
 
+class AttractionTombstone(Base):
+    """Deleted attraction ids, so export delta syncs can tell clients to drop them."""
+    __tablename__ = "attraction_tombstone"
+
+    attraction_id = Column(Integer, primary_key=True)
+    place_id = Column(String, nullable = True)
+    deleted = Column(String, nullable = False, index = True)  # isoformat, comparable with last_updated
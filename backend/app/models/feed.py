@@ -0,0 +1,37 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON, Index
+from datetime import datetime, timezone
+from .__init__ import Base
+from .atractions import N_DIM, VECTOR_AVAILABLE
+
+if VECTOR_AVAILABLE:
+    from pgvector.sqlalchemy import Vector
+
+
+class Interaction(Base):
+    __tablename__ = "interaction"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(Integer, ForeignKey("user.id", ondelete="CASCADE"), nullable=False)
+    attraction_id = Column(Integer, ForeignKey("attraction.id", ondelete="CASCADE"), nullable=False)
+    kind = Column(String(32), nullable=False)  # like, visit
+    created = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+
+    __table_args__ = (
+        Index("interaction_user_id_idx", "user_id", "created"),
+    )
+
+
+class UserFeed(Base):
+    """Materialized For You feed: one row per user, read with a single primary-key lookup."""
+    __tablename__ = "user_feed"
+    user_id = Column(Integer, ForeignKey("user.id", ondelete="CASCADE"), primary_key=True)
+
+    # Running mean of the attraction embeddings the user interacted with
+    interest = Column(Vector(N_DIM), nullable=True) if VECTOR_AVAILABLE else Column(JSON, nullable=True)
+    interaction_count = Column(Integer, nullable=False, default=0)
+
+    # Ranked attraction ids, best first
+    candidates = Column(JSON, nullable=False, default=list)
+    # Attractions the user already interacted with (never recommended again)
+    seen = Column(JSON, nullable=False, default=list)
+
+    updated = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
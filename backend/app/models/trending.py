@@ -0,0 +1,10 @@
+from sqlalchemy import Column, Integer, Float, ForeignKey
+from .__init__ import Base
+
+
+class TrendingScore(Base):
+    """Time-decayed trending score of an attraction, as of `updated` (epoch seconds)."""
+    __tablename__ = "trending_score"
+    attraction_id = Column(Integer, ForeignKey("attraction.id", ondelete="CASCADE"), primary_key=True)
+    score = Column(Float, nullable=False)
+    updated = Column(Float, nullable=False)
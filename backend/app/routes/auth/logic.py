@@ -279,6 +279,37 @@ def create_new_tokens(user_id: int) -> dict:
         expires_delta=timedelta(minutes=REFRESH_TOKEN_EXPIRE_MINUTES),
     )                           
     return new_access_token, new_refresh_token
+
+async def get_current_user_id(
+    access_token_cookie: Optional[str] = Cookie(None, alias="Authorization"),
+    access_token_header: Optional[str] = Header(None, alias="Authorization"),
+) -> int:
+    """
+    Dependency resolving the signed-in user's id from the access token
+    (mobile header or web cookie). Raises 401 when it is missing or invalid.
+    """
+    access_token = access_token_header or access_token_cookie
+    if not access_token:
+        raise HTTPException(status_code=401, detail="Missing authentication tokens")
+    payload = decode_jwt(access_token, expected_type="access")
+    try:
+        return int(payload.get("sub"))
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=401, detail="Invalid user id in token")
+
+async def get_optional_user_id(
+    access_token_cookie: Optional[str] = Cookie(None, alias="Authorization"),
+    access_token_header: Optional[str] = Header(None, alias="Authorization"),
+) -> Optional[int]:
+    """
+    Like get_current_user_id for endpoints that also serve anonymous users:
+    returns None instead of raising when the token is missing or invalid.
+    """
+    try:
+        return await get_current_user_id(access_token_cookie, access_token_header)
+    except HTTPException:
+        return None
+
 # def generate_verification_code():
 #     generated_uuid = uuid.uuid1()
 #     uuid_string = str(generated_uuid)
@@ -0,0 +1,70 @@
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from ...db import get_db
+from ...services.catalog import catalog_store
+from ...services.feed import FEED_SIZE, get_feed, is_stale, rank_candidates, record_interaction, schedule_refresh
+from ...services.pagination import DEFAULT_PAGE_SIZE, clamp_limit, parse_fields
+from ...services.negotiation import negotiated_response, wants_compact
+from ...services.serialization import encode_attractions
+from ...services.trending import trending_service
+from ..auth.logic import get_current_user_id
+from .request_models import InteractionRequest
+from ...__init__ import logger
+router = APIRouter(prefix="/feed", tags=["feed"])
+
+
+@router.get("")
+async def for_you(
+    request: Request,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    The signed-in user's For You feed, best match first. Users without
+    interactions yet get the most popular attractions. The next page cursor
+    is in X-Next-Cursor.
+    """
+    logger.debug("/feed called")
+    try:
+        projection = parse_fields(fields, wants_compact(request))
+        offset = int(cursor) if cursor else 0
+        if offset < 0:
+            raise ValueError("Invalid cursor")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    limit = clamp_limit(limit)
+
+    feed = await get_feed(db, user_id)
+    snapshot = await catalog_store.get(db)
+    if feed is not None and feed.candidates:
+        if is_stale(feed):
+            schedule_refresh(user_id)
+        ids = feed.candidates
+    else:
+        popular, _ = snapshot.page(FEED_SIZE, sort="popularity")
+        ids = rank_candidates((a.id for a in popular), feed.seen if feed is not None else ())
+
+    attractions = snapshot.get_many(ids[offset:offset + limit])
+    headers = {"X-Next-Cursor": str(offset + limit)} if offset + limit < len(ids) else {}
+    return negotiated_response(request, encode_attractions(attractions, projection), headers)
+
+
+@router.post("/interactions")
+async def add_interaction(
+    body: InteractionRequest,
+    user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db),
+):
+    """Record a like or visit and update the user's feed."""
+    logger.debug("/feed/interactions called")
+    try:
+        feed = await record_interaction(db, user_id, body.attraction_id, body.kind)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if body.kind == "visit":
+        trending_service.record(body.attraction_id, "check_in")
+    return {"message": "Interaction recorded", "candidates": len(feed.candidates)}
@@ -0,0 +1,6 @@
+# request_models.py
+from pydantic import BaseModel
+
+class InteractionRequest(BaseModel):
+    attraction_id: int
+    kind: str  # like, visit
@@ -0,0 +1,52 @@
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from ...db import get_db
+from ...services.catalog import catalog_store
+from ...services.pagination import clamp_limit, parse_fields
+from ...services.negotiation import negotiated_response, wants_compact
+from ...services.serialization import encode_attractions
+from ...services.trending import TRENDING_TOP_N, trending_service
+from .request_models import TrendingEventRequest
+from ...__init__ import logger
+router = APIRouter(prefix="/trending", tags=["trending"])
+
+
+@router.get("")
+async def trending(
+    request: Request,
+    category: Optional[str] = None,
+    vicinity: Optional[str] = None,
+    limit: int = 20,
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Trending attractions, hottest first, overall or for a category (primary type)
+    and/or neighborhood (vicinity). Each result carries its trending_score.
+    """
+    logger.debug("/trending called")
+    try:
+        projection = parse_fields(fields, wants_compact(request))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    hits = trending_service.trending(category, vicinity, min(clamp_limit(limit), TRENDING_TOP_N))
+    snapshot = await catalog_store.get(db)
+    attractions = snapshot.get_many(i for i, _ in hits)
+    scores = dict(hits)
+    extras = [{"trending_score": round(scores[a.id], 3)} for a in attractions]
+    return negotiated_response(request, encode_attractions(attractions, projection, extras))
+
+
+@router.post("/events", status_code=202)
+async def trending_event(body: TrendingEventRequest, db: AsyncSession = Depends(get_db)):
+    """Record a view, search hit or check-in of a catalog attraction. Applied in the next batch."""
+    snapshot = await catalog_store.get(db)
+    if snapshot.get(body.attraction_id) is None:
+        raise HTTPException(status_code=404, detail="Attraction not found")
+    try:
+        trending_service.record(body.attraction_id, body.kind)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"message": "Event recorded"}
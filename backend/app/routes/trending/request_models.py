@@ -0,0 +1,6 @@
+# request_models.py
+from pydantic import BaseModel
+
+class TrendingEventRequest(BaseModel):
+    attraction_id: int
+    kind: str  # view, search_hit, check_in
@@ -0,0 +1,189 @@
+"""
+Admission control for /chat.
+
+Each chat holds one of CHAT_MAX_CONCURRENT generation slots for the whole
+stream. When all slots are taken, requests wait in a bounded queue ordered by
+priority (the user's subscription level, when CHAT_PRIORITY_BY_SUBSCRIPTION is
+on) and then arrival; a freed slot is handed straight to the best waiter.
+Requests are rejected up front with a Retry-After estimate when the queue is
+full or when the predicted wait (queue position x the moving average service
+time / slots) exceeds CHAT_QUEUE_TIMEOUT, instead of waiting out the timeout
+first. Queue depth, active slots, waits and rejections are exported to
+/metrics.
+"""
+import os
+import math
+import time
+import heapq
+import asyncio
+import itertools
+from collections import OrderedDict
+from typing import List, Optional
+
+from sqlalchemy import select
+
+from .. import db as database
+from ..models.users import User
+from .metrics import metrics
+from ..__init__ import logger
+
+CHAT_MAX_CONCURRENT = int(os.getenv("CHAT_MAX_CONCURRENT", "8"))
+CHAT_MAX_QUEUE = int(os.getenv("CHAT_MAX_QUEUE", "32"))
+CHAT_QUEUE_TIMEOUT = float(os.getenv("CHAT_QUEUE_TIMEOUT", "10"))
+CHAT_PRIORITY_BY_SUBSCRIPTION = os.getenv("CHAT_PRIORITY_BY_SUBSCRIPTION", "1").lower() not in ("0", "false", "no")
+
+# Initial guess for how long a chat holds its slot, refined by a moving average
+INITIAL_SERVICE_SECONDS = float(os.getenv("CHAT_INITIAL_SERVICE_SECONDS", "8"))
+SERVICE_TIME_ALPHA = 0.2
+
+# subscription_level lookups are cached per user for this long
+PRIORITY_CACHE_TTL = 300
+PRIORITY_CACHE_MAX = 4096
+
+ACTIVE_METRIC = "chat_active_generations"
+QUEUE_DEPTH_METRIC = "chat_queue_depth"
+QUEUE_WAIT_METRIC = "chat_queue_wait_seconds"
+REJECTED_METRIC = "chat_admission_rejected_total"
+
+
+class AdmissionRejected(Exception):
+    """The chat cannot be admitted in time; retry after `retry_after` seconds."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"Chat admission rejected ({reason}), retry after {retry_after}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Slot:
+    """A held generation slot. release() is idempotent."""
+
+    def __init__(self, controller: "AdmissionController"):
+        self.controller = controller
+        self.acquired_at = time.monotonic()
+        self.released = False
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self.controller._release(time.monotonic() - self.acquired_at)
+
+
+class AdmissionController:
+
+    def __init__(
+        self,
+        max_concurrent: int = CHAT_MAX_CONCURRENT,
+        max_queue: int = CHAT_MAX_QUEUE,
+        queue_timeout: float = CHAT_QUEUE_TIMEOUT,
+        service_seconds: float = INITIAL_SERVICE_SECONDS,
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.service_seconds = service_seconds
+        self.active = 0
+        self._waiters: List[list] = []  # heap of [-priority, seq, future]
+        self._queued = 0
+        self._seq = itertools.count()
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queued
+
+    def estimated_wait(self, position: int) -> float:
+        """Seconds until the waiter at queue `position` (0 = next) gets a slot."""
+        return (position + 1) * self.service_seconds / max(1, self.max_concurrent)
+
+    def _retry_after(self) -> int:
+        return max(1, math.ceil(self.estimated_wait(self._queued)))
+
+    def _position(self, priority: int) -> int:
+        """Where a new waiter with `priority` would queue (it goes behind equal priorities)."""
+        return sum(1 for neg, _, future in self._waiters if -neg >= priority and not future.done())
+
+    async def acquire(self, priority: int = 0, timeout: Optional[float] = None) -> Slot:
+        """Take a slot, queueing if needed. Raises AdmissionRejected."""
+        timeout = self.queue_timeout if timeout is None else timeout
+        if self.active < self.max_concurrent and not self._queued:
+            self.active += 1
+            self._publish()
+            metrics.observe(QUEUE_WAIT_METRIC, 0.0)
+            return Slot(self)
+
+        if self._queued >= self.max_queue:
+            self._reject("queue_full")
+        if self.estimated_wait(self._position(priority)) > timeout:
+            self._reject("deadline")
+
+        future = asyncio.get_running_loop().create_future()
+        entry = [-priority, next(self._seq), future]
+        heapq.heappush(self._waiters, entry)
+        self._queued += 1
+        self._publish()
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just as we gave up: pass it on
+                self._release(None)
+            else:
+                future.cancel()
+                self._queued -= 1
+                self._publish()
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self._reject("timeout")
+        metrics.observe(QUEUE_WAIT_METRIC, time.monotonic() - started)
+        return Slot(self)
+
+    def _reject(self, reason: str):
+        metrics.increment(REJECTED_METRIC, labels={"reason": reason})
+        raise AdmissionRejected(reason, self._retry_after())
+
+    def _release(self, held_seconds: Optional[float]):
+        if held_seconds is not None:
+            self.service_seconds += SERVICE_TIME_ALPHA * (held_seconds - self.service_seconds)
+        # Hand the slot to the best live waiter, otherwise free it
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                self._queued -= 1
+                future.set_result(None)
+                self._publish()
+                return
+        self.active -= 1
+        self._publish()
+
+    def _publish(self):
+        metrics.set_gauge(ACTIVE_METRIC, self.active)
+        metrics.set_gauge(QUEUE_DEPTH_METRIC, self._queued)
+
+
+_priorities: "OrderedDict[int, tuple]" = OrderedDict()
+
+
+async def subscription_priority(user_id: Optional[int]) -> int:
+    """Queue priority for a user: their subscription_level (0 for anonymous users or when disabled)."""
+    if user_id is None or not CHAT_PRIORITY_BY_SUBSCRIPTION:
+        return 0
+    cached = _priorities.get(user_id)
+    if cached is not None and cached[1] > time.monotonic():
+        return cached[0]
+    try:
+        async with database.AsyncSessionLocal() as db:
+            level = await db.scalar(select(User.subscription_level).where(User.id == user_id))
+    except Exception as e:
+        logger.error(f"Subscription lookup failed for user {user_id}: {e}")
+        return 0
+    level = int(level or 0)
+    _priorities[user_id] = (level, time.monotonic() + PRIORITY_CACHE_TTL)
+    _priorities.move_to_end(user_id)
+    while len(_priorities) > PRIORITY_CACHE_MAX:
+        _priorities.popitem(last=False)
+    return level
+
+
+# Process-wide controller for /chat
+chat_admission = AdmissionController()
@@ -2,16 +2,128 @@
 Multi-Agent Trip Planner - Agent Flow
 
 Simple wrapper that exposes the trip planner flow for the API endpoint.
+Finished itineraries go through the semantic chat cache, so paraphrased
+requests are replayed instead of regenerated. Every run is timed per stage
+into the chat histograms; with `timing=True` the breakdown is also sent to
+the client as a `timing` event right before `complete`. Follow-up turns of a
+chat session reuse the first turn's retrieval (see chat_sessions).
 """
-from typing import AsyncGenerator, Dict, Any
-from .agents import run_trip_planner_flow
+import time
+import asyncio
+from contextlib import aclosing
+from typing import AsyncGenerator, AsyncIterator, Dict, Any, List, Optional
+from .agents import PLANNER_ERROR_PREFIX, run_follow_up_flow, run_trip_planner_flow
+from .chat_sessions import ChatSession
+from .catalog_version import catalog_version
+from .chat_cache import CHAT_CACHE_ENABLED, chat_cache
+from .text import normalize_query
+from .embedding import get_embedding
+from .timing import StageTimer, bind_timer
+from .cancellation import count_cancelled
+from ..__init__ import logger
 
 
-async def run_trip_planner(user_query: str) -> AsyncGenerator[Dict[str, Any], None]:
+async def replay(events: List[Dict[str, Any]]) -> AsyncGenerator[Dict[str, Any], None]:
+    for event in events:
+        yield event
+
+
+async def with_timing(
+    events: AsyncIterator[Dict[str, Any]], timer: StageTimer, timing: bool, cached: bool
+) -> AsyncGenerator[Dict[str, Any], None]:
+    """Forward events, inserting the timing event before `complete` when asked for."""
+    async with aclosing(events):
+        async for event in events:
+            if timing and event.get("type") == "complete":
+                yield timer.event(cached=cached)
+            yield event
+
+
+def succeeded(events: List[Dict[str, Any]]) -> bool:
+    """True for a complete run without error events or a planner error token."""
+    completed = bool(events) and events[-1].get("type") == "complete"
+    failed = any(
+        event.get("type") == "error"
+        or (event.get("type") == "token" and str(event.get("content", "")).startswith(PLANNER_ERROR_PREFIX))
+        for event in events
+    )
+    return completed and not failed
+
+
+def answer_text(events: List[Dict[str, Any]]) -> str:
+    return "".join(str(event.get("content", "")) for event in events if event.get("type") == "token")
+
+
+async def run_trip_planner(
+    user_query: str, timing: bool = False, session: Optional[ChatSession] = None
+) -> AsyncGenerator[Dict[str, Any], None]:
     """
     Run the trip planner and stream results.
-    
-    Yields streaming updates and final response.
+
+    Yields streaming updates and final response. When the consumer goes away
+    (the SSE client disconnected) the nested generators are closed right away,
+    which cancels the retrieval tasks or the Gemini stream in flight.
+
+    With a chat session, a `session` event comes first and successful turns are
+    recorded on it. Follow-up turns revise the previous answer with the
+    session's attractions (run_follow_up_flow) and bypass the chat cache, since
+    their answer depends on the conversation, not just the query.
     """
-    async for event in run_trip_planner_flow(user_query):
-        yield event
+    timer = StageTimer()
+    cached = None
+    vector = None
+    cancelled = False
+    follow_up = session is not None and session.is_follow_up
+    events: List[Dict[str, Any]] = []
+    try:
+        if session is not None:
+            yield session.event()
+
+        if CHAT_CACHE_ENABLED and not follow_up:
+            lookup_started = time.perf_counter()
+            normalized = normalize_query(user_query)
+            version = catalog_version.value
+            cached = chat_cache.get_exact(normalized)
+            if cached is None:
+                try:
+                    with bind_timer(timer):
+                        vector = await get_embedding(normalized)
+                except Exception as e:
+                    logger.error(f"Chat cache lookup skipped, embedding failed: {e}")
+                hit = chat_cache.lookup(normalized, vector) if vector is not None else None
+                cached = hit[0] if hit else None
+            timer.record("cache_lookup", lookup_started, time.perf_counter())
+
+        if cached is not None:
+            logger.debug(f"Chat cache hit for: {normalized}")
+            flow = replay(cached)
+        elif follow_up:
+            flow = run_follow_up_flow(session, user_query, timer)
+        else:
+            # The cache lookup's embedding doubles as the raw-query KNN vector
+            flow = run_trip_planner_flow(user_query, timer, session, query_vector=vector)
+
+        async with aclosing(with_timing(flow, timer, timing, cached=cached is not None)) as stream:
+            async for event in stream:
+                if event.get("type") != "timing":
+                    events.append(event)
+                yield event
+    except (asyncio.CancelledError, GeneratorExit):
+        cancelled = True
+        if cached is not None:
+            count_cancelled("replay")
+        else:
+            count_cancelled("generation" if timer.first_token_at is not None else "retrieval")
+        raise
+    finally:
+        # Abandoned chats would skew the latency histograms
+        if not cancelled:
+            timer.observe(cached=cached is not None)
+
+    ok = succeeded(events)
+    if session is not None and ok:
+        session.record_turn(user_query, answer_text(events))
+
+    # Only complete, error-free first turns against an unchanged catalog are reused
+    if CHAT_CACHE_ENABLED and cached is None and not follow_up and ok and catalog_version.value == version:
+        chat_cache.store(normalized, vector, events)
@@ -7,14 +7,24 @@ Agent 3 (Planner Agent): Uses Google Gemini to generate personalized trip itiner
 """
 import os
 import re
-from datetime import datetime, timezone
-from typing import List, Dict, Any, AsyncGenerator, Tuple
+import asyncio
+import time
+from datetime import datetime
+from typing import List, Dict, Any, AsyncGenerator, Optional, Tuple
 from dotenv import load_dotenv
 from sqlalchemy import select
 import google.generativeai as genai
 
-from .embedding import get_similar
-from ..db import AsyncSessionLocal
+from .embedding import get_similar_scored
+from .catalog import catalog_store
+from .query_memo import RewriteMemo, is_keyword_query
+from .context_packer import CONTEXT_TOKEN_BUDGET, best_scores, estimate_tokens, pack_context
+from .opening_hours import CATALOG_TIMEZONE
+from .chat_sessions import ChatSession, is_refinement
+from .timing import StageTimer, bind_timer, stage
+from .cancellation import cancel_tasks
+from .fake_backends import LLM_BACKEND, FakeGenerativeModel
+from .. import db as database
 from ..models.atractions import Attraction
 
 load_dotenv()
@@ -23,8 +33,11 @@ load_dotenv()
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY") or os.getenv("GOOGLE_MAPS_API_KEY")
 genai.configure(api_key=GOOGLE_API_KEY)
 
-# Create the Gemini model
-model = genai.GenerativeModel('gemini-2.0-flash')
+# Create the Gemini model (LLM_BACKEND=fake uses the local stand-in, for load tests)
+if LLM_BACKEND == "fake":
+    model = FakeGenerativeModel()
+else:
+    model = genai.GenerativeModel('gemini-2.0-flash')
 
 
 ##############################################
@@ -84,16 +97,44 @@ def parse_generated_queries(response_text: str) -> Tuple[str, str]:
     return (query1 or "", query2 or "")
 
 
+_rewrite_memo = None
+
+
+def get_rewrite_memo() -> RewriteMemo:
+    """Process-wide rewrite memo, opened on first use."""
+    global _rewrite_memo
+    if _rewrite_memo is None:
+        _rewrite_memo = RewriteMemo(QUERY_GENERATOR_PROMPT)
+    return _rewrite_memo
+
+
 async def generate_search_queries(user_query: str) -> List[str]:
     """
     Use LLM to generate 2 optimized search queries for KNN embedding search.
     Returns a list of search phrases.
+
+    Keyword-style queries are used as-is, and generated queries are memoized
+    per (prompt version, normalized query).
     """
+    if is_keyword_query(user_query):
+        print(f"[Query Generator] Keyword query, skipping rewrite: {user_query}")
+        return [user_query]
+
+    memo = get_rewrite_memo()
+    try:
+        cached = await memo.get(user_query)
+    except Exception as e:
+        print(f"[Query Generator] Memo lookup failed: {e}")
+        cached = None
+    if cached:
+        print(f"[Query Generator] Memoized queries: {cached}")
+        return cached
+
     print(f"[Query Generator] Optimizing query: {user_query}")
     
     try:
         prompt = QUERY_GENERATOR_PROMPT + f'"{user_query}"'
-        response = model.generate_content(prompt)
+        response = await model.generate_content_async(prompt)
         
         if response.text:
             query1, query2 = parse_generated_queries(response.text)
@@ -110,8 +151,12 @@ async def generate_search_queries(user_query: str) -> List[str]:
             # Fall back to original if parsing failed
             if not queries:
                 print(f"[Query Generator] Parsing failed, using original query")
-                queries = [user_query]
-            
+                return [user_query]
+
+            try:
+                await memo.set(user_query, queries)
+            except Exception as e:
+                print(f"[Query Generator] Memo store failed: {e}")
             return queries
     except Exception as e:
         print(f"[Query Generator] Error: {e}, using original query")
@@ -124,51 +169,165 @@ async def generate_search_queries(user_query: str) -> List[str]:
 ## Search Agent - Finds attractions via embeddings with multiple queries
 ##############################################
 
-async def search_attractions(user_query: str, max_results: int = 10) -> str:
+# How long retrieval waits for the rewritten queries (and their KNN searches) before planning
+# proceeds with what has been retrieved; the raw-query search always completes
+REWRITE_DEADLINE_SECONDS = float(os.getenv("REWRITE_DEADLINE_SECONDS", "2.5"))
+
+
+async def knn_attraction_ids(
+    query: str, max_results: int, vector: Optional[List[float]] = None
+) -> List[Tuple[int, float]]:
+    """
+    (attraction id, similarity) pairs for one KNN search, best first. Uses its own
+    session so searches can run concurrently. `vector` skips embedding the query again.
+    """
+    print(f"[Search Agent] KNN search for: '{query}'")
+    async with database.AsyncSessionLocal() as db:
+        scored = await get_similar_scored(query, db, max_results=max_results, threshold=0.50, vector=vector)
+    best = best_scores((emb.attraction_id, sim) for emb, sim in scored if emb.attraction_id)
+    return sorted(best.items(), key=lambda item: -item[1])
+
+
+async def timed_search_queries(user_query: str) -> List[str]:
+    with stage("rewrite"):
+        return await generate_search_queries(user_query)
+
+
+def merge_scored(rankings: List[List[Tuple[int, float]]]) -> List[Tuple[int, float]]:
+    """Merge per-query (id, similarity) lists: each attraction keeps its best score, best first."""
+    best = best_scores(pair for ranking in rankings for pair in ranking)
+    return sorted(best.items(), key=lambda item: -item[1])
+
+
+async def retrieve_attraction_ids(
+    user_query: str, max_results: int = 10, query_vector: Optional[List[float]] = None
+) -> List[Tuple[int, float]]:
+    """
+    Speculative retrieval: KNN on the raw query starts together with the LLM rewrite,
+    and each rewritten query is searched as soon as the rewrite arrives. Whatever the
+    rewritten searches found by REWRITE_DEADLINE_SECONDS is merged in; the rest is dropped.
+    Returns (attraction id, similarity) pairs, best first. `query_vector` is the
+    user query's embedding when the caller already has it (the chat cache lookup).
+    """
+    per_query = max_results // 2 + 2
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + REWRITE_DEADLINE_SECONDS
+
+    raw_search = asyncio.create_task(knn_attraction_ids(user_query, per_query, query_vector))
+    rewrite = asyncio.create_task(timed_search_queries(user_query))
+    tasks = [raw_search, rewrite]
+
+    try:
+        try:
+            search_queries = await asyncio.wait_for(rewrite, timeout=REWRITE_DEADLINE_SECONDS)
+        except asyncio.TimeoutError:
+            print(f"[Search Agent] Query rewrite missed the {REWRITE_DEADLINE_SECONDS}s deadline, using the raw query")
+            search_queries = []
+
+        rewritten = []
+        for sq in search_queries:
+            if sq.strip() and sq.strip().lower() != user_query.strip().lower() and sq not in rewritten:
+                rewritten.append(sq)
+        print(f"[Search Agent] Executing {len(rewritten) + 1} KNN queries...")
+        searches = [asyncio.create_task(knn_attraction_ids(sq, per_query)) for sq in rewritten]
+        tasks.extend(searches)
+
+        rankings = []
+        if searches:
+            done, _ = await asyncio.wait(searches, timeout=max(0.0, deadline - loop.time()))
+            for task in searches:
+                if task in done and task.exception() is None:
+                    rankings.append(task.result())
+                elif task in done:
+                    print(f"[Search Agent] KNN search failed: {task.exception()}")
+
+        # The raw-query search is the baseline and always completes
+        rankings.append(await raw_search)
+        return merge_scored(rankings)
+    finally:
+        # Late searches, and everything when the chat itself is cancelled (client disconnected)
+        await cancel_tasks(tasks)
+
+
+async def load_attractions(ids: List[int]) -> List[Attraction]:
+    """Attractions for ids, in the given order."""
+    async with database.AsyncSessionLocal() as db:
+        result = await db.execute(select(Attraction).where(Attraction.id.in_(ids)))
+        by_id = {a.id: a for a in result.scalars().all()}
+    return [by_id[i] for i in ids if i in by_id]
+
+
+async def pack_candidates(
+    candidates: List[Tuple[int, float]], budget: int = CONTEXT_TOKEN_BUDGET
+) -> Tuple[str, List[int]]:
+    """Fetch the candidates' rows and pack their summaries into at most `budget` tokens."""
+    ids = [attraction_id for attraction_id, _ in candidates]
+
+    # Rows (with precomputed summaries) and opening hours come from the catalog snapshot when it is loaded
+    snapshot = catalog_store.snapshot
+    with stage("fetch"):
+        if snapshot is not None:
+            attractions = snapshot.get_many(ids)
+            open_status = snapshot.open_status(ids)
+        else:
+            attractions = await load_attractions(ids)
+            open_status = {}
+
+    with stage("pack"):
+        return pack_context(candidates, {a.id: a for a in attractions}, open_status, budget)
+
+
+async def search_attractions(
+    user_query: str,
+    max_results: int = 10,
+    session: Optional[ChatSession] = None,
+    query_vector: Optional[List[float]] = None,
+) -> str:
     """
     Search for NYC attractions using semantic similarity search.
     Uses Query Generator Agent to create optimized search phrases.
-    Returns formatted information about matching attractions.
+    Returns the best matches, packed as summaries within CONTEXT_TOKEN_BUDGET.
+    When a chat session is given, the candidates and packed ids are kept on it for follow-ups.
     """
-    # Step 1: Generate optimized search queries
-    search_queries = await generate_search_queries(user_query)
-    
-    print(f"[Search Agent] Executing {len(search_queries)} KNN queries...")
-    
-    all_attraction_ids = set()
-    
-    async with AsyncSessionLocal() as db:
-        # Step 2: Run KNN search for each generated query
-        for sq in search_queries:
-            print(f"[Search Agent] KNN search for: '{sq}'")
-            embeddings = await get_similar(sq, db, max_results=max_results // 2 + 2, threshold=0.50)
-            
-            for emb in embeddings:
-                if emb.attraction_id:
-                    all_attraction_ids.add(emb.attraction_id)
-        
-        if not all_attraction_ids:
-            return "No attractions found matching the query."
-        
-        # Step 3: Fetch full attraction details
-        result = await db.execute(
-            select(Attraction).where(Attraction.id.in_(list(all_attraction_ids)))
-        )
-        attractions = result.scalars().all()
-        
-        # Format results for the planner agent
-        formatted_results = []
-        for a in attractions[:10]:  # Limit to top 10 for context size
-            info = f"""
-**{a.location}**
-- Description: {a.description or 'N/A'}
-- Address: {a.formatted_address or a.address or 'N/A'}
-- Rating: {a.rating}/5 ({a.user_ratings_total} reviews)
-- Type: {', '.join(a.types[:3]) if a.types else 'General attraction'}
-"""
-            formatted_results.append(info)
-        
-        return f"Found {len(attractions)} attractions:\n" + "\n---\n".join(formatted_results)
+    candidates = await retrieve_attraction_ids(user_query, max_results, query_vector)
+    if not candidates:
+        return "No attractions found matching the query."
+
+    context, packed = await pack_candidates(candidates)
+    if session is not None:
+        session.add_candidates(candidates)
+        session.add_packed(packed)
+    print(f"[Search Agent] Packed {len(packed)} of {len(candidates)} candidates into the planner context")
+    return f"Found {len(packed)} attractions:\n" + context
+
+
+# Follow-ups search once with the raw query and only add attractions the planner has not been shown
+FOLLOW_UP_MAX_RESULTS = int(os.getenv("FOLLOW_UP_MAX_RESULTS", "10"))
+FOLLOW_UP_TOKEN_BUDGET = int(os.getenv("FOLLOW_UP_TOKEN_BUDGET", "400"))
+
+
+async def search_follow_up(session: ChatSession, user_query: str) -> str:
+    """
+    Retrieval for a follow-up turn, reusing what the session already retrieved.
+    Refinements ("make it shorter") search nothing. Other follow-ups run a single
+    KNN search on the raw query (no rewrite) and pack only new attractions, within
+    FOLLOW_UP_TOKEN_BUDGET. Returns "" when there is nothing new to add.
+    """
+    if is_refinement(user_query):
+        print("[Search Agent] Refinement follow-up, reusing the session's attractions")
+        return ""
+
+    candidates = await knn_attraction_ids(user_query, FOLLOW_UP_MAX_RESULTS)
+    seen = session.seen_ids
+    new = [(attraction_id, score) for attraction_id, score in candidates if attraction_id not in seen]
+    session.add_candidates(candidates)
+    if not new:
+        return ""
+
+    context, packed = await pack_candidates(new, FOLLOW_UP_TOKEN_BUDGET)
+    session.add_packed(packed)
+    print(f"[Search Agent] Follow-up added {len(packed)} new attractions ({len(candidates) - len(new)} already shown)")
+    return context
 
 
 ##############################################
@@ -194,6 +353,38 @@ Be enthusiastic and helpful! Make the user excited about their trip.
 Keep responses concise but informative."""
 
 
+# Start of the token yielded when generation fails mid-stream
+PLANNER_ERROR_PREFIX = "Sorry, I encountered an error generating your itinerary"
+
+
+def cancel_stream(response):
+    """Cancel a Gemini streaming response's RPC if it is still open (no-op otherwise)."""
+    if response is None or getattr(response, "_done", True):
+        return
+    cancel = getattr(getattr(response, "_iterator", None), "cancel", None)
+    if callable(cancel):
+        cancel()
+
+
+async def stream_completion(prompt: str) -> AsyncGenerator[str, None]:
+    """Stream a planner completion, yielding an error token instead of raising."""
+    response = None
+    try:
+        # Generate content with streaming (async client, so other chats keep streaming meanwhile)
+        response = await model.generate_content_async(prompt, stream=True)
+        
+        async for chunk in response:
+            if chunk.text:
+                yield chunk.text
+                    
+    except Exception as e:
+        print(f"[Planner Agent] Error: {e}")
+        yield f"{PLANNER_ERROR_PREFIX}: {str(e)}"
+    finally:
+        # Closed early (client disconnected): cancel the underlying streaming RPC as well
+        cancel_stream(response)
+
+
 async def generate_itinerary(user_query: str, attractions_data: str) -> AsyncGenerator[str, None]:
     """
     Generate a personalized itinerary using Google Gemini.
@@ -201,7 +392,7 @@ async def generate_itinerary(user_query: str, attractions_data: str) -> AsyncGen
     """
     prompt = f"""{PLANNER_SYSTEM_PROMPT}
 
-Today's date: {datetime.now(timezone.utc).strftime("%Y-%m-%d")}
+Today's date: {datetime.now(CATALOG_TIMEZONE).strftime("%Y-%m-%d")}
 
 USER'S REQUEST:
 {user_query}
@@ -211,37 +402,62 @@ AVAILABLE NYC ATTRACTIONS (from search):
 
 Please create a personalized itinerary based on the user's request."""
 
-    try:
-        # Generate content with streaming
-        response = model.generate_content(prompt, stream=True)
-        
-        for chunk in response:
-            if chunk.text:
-                yield chunk.text
-                    
-    except Exception as e:
-        print(f"[Planner Agent] Error: {e}")
-        yield f"Sorry, I encountered an error generating your itinerary: {str(e)}"
+    async for token in stream_completion(prompt):
+        yield token
+
+
+PLANNER_FOLLOW_UP_PROMPT = """You are an expert NYC trip planner continuing a conversation. Revise your previous itinerary according to the user's follow-up request.
+
+Keep everything the user did not ask to change, and keep the same formatting (## headers, numbered recommendations, time estimates, brief summary).
+Use the new attractions only where they fit the request. Be concise."""
+
+
+def build_follow_up_prompt(session: ChatSession, user_query: str, new_attractions: str) -> str:
+    """The previous answer stands in for the attraction context already sent on earlier turns."""
+    earlier = "\n".join(f"- {query}" for query in session.earlier_queries)
+    new_section = f"\nNEW NYC ATTRACTIONS (from search):\n{new_attractions}\n" if new_attractions else ""
+    return f"""{PLANNER_FOLLOW_UP_PROMPT}
+
+Today's date: {datetime.now(CATALOG_TIMEZONE).strftime("%Y-%m-%d")}
+
+EARLIER REQUESTS:
+{earlier}
+
+YOUR PREVIOUS ITINERARY:
+{session.last_answer}
+{new_section}
+FOLLOW-UP REQUEST:
+{user_query}"""
 
 
 ##############################################
 ## Combined Trip Planner Flow
 ##############################################
 
-async def run_trip_planner_flow(user_query: str) -> AsyncGenerator[Dict[str, Any], None]:
+async def run_trip_planner_flow(
+    user_query: str,
+    timer: Optional[StageTimer] = None,
+    session: Optional[ChatSession] = None,
+    query_vector: Optional[List[float]] = None,
+) -> AsyncGenerator[Dict[str, Any], None]:
     """
     Run the complete trip planner flow:
     1. Query Generator Agent creates optimized search queries
     2. Search Agent finds relevant attractions via KNN embedding search
     3. Planner Agent generates personalized itinerary
     
-    Yields streaming updates for the frontend.
+    Yields streaming updates for the frontend. Stage timings, time to first
+    token and generated tokens are recorded on `timer`. Retrieval results are
+    kept on `session` so follow-up turns can reuse them. `query_vector` (the
+    embedding from the chat cache lookup) saves embedding the query twice.
     """
+    timer = timer or StageTimer()
     # Step 1: Search for attractions (includes query generation)
     yield {"type": "status", "message": "🧠 Generating optimized search queries...", "done": False}
     
     try:
-        attractions_data = await search_attractions(user_query)
+        with bind_timer(timer), timer.stage("retrieval"):
+            attractions_data = await search_attractions(user_query, session=session, query_vector=query_vector)
         yield {"type": "status", "message": "✅ Found relevant attractions!", "done": False}
     except Exception as e:
         yield {"type": "error", "message": f"Search failed: {str(e)}", "done": True}
@@ -250,11 +466,47 @@ async def run_trip_planner_flow(user_query: str) -> AsyncGenerator[Dict[str, Any
     # Step 2: Generate itinerary
     yield {"type": "status", "message": "📝 Creating your personalized itinerary...", "done": False}
     
+    async for event in stream_tokens(generate_itinerary(user_query, attractions_data), timer):
+        yield event
+
+
+async def stream_tokens(
+    tokens: AsyncGenerator[str, None], timer: StageTimer
+) -> AsyncGenerator[Dict[str, Any], None]:
+    """Turn planner tokens into token events, recording first token and generation time."""
     try:
-        async for token in generate_itinerary(user_query, attractions_data):
+        generation_started = time.perf_counter()
+        async for token in tokens:
+            if timer.first_token_at is None:
+                timer.record("first_token", generation_started, time.perf_counter())
+            timer.token(estimate_tokens(token))
             yield {"type": "token", "content": token, "done": False}
+        timer.record("generation", generation_started, time.perf_counter())
     except Exception as e:
         yield {"type": "error", "message": f"Itinerary generation failed: {str(e)}", "done": True}
         return
     
     yield {"type": "complete", "done": True}
+
+
+async def run_follow_up_flow(
+    session: ChatSession, user_query: str, timer: Optional[StageTimer] = None
+) -> AsyncGenerator[Dict[str, Any], None]:
+    """
+    Follow-up turn of a chat session: retrieval reuses the session's attractions
+    (see search_follow_up) and the planner revises its previous answer.
+    Yields the same events as run_trip_planner_flow.
+    """
+    timer = timer or StageTimer()
+    yield {"type": "status", "message": "🔁 Updating your itinerary...", "done": False}
+
+    try:
+        with bind_timer(timer), timer.stage("retrieval"):
+            new_attractions = await search_follow_up(session, user_query)
+    except Exception as e:
+        yield {"type": "error", "message": f"Search failed: {str(e)}", "done": True}
+        return
+
+    prompt = build_follow_up_prompt(session, user_query, new_attractions)
+    async for event in stream_tokens(stream_completion(prompt), timer):
+        yield event
@@ -0,0 +1,63 @@
+"""
+Cancellation helpers for /chat.
+
+A generation runs in its own producer task (see chat_streams), so an SSE
+disconnect only ends that connection's follower. When nobody follows the stream
+again within CHAT_STREAM_GRACE seconds (long enough for a quick reconnect with
+Last-Event-ID), the producer is cancelled. The CancelledError then propagates
+down the generator chain into the Gemini stream, and the admission slot is
+released. These helpers cover what that misses: tasks spawned along the way
+(speculative KNN searches, query rewrites) and requests still waiting for an
+admission slot, which are not streaming yet.
+
+Cancellations are counted in /metrics as chat_cancelled_total{stage}. The
+"queued" label counts requests that gave up waiting for a slot. "abandoned"
+counts streams cancelled by the grace timer. Each abandoned stream is also
+counted under the pipeline stage it was in ("retrieval", "generation" or
+"replay").
+"""
+import asyncio
+from typing import Awaitable, Iterable, TypeVar
+
+from fastapi import Request
+
+from .metrics import metrics
+
+CANCELLED_METRIC = "chat_cancelled_total"
+
+# How often a queued request checks whether its client is still there
+DISCONNECT_POLL_SECONDS = 0.25
+
+T = TypeVar("T")
+
+
+class ClientDisconnected(Exception):
+    """The client went away before the work finished."""
+
+
+def count_cancelled(stage: str):
+    metrics.increment(CANCELLED_METRIC, labels={"stage": stage})
+
+
+async def cancel_tasks(tasks: Iterable[asyncio.Task]):
+    """Cancel unfinished tasks and wait until they have actually stopped."""
+    pending = [task for task in tasks if not task.done()]
+    for task in pending:
+        task.cancel()
+    if pending:
+        await asyncio.gather(*pending, return_exceptions=True)
+
+
+async def unless_disconnected(request: Request, awaitable: Awaitable[T], poll: float = DISCONNECT_POLL_SECONDS) -> T:
+    """Await `awaitable`, cancelling it and raising ClientDisconnected if the client disconnects first."""
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll)
+            if done:
+                return task.result()
+            # A task that finished meanwhile keeps its result (e.g. a slot that must be released)
+            if await request.is_disconnected() and not task.done():
+                raise ClientDisconnected()
+    finally:
+        await cancel_tasks([task])
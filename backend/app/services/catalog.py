@@ -0,0 +1,262 @@
+"""
+In-memory attraction catalog snapshot.
+
+The catalog is small and changes rarely, so read endpoints are served from an
+immutable, process-local snapshot instead of opening a session per request.
+Rows are kept as slotted AttractionRecord objects next to NumPy columns
+(coordinates, rating, price, popularity) used for sorting, filtering and geo
+queries, plus per-value facet bitmaps and compiled opening hours. When the
+catalog version changes a new snapshot is built in the background and swapped
+in with a single reference assignment, so readers always see one consistent
+snapshot.
+"""
+import os
+import sys
+import time
+import asyncio
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import db as database
+from .catalog_version import catalog_version
+from .facets import FacetIndex
+from .geo import GeoIndex
+from .opening_hours import OpeningHoursIndex, compile_opening_hours
+from .context_packer import SUMMARY_FIELDS, build_summary
+from .pagination import SORTS, clamp_limit, decode_cursor, encode_cursor, sort_value
+from ..models.atractions import Attraction, JSON_FIELDS
+from ..__init__ import logger
+
+CATALOG_SNAPSHOT_ENABLED = os.getenv("CATALOG_SNAPSHOT", "1").lower() not in ("0", "false", "no")
+
+# String columns with few distinct values; interned so every row shares one object
+INTERNED_FIELDS = ("primary_type", "business_status", "vicinity", "type")
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+# Loaded into records but not serialized
+INTERNAL_FIELDS = ("open_intervals", "summary")
+RECORD_FIELDS = JSON_FIELDS + INTERNAL_FIELDS
+
+
+class AttractionRecord:
+    """Read-only attraction row. Serializes exactly like Attraction.__json__."""
+    __slots__ = RECORD_FIELDS
+
+    def __init__(self, *values):
+        for name, value in zip(RECORD_FIELDS, values):
+            object.__setattr__(self, name, value)
+
+    @classmethod
+    def from_row(cls, row: Sequence) -> "AttractionRecord":
+        """Build from a row of RECORD_FIELDS values (internal fields may be missing)."""
+        values = dict(zip(RECORD_FIELDS, row))
+        for name in INTERNED_FIELDS:
+            values[name] = _intern(values[name])
+        for name in ("types", "tags"):
+            if values[name]:
+                values[name] = tuple(_intern(t) for t in values[name])
+        if values.get("open_intervals") is None:
+            # Rows ingested before hours were compiled at ingest time
+            values["open_intervals"] = compile_opening_hours(values["opening_hours"])
+        if values.get("summary") is None:
+            # Rows ingested before summaries were built at ingest time
+            values["summary"] = build_summary(**{name: values.get(name) for name in SUMMARY_FIELDS})
+        return cls(*(values.get(name) for name in RECORD_FIELDS))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("AttractionRecord is immutable")
+
+    def __json__(self, fields: Optional[Iterable[str]] = None):
+        return {name: getattr(self, name) for name in (fields or JSON_FIELDS)}
+
+
+class CatalogSnapshot:
+    """Immutable view of every attraction, ordered by id."""
+
+    def __init__(self, records: Sequence[AttractionRecord], version: str):
+        self.version = version
+        self.built_at = time.time()
+        self.records: Tuple[AttractionRecord, ...] = tuple(sorted(records, key=lambda r: r.id))
+        self.position: Dict[int, int] = {r.id: row for row, r in enumerate(self.records)}
+
+        self.ids = np.array([r.id for r in self.records], dtype=np.int64)
+        self.lat = np.array([np.nan if r.latitude is None else r.latitude for r in self.records], dtype=np.float64)
+        self.lng = np.array([np.nan if r.longitude is None else r.longitude for r in self.records], dtype=np.float64)
+        self.rating = np.array([r.rating or 0.0 for r in self.records], dtype=np.float64)
+        self.popularity = np.array([r.user_ratings_total or 0 for r in self.records], dtype=np.int64)
+        self.price = np.array([-1 if r.price_level is None else r.price_level for r in self.records], dtype=np.int8)
+
+        has_coords = ~(np.isnan(self.lat) | np.isnan(self.lng))
+        geo_rows = np.flatnonzero(has_coords)
+        self.geo = GeoIndex(
+            ids=self.ids[geo_rows],
+            lats=self.lat[geo_rows],
+            lngs=self.lng[geo_rows],
+            ratings=self.rating[geo_rows],
+            types=[self.records[row].types for row in geo_rows],
+        )
+
+        self.facets = FacetIndex(self.records)
+        self.hours = OpeningHoursIndex(
+            [r.open_intervals for r in self.records],
+            [r.utc_offset for r in self.records],
+        )
+
+        # Row order per sort, matching pagination.SORTS (desc sorts break ties by id desc)
+        self._sort_keys = {"id": self.ids, "rating": self.rating, "popularity": self.popularity}
+        self._orders = {"id": np.arange(len(self.records))}
+        for sort in ("rating", "popularity"):
+            self._orders[sort] = np.lexsort((-self.ids, -self._sort_keys[sort]))
+
+    def __len__(self):
+        return len(self.records)
+
+    def get(self, attraction_id: int) -> Optional[AttractionRecord]:
+        row = self.position.get(attraction_id)
+        return None if row is None else self.records[row]
+
+    def get_many(self, ids: Iterable[int]) -> List[AttractionRecord]:
+        """Records for `ids` in the given order; unknown ids are skipped."""
+        return [self.records[self.position[i]] for i in ids if i in self.position]
+
+    def open_status(self, ids: Iterable[int], at: Optional[datetime] = None) -> Dict[int, Optional[bool]]:
+        """Whether each attraction is open at `at` (default: now); None when its hours are unknown."""
+        is_open = self.hours.open_at(at)
+        status = {}
+        for attraction_id in ids:
+            row = self.position.get(attraction_id)
+            if row is None or not self.hours.known[row]:
+                status[attraction_id] = None
+            else:
+                status[attraction_id] = bool(is_open[row])
+        return status
+
+    def find_by_name(self, name: str) -> Optional[AttractionRecord]:
+        """Most reviewed attraction whose name contains `name` (case-insensitive)."""
+        needle = name.strip().lower()
+        matches = [r for r in self.records if r.location and needle in r.location.lower()]
+        return max(matches, key=lambda r: r.user_ratings_total or 0, default=None)
+
+    def mask(
+        self,
+        place_type: Optional[str] = None,
+        min_rating: Optional[float] = None,
+        open_at: Optional[datetime] = None,
+    ) -> Optional[np.ndarray]:
+        """Boolean row mask for simple filters, or None when no filter applies."""
+        if place_type is None and min_rating is None and open_at is None:
+            return None
+        keep = np.ones(len(self.records), dtype=bool)
+        if open_at is not None:
+            keep &= self.hours.open_at(open_at)
+        if min_rating is not None:
+            keep &= self.rating >= min_rating
+        if place_type:
+            keep &= np.fromiter((place_type in (r.types or ()) for r in self.records), dtype=bool, count=len(self.records))
+        return keep
+
+    def page(
+        self,
+        limit: int,
+        cursor: Optional[str] = None,
+        sort: str = "id",
+        mask: Optional[np.ndarray] = None,
+    ) -> Tuple[List[AttractionRecord], Optional[str]]:
+        """One keyset page in the same order and cursor format as DataCollectionService.get_attractions_page."""
+        if sort not in SORTS:
+            raise ValueError(f"Unknown sort: {sort}")
+        limit = clamp_limit(limit)
+        order = self._orders[sort]
+        if mask is not None:
+            order = order[mask[order]]
+
+        start = 0
+        if cursor:
+            value, last_id = decode_cursor(cursor, sort)
+            ids = self.ids[order]
+            if sort == "id":
+                after = ids > last_id
+            else:
+                keys = self._sort_keys[sort][order]
+                after = (keys < value) | ((keys == value) & (ids < last_id))
+            start = int(np.argmax(after)) if after.any() else len(order)
+
+        rows = order[start:start + limit + 1]
+        records = [self.records[row] for row in rows[:limit]]
+        next_page = None
+        if len(rows) > limit:
+            last = records[-1]
+            next_page = encode_cursor(sort, sort_value(last, sort), last.id)
+        return records, next_page
+
+
+def build_snapshot(rows: Sequence[Sequence], version: str) -> CatalogSnapshot:
+    """CPU-bound part of a snapshot build: records, sort orders and indexes."""
+    return CatalogSnapshot([AttractionRecord.from_row(row) for row in rows], version)
+
+
+async def load_snapshot(db: AsyncSession, version: str) -> CatalogSnapshot:
+    """
+    Read every attraction as plain rows (no ORM hydration) and build a snapshot.
+    The build runs in a worker thread so requests and SSE streams keep flowing meanwhile.
+    """
+    started = time.perf_counter()
+    result = await db.execute(select(*[getattr(Attraction, name) for name in RECORD_FIELDS]))
+    snapshot = await asyncio.to_thread(build_snapshot, result.all(), version)
+    logger.info(f"Built catalog snapshot v{version}: {len(snapshot)} attractions in {time.perf_counter() - started:.3f}s")
+    return snapshot
+
+
+class CatalogStore:
+    """Holds the current snapshot and rebuilds it in the background when the catalog version changes."""
+
+    def __init__(self):
+        self.snapshot: Optional[CatalogSnapshot] = None
+        self._rebuild_task: Optional[asyncio.Task] = None
+        self._first_build = asyncio.Lock()
+
+    async def get(self, db: AsyncSession) -> CatalogSnapshot:
+        """
+        Current snapshot. The very first call builds it inline; after that a stale
+        snapshot keeps serving while the replacement is built in the background.
+        """
+        version = await catalog_version.current(db)
+        if self.snapshot is None:
+            async with self._first_build:
+                if self.snapshot is None:
+                    self.snapshot = await load_snapshot(db, version)
+        elif self.snapshot.version != version:
+            self.schedule_rebuild()
+        return self.snapshot
+
+    def schedule_rebuild(self):
+        """Start a background rebuild unless one is already running."""
+        if self._rebuild_task is not None and not self._rebuild_task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # no loop (e.g. a sync caller); the next request triggers the rebuild
+        self._rebuild_task = loop.create_task(self.rebuild())
+
+    async def rebuild(self):
+        try:
+            async with database.AsyncSessionLocal() as db:
+                version = await catalog_version.current(db)
+                snapshot = await load_snapshot(db, version)
+            self.snapshot = snapshot
+        except Exception as e:
+            logger.error(f"Catalog snapshot rebuild failed: {e}")
+
+
+# Process-wide catalog
+catalog_store = CatalogStore()
+catalog_version.on_change(catalog_store.schedule_rebuild)
@@ -0,0 +1,88 @@
+"""
+Attraction catalog version tracking.
+
+The version changes whenever attractions are written: ingestion in this process
+bumps it directly, and writes from other processes (e.g. collect_nyc_data.py) are
+picked up by polling a cheap aggregate over the attraction table.
+Caches derived from the catalog register a listener to be invalidated on change.
+"""
+import os
+import time
+import asyncio
+from typing import Callable, List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.atractions import Attraction
+from ..__init__ import logger
+
+# How often (seconds) the DB is polled for writes made by other processes
+CATALOG_VERSION_POLL_SECONDS = float(os.getenv("CATALOG_VERSION_POLL_SECONDS", "30"))
+
+
+class CatalogVersion:
+    def __init__(self, poll_seconds: float = CATALOG_VERSION_POLL_SECONDS):
+        self.poll_seconds = poll_seconds
+        self._local = 0
+        self._db_marker: Optional[str] = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+        self._listeners: List[Callable[[], None]] = []
+
+    @property
+    def value(self) -> str:
+        """Current version string (DB marker + local write counter)."""
+        return f"{self._db_marker or '-'}.{self._local}"
+
+    def on_change(self, callback: Callable[[], None]):
+        """Register a callback invoked whenever the version changes."""
+        self._listeners.append(callback)
+
+    def bump(self):
+        """Mark the catalog as changed (call after committing attraction writes)."""
+        self._local += 1
+        self._notify()
+
+    async def current(self, db: AsyncSession) -> str:
+        """Return the current version, re-reading the DB marker at most every poll_seconds."""
+        if db is None or time.monotonic() - self._checked_at < self.poll_seconds:
+            return self.value
+
+        async with self._lock:
+            if time.monotonic() - self._checked_at < self.poll_seconds:
+                return self.value
+            try:
+                result = await db.execute(
+                    select(
+                        func.count(Attraction.id),
+                        func.max(Attraction.id),
+                        func.max(Attraction.last_updated),
+                    )
+                )
+                count, max_id, max_updated = result.one()
+                marker = f"{count}-{max_id}-{max_updated}"
+            except Exception as e:
+                logger.error(f"Could not read catalog version: {e}")
+                return self.value
+            finally:
+                self._checked_at = time.monotonic()
+
+            if marker != self._db_marker:
+                changed = self._db_marker is not None
+                self._db_marker = marker
+                if changed:
+                    logger.info(f"Catalog changed, new version {self.value}")
+                    self._notify()
+        return self.value
+
+    def _notify(self):
+        for callback in self._listeners:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"Catalog change listener failed: {e}")
+
+
+# Process-wide catalog version
+catalog_version = CatalogVersion()
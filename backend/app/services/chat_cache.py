@@ -0,0 +1,137 @@
+"""
+Semantic cache for /chat itineraries.
+
+Paraphrased requests ("things to do with kids" / "family friendly activities")
+should not each pay for a query rewrite, two KNN searches and a full Gemini
+generation. Finished chats are stored as their recorded event stream, keyed by
+the embedding of the normalized query. A new query whose embedding is at least
+CHAT_CACHE_THRESHOLD cosine-similar to a fresh entry replays that stream through
+the same SSE protocol. The cache is an LRU bounded by CHAT_CACHE_MAX_ENTRIES and
+is cleared whenever the attraction catalog changes.
+
+The planner prompt carries today's date and each attraction's "Open now", so an
+entry also expires at the end of the NYC hour it was generated in, whatever
+CHAT_CACHE_TTL says.
+"""
+import os
+import time
+from datetime import datetime, timedelta
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .catalog_version import catalog_version
+from .opening_hours import CATALOG_TIMEZONE
+
+CHAT_CACHE_ENABLED = os.getenv("CHAT_CACHE", "1").lower() not in ("0", "false", "no")
+CHAT_CACHE_THRESHOLD = float(os.getenv("CHAT_CACHE_THRESHOLD", "0.92"))
+CHAT_CACHE_TTL = float(os.getenv("CHAT_CACHE_TTL", str(6 * 60 * 60)))
+CHAT_CACHE_MAX_ENTRIES = int(os.getenv("CHAT_CACHE_MAX_ENTRIES", "512"))
+
+
+def seconds_left_in_hour(at: Optional[datetime] = None) -> float:
+    """Seconds until the current hour ends in the catalog's timezone (open-now and the date change on it)."""
+    at = at or datetime.now(CATALOG_TIMEZONE)
+    next_hour = at.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+    return (next_hour - at).total_seconds()
+
+
+def _unit(vector: Sequence[float]) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class CachedChat:
+    __slots__ = ("query", "vector", "events", "expires_at")
+
+    def __init__(self, query: str, vector: Optional[np.ndarray], events: List[Dict[str, Any]], expires_at: float):
+        self.query = query
+        self.vector = vector
+        self.events = events
+        self.expires_at = expires_at
+
+
+class SemanticCache:
+    """LRU of finished chat event streams, looked up by exact query or embedding similarity."""
+
+    def __init__(
+        self,
+        threshold: float = CHAT_CACHE_THRESHOLD,
+        ttl: float = CHAT_CACHE_TTL,
+        max_entries: int = CHAT_CACHE_MAX_ENTRIES,
+    ):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, CachedChat]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_exact(self, query: str) -> Optional[List[Dict[str, Any]]]:
+        """Events for an identical normalized query (no embedding needed)."""
+        entry = self._fresh(query)
+        if entry is None:
+            return None
+        self._entries.move_to_end(query)
+        self.hits += 1
+        return entry.events
+
+    def lookup(self, query: str, vector: Optional[Sequence[float]]) -> Optional[Tuple[List[Dict[str, Any]], float]]:
+        """(events, similarity) of the most similar fresh entry above the threshold, or None."""
+        events = self.get_exact(query)
+        if events is not None:
+            return events, 1.0
+        if vector is None:
+            self.misses += 1
+            return None
+
+        self._expire()
+        keyed = [(key, entry) for key, entry in self._entries.items() if entry.vector is not None]
+        if not keyed:
+            self.misses += 1
+            return None
+        matrix = np.stack([entry.vector for _, entry in keyed])
+        similarities = matrix @ _unit(vector)
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.threshold:
+            self.misses += 1
+            return None
+
+        key, entry = keyed[best]
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry.events, float(similarities[best])
+
+    def store(self, query: str, vector: Optional[Sequence[float]], events: List[Dict[str, Any]]):
+        unit = _unit(vector) if vector is not None else None
+        self._entries.pop(query, None)
+        ttl = min(self.ttl, seconds_left_in_hour())
+        self._entries[query] = CachedChat(query, unit, list(events), time.monotonic() + ttl)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self):
+        """Drop every entry (called when the catalog changes)."""
+        self._entries.clear()
+
+    def _fresh(self, query: str) -> Optional[CachedChat]:
+        entry = self._entries.get(query)
+        if entry is not None and entry.expires_at <= time.monotonic():
+            del self._entries[query]
+            return None
+        return entry
+
+    def _expire(self):
+        now = time.monotonic()
+        for key in [key for key, entry in self._entries.items() if entry.expires_at <= now]:
+            del self._entries[key]
+
+
+# Process-wide chat cache, cleared whenever the catalog version changes
+chat_cache = SemanticCache()
+catalog_version.on_change(chat_cache.invalidate)
@@ -0,0 +1,152 @@
+"""
+Multi-turn chat sessions.
+
+A session remembers what the first turn retrieved (candidate scores and the
+attractions packed into the planner context) and the recent turns, so a
+follow-up ("make it shorter", "add lunch near there") skips the query rewrite.
+Pure refinements skip retrieval entirely; other follow-ups run a single
+raw-query KNN search and only pack attractions not yet shown to the planner.
+The prompt carries the previous answer instead of the full attraction context.
+
+Sessions belong to the signed-in user who started them (anonymous sessions are
+reachable by id only). They expire after CHAT_SESSION_TTL seconds idle and are
+bounded per user (CHAT_SESSIONS_PER_USER) and overall (CHAT_SESSION_MAX), least
+recently used first; each keeps at most CHAT_SESSION_MAX_TURNS turns with
+answers clipped to CHAT_SESSION_ANSWER_CHARS.
+"""
+import os
+import re
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+CHAT_SESSION_TTL = float(os.getenv("CHAT_SESSION_TTL", str(30 * 60)))
+CHAT_SESSION_MAX = int(os.getenv("CHAT_SESSION_MAX", "1000"))
+CHAT_SESSIONS_PER_USER = int(os.getenv("CHAT_SESSIONS_PER_USER", "5"))
+CHAT_SESSION_MAX_TURNS = int(os.getenv("CHAT_SESSION_MAX_TURNS", "6"))
+CHAT_SESSION_ANSWER_CHARS = int(os.getenv("CHAT_SESSION_ANSWER_CHARS", "6000"))
+CHAT_SESSION_MAX_CANDIDATES = int(os.getenv("CHAT_SESSION_MAX_CANDIDATES", "100"))
+
+# Follow-ups that only reshape the previous answer and need no new attractions. They must refer to
+# the answer ("make it shorter", "put that in a table"), so "a table near there" still searches.
+REFINEMENT_MAX_WORDS = 10
+_ANSWER = r"(it|that|this|them|the (plan|itinerary|list|answer|schedule|response))"
+_SHAPE = r"(shorter|longer|simpler|briefer|brief|concise|more concise|more compact|less detailed|more detailed)"
+_REFINEMENTS = (
+    re.compile(rf"\b(make|keep) {_ANSWER} {_SHAPE}\b"),
+    re.compile(
+        rf"\b(shorten|lengthen|simplify|summari[sz]e|condense|reformat|format|rephrase|rewrite|reorder|rearrange|"
+        rf"translate|put|turn|convert) {_ANSWER}\b"
+    ),
+    re.compile(r"^(shorter|longer|simpler|more concise|less detail|more detail|tl;?dr)\b"),
+    re.compile(r"\b(as|in|into) (a )?(table|bullet points|bullets|bullet list|numbered list)\b"),
+)
+
+
+def is_refinement(query: str) -> bool:
+    """True for short follow-ups that only ask to reshape the previous answer."""
+    query = query.lower().strip()
+    return len(query.split()) <= REFINEMENT_MAX_WORDS and any(pattern.search(query) for pattern in _REFINEMENTS)
+
+
+class ChatSession:
+
+    def __init__(self, session_id: str, owner: Optional[int]):
+        self.id = session_id
+        self.owner = owner
+        self.turns: List[Tuple[str, str]] = []  # (user query, clipped answer)
+        self.candidates: Dict[int, float] = {}  # attraction id -> best retrieval score
+        self.packed_ids: List[int] = []  # attractions already put in front of the planner
+        self.last_used = time.monotonic()
+
+    @property
+    def is_follow_up(self) -> bool:
+        return bool(self.turns)
+
+    @property
+    def seen_ids(self) -> Set[int]:
+        """Attractions the planner has already been shown (retrieved but unpacked ones were not)."""
+        return set(self.packed_ids)
+
+    @property
+    def last_answer(self) -> str:
+        return self.turns[-1][1] if self.turns else ""
+
+    @property
+    def earlier_queries(self) -> List[str]:
+        return [query for query, _ in self.turns]
+
+    def add_candidates(self, scored: Iterable[Tuple[int, float]]):
+        for attraction_id, score in scored:
+            if score > self.candidates.get(attraction_id, float("-inf")):
+                self.candidates[attraction_id] = score
+        if len(self.candidates) > CHAT_SESSION_MAX_CANDIDATES:
+            best = sorted(self.candidates.items(), key=lambda item: -item[1])[:CHAT_SESSION_MAX_CANDIDATES]
+            self.candidates = dict(best)
+
+    def add_packed(self, ids: Iterable[int]):
+        self.packed_ids.extend(i for i in ids if i not in self.packed_ids)
+
+    def record_turn(self, query: str, answer: str):
+        self.turns.append((query, answer[-CHAT_SESSION_ANSWER_CHARS:]))
+        del self.turns[:-CHAT_SESSION_MAX_TURNS]
+        self.last_used = time.monotonic()
+
+    def event(self) -> Dict[str, Any]:
+        """Tells the client which session to send follow-ups to."""
+        return {"type": "session", "session_id": self.id, "turn": len(self.turns) + 1, "done": False}
+
+
+class SessionStore:
+
+    def __init__(
+        self,
+        ttl: float = CHAT_SESSION_TTL,
+        max_sessions: int = CHAT_SESSION_MAX,
+        per_user: int = CHAT_SESSIONS_PER_USER,
+    ):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.per_user = per_user
+        self._sessions: "OrderedDict[str, ChatSession]" = OrderedDict()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def get(self, session_id: Optional[str], owner: Optional[int]) -> Optional[ChatSession]:
+        """A live session with this id owned by `owner`, or None."""
+        self._expire()
+        session = self._sessions.get(session_id) if session_id else None
+        if session is None or session.owner != owner:
+            return None
+        session.last_used = time.monotonic()
+        self._sessions.move_to_end(session.id)
+        return session
+
+    def get_or_create(self, session_id: Optional[str], owner: Optional[int]) -> ChatSession:
+        session = self.get(session_id, owner)
+        if session is not None:
+            return session
+        session = ChatSession(uuid.uuid4().hex, owner)
+        if owner is not None:
+            owned = [s.id for s in self._sessions.values() if s.owner == owner]
+            for stale in owned[: max(0, len(owned) - self.per_user + 1)]:
+                del self._sessions[stale]
+        self._sessions[session.id] = session
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+        return session
+
+    def _expire(self):
+        cutoff = time.monotonic() - self.ttl
+        # Least recently used first, so stop at the first live one
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if session.last_used > cutoff:
+                break
+            del self._sessions[session.id]
+
+
+# Process-wide session store for /chat
+chat_sessions = SessionStore()
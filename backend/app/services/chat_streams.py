@@ -0,0 +1,207 @@
+"""
+Resumable /chat streams.
+
+Each chat generation runs in a producer task that appends numbered events
+to a ChatStream. SSE connections are only subscribers of that stream, and
+every frame carries the id "<stream id>:<seq>". When a flaky connection drops,
+the client reconnects with Last-Event-ID (EventSource does this on its own).
+The reconnect resumes from the replay buffer and keeps following the
+generation if it is still running, instead of paying for a new one.
+
+Bounds:
+- A stream keeps at most CHAT_STREAM_MAX_EVENTS events. A follower that falls
+  further behind gets an error event instead of a silent gap.
+- A finished stream stays resumable for CHAT_STREAM_TTL seconds.
+- The registry holds at most CHAT_STREAM_MAX_STREAMS streams.
+- A generation nobody follows for CHAT_STREAM_GRACE seconds (2.5 by default)
+  is cancelled and its admission slot released, counted as
+  chat_cancelled_total{stage="abandoned"}. The grace only covers a quick
+  reconnect, so a client that goes away for good stops costing LLM tokens
+  almost as soon as it disconnects.
+"""
+import os
+import time
+import uuid
+import asyncio
+from collections import OrderedDict, deque
+from itertools import islice
+from typing import Any, AsyncGenerator, AsyncIterator, Callable, Deque, Dict, Optional, Tuple
+
+from .serialization import dumps
+from .cancellation import count_cancelled
+from ..__init__ import logger
+
+CHAT_STREAM_TTL = float(os.getenv("CHAT_STREAM_TTL", "120"))
+CHAT_STREAM_GRACE = float(os.getenv("CHAT_STREAM_GRACE", "2.5"))
+CHAT_STREAM_MAX_EVENTS = int(os.getenv("CHAT_STREAM_MAX_EVENTS", "2000"))
+CHAT_STREAM_MAX_STREAMS = int(os.getenv("CHAT_STREAM_MAX_STREAMS", "256"))
+
+# Sent to a follower that fell more than CHAT_STREAM_MAX_EVENTS behind
+LAGGED_EVENT = {"type": "error", "message": "Stream fell too far behind and events were dropped", "done": True}
+
+
+def event_id(stream_id: str, seq: int) -> str:
+    return f"{stream_id}:{seq}"
+
+
+def parse_event_id(value: Optional[str]) -> Optional[Tuple[str, int]]:
+    """(stream id, seq) from a Last-Event-ID header, None when absent or malformed."""
+    if not value:
+        return None
+    stream_id, _, seq = value.strip().rpartition(":")
+    if not stream_id or not seq.lstrip("-").isdigit():
+        return None
+    return stream_id, int(seq)
+
+
+class ChatStream:
+    """Numbered, pre-encoded events of one generation plus its subscribers."""
+
+    def __init__(self, stream_id: str, max_events: int = CHAT_STREAM_MAX_EVENTS):
+        self.id = stream_id
+        self.max_events = max_events
+        self.events: Deque[Tuple[int, str]] = deque(maxlen=max_events)  # (seq, JSON data)
+        self.next_seq = 0
+        self.done = False
+        self.finished_at: Optional[float] = None
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+        self._grace: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def first_seq(self) -> int:
+        """Oldest seq still buffered."""
+        return self.events[0][0] if self.events else self.next_seq
+
+    def can_resume(self, last_seq: int) -> bool:
+        return last_seq + 1 >= self.first_seq
+
+    def append(self, event: Dict[str, Any]):
+        self.events.append((self.next_seq, dumps(event).decode()))
+        self.next_seq += 1
+        self._wake()
+
+    def finish(self):
+        self._cancel_grace()
+        self.done = True
+        self.finished_at = time.monotonic()
+        self._wake()
+
+    def _wake(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def follow(self, after_seq: int = -1) -> AsyncGenerator[Tuple[int, str], None]:
+        """Buffered events after `after_seq`, then live ones until the stream finishes."""
+        self.subscribers += 1
+        self._cancel_grace()
+        try:
+            while True:
+                changed = self._changed
+                if not self.can_resume(after_seq):
+                    # Fell behind the buffer: end with an error rather than silently skipping events.
+                    # The id stays at the last delivered event, which cannot be resumed either.
+                    yield after_seq, dumps(LAGGED_EVENT).decode()
+                    return
+                # Copied, since appends may rotate the deque while this generator is suspended
+                pending = list(islice(self.events, after_seq + 1 - self.first_seq, None))
+                for seq, data in pending:
+                    yield seq, data
+                    after_seq = seq
+                if pending:
+                    continue
+                if self.done:
+                    return
+                await changed.wait()
+        finally:
+            self.subscribers -= 1
+            if not self.subscribers and not self.done:
+                self._start_grace()
+
+    def _start_grace(self):
+        self._cancel_grace()
+        self._grace = asyncio.get_running_loop().call_later(CHAT_STREAM_GRACE, self._abandon)
+
+    def _cancel_grace(self):
+        if self._grace is not None:
+            self._grace.cancel()
+            self._grace = None
+
+    def _abandon(self):
+        if not self.subscribers and not self.done and self.task is not None:
+            logger.info(f"Chat stream {self.id} abandoned, cancelling generation")
+            count_cancelled("abandoned")
+            self.task.cancel()
+
+
+class StreamRegistry:
+    """Live and recently finished chat streams by id."""
+
+    def __init__(self, ttl: float = CHAT_STREAM_TTL, max_streams: int = CHAT_STREAM_MAX_STREAMS):
+        self.ttl = ttl
+        self.max_streams = max_streams
+        self._streams: "OrderedDict[str, ChatStream]" = OrderedDict()
+
+    def __len__(self):
+        return len(self._streams)
+
+    def start(self, events: AsyncIterator[Dict[str, Any]], on_done: Optional[Callable[[], Any]] = None) -> ChatStream:
+        """Run `events` in a producer task feeding a new stream; on_done runs when it ends."""
+        self._expire()
+        stream = ChatStream(uuid.uuid4().hex)
+        self._streams[stream.id] = stream
+
+        async def produce():
+            try:
+                async for event in events:
+                    stream.append(event)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Chat stream {stream.id} failed: {e}")
+                stream.append({"type": "error", "message": str(e), "done": True})
+            finally:
+                aclose = getattr(events, "aclose", None)
+                if aclose is not None:
+                    await aclose()
+                stream.finish()
+                if on_done is not None:
+                    on_done()
+
+        stream.task = asyncio.create_task(produce())
+        # Abandoned even if no connection ever follows it
+        stream._start_grace()
+        return stream
+
+    def get(self, stream_id: str) -> Optional[ChatStream]:
+        self._expire()
+        return self._streams.get(stream_id)
+
+    def resume_point(self, last_event_id: Optional[str]) -> Optional[Tuple[ChatStream, int]]:
+        """(stream, last seq seen) when Last-Event-ID names a stream that can still be resumed."""
+        parsed = parse_event_id(last_event_id)
+        if parsed is None:
+            return None
+        stream = self.get(parsed[0])
+        if stream is None or not stream.can_resume(parsed[1]):
+            return None
+        return stream, parsed[1]
+
+    def _expire(self):
+        now = time.monotonic()
+        for stream_id in [
+            stream_id
+            for stream_id, stream in self._streams.items()
+            if stream.done and now - stream.finished_at > self.ttl
+        ]:
+            del self._streams[stream_id]
+        # Over the bound: drop the oldest finished streams (running ones are bounded by admission)
+        excess = len(self._streams) - self.max_streams
+        if excess > 0:
+            for stream_id in [stream_id for stream_id, stream in self._streams.items() if stream.done][:excess]:
+                del self._streams[stream_id]
+
+
+# Process-wide registry for /chat
+chat_streams = StreamRegistry()
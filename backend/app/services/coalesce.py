@@ -0,0 +1,89 @@
+"""
+Token coalescing for chat SSE streams.
+
+Gemini yields many small chunks; sending each as its own SSE event costs a
+JSON encode, a write and a client re-render per chunk. Consecutive `token`
+events are merged and flushed every CHAT_COALESCE_MS milliseconds or once
+CHAT_COALESCE_BYTES bytes are buffered, whichever comes first. The first token
+is sent immediately so time to first token is unchanged, and any other event
+flushes the buffer before it goes out. CHAT_COALESCE_MS=0 disables coalescing.
+"""
+import os
+import asyncio
+from typing import Any, AsyncGenerator, AsyncIterator, Dict, List, Optional
+
+CHAT_COALESCE_MS = float(os.getenv("CHAT_COALESCE_MS", "50"))
+CHAT_COALESCE_BYTES = int(os.getenv("CHAT_COALESCE_BYTES", "512"))
+
+
+def _token_event(parts: List[str]) -> Dict[str, Any]:
+    return {"type": "token", "content": "".join(parts), "done": False}
+
+
+async def coalesce_tokens(
+    events: AsyncIterator[Dict[str, Any]],
+    window_ms: float = CHAT_COALESCE_MS,
+    max_bytes: int = CHAT_COALESCE_BYTES,
+) -> AsyncGenerator[Dict[str, Any], None]:
+    """Merge consecutive token events per time window / byte budget."""
+    if window_ms <= 0:
+        async for event in events:
+            yield event
+        return
+
+    loop = asyncio.get_running_loop()
+    window = window_ms / 1000
+    parts: List[str] = []
+    size = 0
+    deadline: Optional[float] = None
+    first_sent = False
+    # The pending read survives flush timeouts: cancelling it would cancel the upstream generator
+    pending: Optional[asyncio.Task] = None
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(events.__anext__())
+            timeout = None if deadline is None else max(0.0, deadline - loop.time())
+            done, _ = await asyncio.wait({pending}, timeout=timeout)
+
+            if not done:
+                # Window elapsed with no new event: flush what we have
+                yield _token_event(parts)
+                parts, size, deadline = [], 0, None
+                continue
+
+            task, pending = pending, None
+            try:
+                event = task.result()
+            except StopAsyncIteration:
+                break
+
+            if event.get("type") == "token":
+                content = str(event.get("content", ""))
+                if not first_sent:
+                    first_sent = True
+                    yield event
+                    continue
+                parts.append(content)
+                size += len(content.encode())
+                if deadline is None:
+                    deadline = loop.time() + window
+                if size >= max_bytes:
+                    yield _token_event(parts)
+                    parts, size, deadline = [], 0, None
+                continue
+
+            if parts:
+                yield _token_event(parts)
+                parts, size, deadline = [], 0, None
+            yield event
+
+        if parts:
+            yield _token_event(parts)
+    finally:
+        if pending is not None and not pending.done():
+            pending.cancel()
+            await asyncio.gather(pending, return_exceptions=True)
+        aclose = getattr(events, "aclose", None)
+        if aclose is not None:
+            await aclose()
@@ -0,0 +1,139 @@
+"""
+Planner context packing.
+
+Retrieved attractions are ranked by retrieval score, deduplicated (the catalog
+can hold the same venue under several place ids) and packed as compact
+per-attraction summaries until CONTEXT_TOKEN_BUDGET is spent. Summaries are
+built once at ingest time and stored on the attraction row; rows ingested
+before that get theirs computed when they are loaded.
+"""
+import os
+import re
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1200"))
+SUMMARY_MAX_CHARS = int(os.getenv("SUMMARY_MAX_CHARS", "280"))
+
+# Attraction fields a summary is built from
+SUMMARY_FIELDS = (
+    "location",
+    "description",
+    "primary_type",
+    "vicinity",
+    "formatted_address",
+    "rating",
+    "user_ratings_total",
+    "price_level",
+)
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_NON_WORD = re.compile(r"[^\w]+")
+
+OPEN_LABELS = {True: "Yes", False: "No", None: "Unknown"}
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough LLM token count (~4 characters per token), good enough for budgeting."""
+    return (len(text) + 3) // 4
+
+
+def clip_sentences(text: str, max_chars: int) -> str:
+    """Whole leading sentences of text within max_chars (hard-cut with an ellipsis if even one is too long)."""
+    text = " ".join((text or "").split())
+    if len(text) <= max_chars:
+        return text
+    clipped = ""
+    for sentence in _SENTENCE_END.split(text):
+        candidate = f"{clipped} {sentence}".strip()
+        if len(candidate) > max_chars:
+            break
+        clipped = candidate
+    return clipped or text[: max_chars - 1].rstrip() + "…"
+
+
+def build_summary(
+    location: str,
+    description: Optional[str] = None,
+    primary_type: Optional[str] = None,
+    vicinity: Optional[str] = None,
+    formatted_address: Optional[str] = None,
+    rating: Optional[float] = None,
+    user_ratings_total: Optional[int] = None,
+    price_level: Optional[int] = None,
+) -> str:
+    """One-paragraph planner summary: name, kind, area, a clipped description, rating and price."""
+    kind = ", ".join(part for part in ((primary_type or "").replace("_", " "), vicinity) if part)
+    parts = [f"{location} ({kind})" if kind else location]
+    # Places without an editorial summary were ingested with the address as description
+    if description and description not in (vicinity, formatted_address):
+        parts.append(clip_sentences(description, SUMMARY_MAX_CHARS))
+    if rating:
+        parts.append(f"Rated {rating}/5 ({user_ratings_total or 0} reviews)")
+    if price_level:
+        parts.append("Price " + "$" * int(price_level))
+    return ". ".join(part.rstrip(".") for part in parts) + "."
+
+
+def summarize_attraction(attraction) -> str:
+    """build_summary for an Attraction (or anything with the SUMMARY_FIELDS attributes)."""
+    return build_summary(**{name: getattr(attraction, name, None) for name in SUMMARY_FIELDS})
+
+
+def dedupe_key(attraction) -> str:
+    """Same venue under different place ids: same name at the same address."""
+    address = getattr(attraction, "formatted_address", None) or getattr(attraction, "address", None) or ""
+    return _NON_WORD.sub(" ", f"{attraction.location} {address}".lower()).strip()
+
+
+def format_entry(attraction, open_now: Optional[bool] = None) -> str:
+    summary = getattr(attraction, "summary", None) or summarize_attraction(attraction)
+    address = getattr(attraction, "formatted_address", None) or getattr(attraction, "address", None) or "N/A"
+    return f"**{attraction.location}**\n- {summary}\n- Address: {address}\n- Open now: {OPEN_LABELS[open_now]}"
+
+
+def pack_context(
+    candidates: Sequence[Tuple[int, float]],
+    attractions: Dict[int, object],
+    open_status: Optional[Dict[int, Optional[bool]]] = None,
+    budget: int = CONTEXT_TOKEN_BUDGET,
+    formatter: Callable = format_entry,
+) -> Tuple[str, List[int]]:
+    """
+    Pack the best candidates into at most `budget` tokens.
+
+    candidates are (attraction id, retrieval score) pairs; attractions maps ids to
+    rows. Entries are taken best score first, duplicates are skipped, and an entry
+    that does not fit is skipped in favour of smaller ones further down. The best
+    entry is always included. Returns (context text, packed ids).
+    """
+    open_status = open_status or {}
+    ranked = sorted(candidates, key=lambda c: -c[1])
+    entries: List[str] = []
+    packed: List[int] = []
+    seen = set()
+    used = 0
+    for attraction_id, _ in ranked:
+        attraction = attractions.get(attraction_id)
+        if attraction is None or attraction_id in packed:
+            continue
+        key = dedupe_key(attraction)
+        if key in seen:
+            continue
+        entry = formatter(attraction, open_status.get(attraction_id))
+        cost = estimate_tokens(entry) + 1
+        if entries and used + cost > budget:
+            continue
+        seen.add(key)
+        entries.append(entry)
+        packed.append(attraction_id)
+        used += cost
+    return "\n---\n".join(entries), packed
+
+
+def best_scores(scored: Iterable[Tuple[int, float]]) -> Dict[int, float]:
+    """Highest score per id (an attraction has one embedding per description chunk, tag and review)."""
+    best: Dict[int, float] = {}
+    for attraction_id, score in scored:
+        if score > best.get(attraction_id, float("-inf")):
+            best[attraction_id] = score
+    return best
@@ -1,12 +1,17 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_
-from typing import List, Dict
-from ..models.atractions import Attraction, Embedding
+from sqlalchemy import select, and_, func, text
+from sqlalchemy.orm import load_only
+from typing import List, Dict, Optional, Tuple
+from ..models.atractions import Attraction, AttractionTombstone, Embedding
 from .google_maps_service import GoogleMapsService
 from .embedding_service import EmbeddingService
 import asyncio
 from datetime import datetime
 from .embedding import get_similar
+from .catalog_version import catalog_version
+from .opening_hours import compile_opening_hours
+from .context_packer import summarize_attraction
+from .pagination import DEFAULT_PAGE_SIZE, apply_keyset, clamp_limit, load_columns, next_cursor
 class DataCollectionService:
     def __init__(self):
         self.google_maps_service = GoogleMapsService()
@@ -65,6 +70,7 @@ class DataCollectionService:
                     
                     # Business hours
                     opening_hours=place.get('opening_hours', {}),
+                    open_intervals=compile_opening_hours(place.get('opening_hours')),
                     business_status=place.get('business_status', ''),
                     
                     # Location details
@@ -88,6 +94,7 @@ class DataCollectionService:
                     tags=place.get('types', []),
                     images=place.get('photos', [])
                 )
+                attraction.summary = summarize_attraction(attraction)
                 
                 db.add(attraction)
                 await db.commit()
@@ -104,6 +111,8 @@ class DataCollectionService:
                 await db.rollback()
                 continue
         
+        if created_attractions:
+            catalog_version.bump()
         print(f"Successfully created {len(created_attractions)} attractions")
         return created_attractions
     
@@ -159,6 +168,7 @@ class DataCollectionService:
                     
                     # Business hours
                     opening_hours=place.get('opening_hours', {}),
+                    open_intervals=compile_opening_hours(place.get('opening_hours')),
                     business_status=place.get('business_status', ''),
                     
                     # Location details
@@ -182,6 +192,7 @@ class DataCollectionService:
                     tags=place.get('types', []),
                     images=place.get('photos', [])
                 )
+                attraction.summary = summarize_attraction(attraction)
                 
                 db.add(attraction)
                 await db.commit()
@@ -198,6 +209,8 @@ class DataCollectionService:
                 await db.rollback()
                 continue
         
+        if created_attractions:
+            catalog_version.bump()
         print(f"Successfully created {len(created_attractions)} attractions")
         return created_attractions
     
@@ -286,12 +299,12 @@ class DataCollectionService:
         - Fallback: formatted_address (when place_id is null)
         Returns number of deleted rows.
         """
-        deleted = 0
+        deleted_rows = []
         # Delete duplicates by place_id (keep max(last_updated), then max(id) as tiebreaker)
         try:
             # Build a CTE to find ids to delete for duplicated place_id
             result = await db.execute(
-                """
+                text("""
                 WITH ranked AS (
                   SELECT id, place_id,
                          ROW_NUMBER() OVER (
@@ -304,17 +317,17 @@ class DataCollectionService:
                 DELETE FROM attraction a
                 USING ranked r
                 WHERE a.id = r.id AND r.rn > 1
-                RETURNING a.id
-                """
+                RETURNING a.id, a.place_id
+                """)
             )
-            deleted += len(result.fetchall())
+            deleted_rows += result.fetchall()
         except Exception as e:
             print("dedupe (place_id) warning:", e)
 
         # Delete duplicates by formatted_address when place_id is NULL
         try:
             result2 = await db.execute(
-                """
+                text("""
                 WITH ranked AS (
                   SELECT id, formatted_address,
                          ROW_NUMBER() OVER (
@@ -327,17 +340,17 @@ class DataCollectionService:
                 DELETE FROM attraction a
                 USING ranked r
                 WHERE a.id = r.id AND r.rn > 1
-                RETURNING a.id
-                """
+                RETURNING a.id, a.place_id
+                """)
             )
-            deleted += len(result2.fetchall())
+            deleted_rows += result2.fetchall()
         except Exception as e:
             print("dedupe (formatted_address) warning:", e)
 
         # Optionally, clear duplicate embeddings rows per attraction/order/start_end
         try:
             await db.execute(
-                """
+                text("""
                 DELETE FROM embedding e
                 USING (
                   SELECT id,
@@ -348,13 +361,21 @@ class DataCollectionService:
                   FROM embedding
                 ) d
                 WHERE e.id = d.id AND d.rn > 1
-                """
+                """)
             )
         except Exception as e:
             print("dedupe (embeddings) warning:", e)
 
+        # Tombstones let export delta syncs remove the rows on clients
+        if deleted_rows:
+            now = datetime.now().isoformat()
+            for attraction_id, place_id in deleted_rows:
+                await db.merge(AttractionTombstone(attraction_id=attraction_id, place_id=place_id, deleted=now))
+
         await db.commit()
-        return deleted
+        if deleted_rows:
+            catalog_version.bump()
+        return len(deleted_rows)
     
     async def get_all_attractions(self, db: AsyncSession) -> List[Attraction]:
         """Get up to 50 attractions from the database"""
@@ -363,6 +384,58 @@ class DataCollectionService:
         )
         return result.scalars().all()
     
+    async def get_attractions_page(
+        self,
+        db: AsyncSession,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+        sort: str = "id",
+        fields: Optional[Tuple[str, ...]] = None,
+        place_type: Optional[str] = None,
+        min_rating: Optional[float] = None,
+    ) -> Tuple[List[Attraction], Optional[str]]:
+        """
+        Get one keyset page of attractions and the cursor for the next page (None on the last page).
+        Only the projected columns (plus the sort key) are loaded; everything else stays deferred.
+        """
+        limit = clamp_limit(limit)
+        stmt = select(Attraction).options(load_only(*load_columns(fields, sort)))
+        if place_type:
+            stmt = stmt.where(Attraction.types.any(place_type))
+        if min_rating is not None:
+            stmt = stmt.where(func.coalesce(Attraction.rating, 0.0) >= min_rating)
+        stmt = apply_keyset(stmt, sort, cursor).limit(limit + 1)
+
+        result = await db.execute(stmt)
+        rows = result.scalars().all()
+        return rows[:limit], next_cursor(rows, sort, limit)
+
+    async def get_attractions_by_ids(
+        self,
+        db: AsyncSession,
+        ids: List[int],
+        fields: Optional[Tuple[str, ...]] = None,
+    ) -> List[Attraction]:
+        """Fetch attractions by id in one query, returned in the order of `ids` (unknown ids are skipped)."""
+        if not ids:
+            return []
+        stmt = select(Attraction).where(Attraction.id.in_(ids))
+        if fields:
+            stmt = stmt.options(load_only(*load_columns(fields, "id")))
+        result = await db.execute(stmt)
+        by_id = {attraction.id: attraction for attraction in result.scalars().all()}
+        return [by_id[i] for i in ids if i in by_id]
+
+    async def find_attraction_by_name(self, db: AsyncSession, name: str) -> Optional[Attraction]:
+        """Best-known attraction whose name matches `name` (case-insensitive substring)."""
+        result = await db.execute(
+            select(Attraction)
+            .where(Attraction.location.ilike(f"%{name.strip()}%"))
+            .order_by(Attraction.user_ratings_total.desc().nulls_last())
+            .limit(1)
+        )
+        return result.scalars().first()
+
     async def search_attractions(self, db: AsyncSession, query: str) -> List[Attraction]:
         """Search attractions in the database by location or description"""
 
@@ -381,7 +454,7 @@ class DataCollectionService:
         )
         attractions = result.scalars().all()
         
-        return [attraction.__json__() for attraction in attractions]
+        return attractions
     
 
-    
\ No newline at end of file
+    
\ No newline at end of file
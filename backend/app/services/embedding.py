@@ -1,4 +1,5 @@
 import os
+import asyncio
 import boto3
 import json
 from dotenv import load_dotenv
@@ -6,6 +7,8 @@ from sqlalchemy import select
 from ..models.atractions import Embedding
 import numpy as np
 from ..__init__ import logger
+from .timing import stage
+from .fake_backends import EMBEDDING_BACKEND, fake_embeddings
 
 load_dotenv()
 
@@ -31,7 +34,15 @@ async def get_similar(text: str, db, max_results: int = 20, threshold: float = 0
         Return attractions from the database similar to the given text.
         Threshold: 0..1, minimum similarity (0.2 means >= 80% similar).
         """
-        vector = await get_embedding(text)  # should be a list or numpy array
+        return [r for r, _ in await get_similar_scored(text, db, max_results, threshold)]
+
+async def get_similar_scored(text: str, db, max_results: int = 20, threshold: float = 0.2, vector=None):
+        """
+        Like get_similar, but returns (embedding row, cosine similarity) pairs, most similar first.
+        Pass `vector` when the text was already embedded (e.g. for the chat cache lookup).
+        """
+        if vector is None:
+            vector = await get_embedding(text)  # should be a list or numpy array
         # Step 1: order by cosine distance in SQL for index use
         stmt = (
             select(Embedding)
@@ -40,7 +51,8 @@ async def get_similar(text: str, db, max_results: int = 20, threshold: float = 0
         )
 
         # Correct async usage: await scalars() then call .all()
-        candidates = await db.scalars(stmt)
+        with stage("knn"):
+            candidates = await db.scalars(stmt)
         
         results = []
         min_similarity = 1.0 - threshold  # convert distance threshold to similarity
@@ -48,7 +60,7 @@ async def get_similar(text: str, db, max_results: int = 20, threshold: float = 0
             sim = cosine_similarity(np.array(r.embedding), np.array(vector))
             if sim < min_similarity:
                 break  # stop iterating, further items will be less similar
-            results.append(r)
+            results.append((r, sim))
     
         logger.debug(f"Found this many results: {len(results)}")
 
@@ -56,6 +68,9 @@ async def get_similar(text: str, db, max_results: int = 20, threshold: float = 0
 
 async def get_embedding(text: str) -> list[float]:
     """Fetches a 256-dimensional embedding from Amazon Bedrock's Titan Text Embeddings V2 model."""
+    if EMBEDDING_BACKEND == "fake":
+        with stage("embedding"):
+            return await fake_embeddings.embed(text)
 
     payload = {
         "inputText": text,
@@ -63,16 +78,19 @@ async def get_embedding(text: str) -> list[float]:
         "embeddingTypes": ["float"]  
     }
 
-    try:
-        # Invoke the model
+    def invoke():
         response = bedrock.invoke_model(
             body=json.dumps(payload),
             contentType='application/json',
             accept='application/json',
             modelId='amazon.titan-embed-text-v2:0'
         )
-        
-        result = json.loads(response['body'].read())
+        return json.loads(response['body'].read())
+
+    try:
+        # Invoke the model (boto3 is blocking, so keep it off the event loop)
+        with stage("embedding"):
+            result = await asyncio.to_thread(invoke)
         embedding = result.get('embedding', None)
         if embedding is None:
             raise ValueError("Embedding not found in the response.")
@@ -0,0 +1,123 @@
+"""
+Streaming NDJSON catalog export.
+
+Rows are streamed from a server-side cursor in EXPORT_BATCH_SIZE partitions and
+written out as they arrive, so memory stays bounded by one partition whatever the
+catalog size. Every line is a JSON object with an "op":
+
+    {"op": "upsert", "id": ..., ...attraction fields}
+    {"op": "delete", "id": ..., "deleted": "..."}      (delta syncs only)
+    {"op": "end", "count": ..., "since": "..."}
+
+A client stores the final "since" and passes it back as since= to receive only
+attractions updated, and tombstones of attractions deleted, after it.
+"""
+import os
+import zlib
+from datetime import datetime
+from typing import AsyncIterator, Optional
+
+import zstandard
+from sqlalchemy import select
+from sqlalchemy.orm import load_only
+
+from .. import db as database
+from .serialization import dumps
+from ..models.atractions import Attraction, AttractionTombstone, JSON_FIELDS
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "500"))
+EXPORT_ZSTD_LEVEL = int(os.getenv("EXPORT_ZSTD_LEVEL", "3"))
+EXPORT_GZIP_LEVEL = int(os.getenv("EXPORT_GZIP_LEVEL", "6"))
+
+
+def parse_since(since: Optional[str]) -> Optional[str]:
+    """
+    Normalize since= to the isoformat used by last_updated, so string comparison
+    matches time order. Raises ValueError for unparseable values.
+    """
+    if not since:
+        return None
+    try:
+        return datetime.fromisoformat(since).isoformat()
+    except ValueError:
+        raise ValueError(f"Invalid since: {since} (expected ISO 8601)")
+
+
+def upsert_line(attraction) -> bytes:
+    return dumps({"op": "upsert", **attraction.__json__()}) + b"\n"
+
+
+def delete_line(attraction_id: int, deleted: str) -> bytes:
+    return dumps({"op": "delete", "id": attraction_id, "deleted": deleted}) + b"\n"
+
+
+def end_line(count: int, since: Optional[str]) -> bytes:
+    return dumps({"op": "end", "count": count, "since": since}) + b"\n"
+
+
+async def export_lines(since: Optional[str] = None) -> AsyncIterator[bytes]:
+    """
+    NDJSON chunks (one per partition) for every attraction, or only those changed
+    after `since` plus tombstones. Uses its own session, which lives as long as
+    the response body.
+    """
+    count = 0
+    latest = since
+    async with database.AsyncSessionLocal() as db:
+        stmt = (
+            select(Attraction)
+            .options(load_only(*(getattr(Attraction, name) for name in JSON_FIELDS)))
+            .order_by(Attraction.id)
+            .execution_options(yield_per=EXPORT_BATCH_SIZE)
+        )
+        if since is not None:
+            stmt = stmt.where(Attraction.last_updated > since)
+
+        result = await db.stream_scalars(stmt)
+        async for partition in result.partitions():
+            chunk = []
+            for attraction in partition:
+                chunk.append(upsert_line(attraction))
+                if attraction.last_updated and (latest is None or attraction.last_updated > latest):
+                    latest = attraction.last_updated
+            count += len(partition)
+            # Detach the partition so the identity map does not grow with the export
+            db.expunge_all()
+            yield b"".join(chunk)
+
+        if since is not None:
+            result = await db.stream(
+                select(AttractionTombstone.attraction_id, AttractionTombstone.deleted)
+                .where(AttractionTombstone.deleted > since)
+                .order_by(AttractionTombstone.attraction_id)
+                .execution_options(yield_per=EXPORT_BATCH_SIZE)
+            )
+            async for partition in result.partitions():
+                chunk = []
+                for attraction_id, deleted in partition:
+                    chunk.append(delete_line(attraction_id, deleted))
+                    if latest is None or deleted > latest:
+                        latest = deleted
+                yield b"".join(chunk)
+
+    yield end_line(count, latest)
+
+
+async def zstd_stream(chunks: AsyncIterator[bytes], level: int = EXPORT_ZSTD_LEVEL) -> AsyncIterator[bytes]:
+    """Compress a chunk stream as one zstd frame, flushing a block per chunk so clients see progress."""
+    compressor = zstandard.ZstdCompressor(level=level).compressobj()
+    async for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+async def gzip_stream(chunks: AsyncIterator[bytes], level: int = EXPORT_GZIP_LEVEL) -> AsyncIterator[bytes]:
+    """Compress a chunk stream as one gzip member, sync-flushing per chunk like zstd_stream."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    async for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,124 @@
+"""
+Faceted filtering over the catalog snapshot.
+
+Every facet value owns a bitmap (a Python int, bit i = snapshot row i) of the rows
+that have it. Values of one facet are OR-ed, facets are AND-ed, and counts are
+popcounts, so any combination of filters resolves with a few big-int operations.
+Facet counts are disjunctive: each facet is counted against the filters of all the
+*other* facets, so the client can show what selecting another value would give.
+"""
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence
+
+import numpy as np
+
+# rating_band value -> minimum rating (bands are cumulative, "4+" includes "4.5+")
+RATING_BANDS = {"4.5+": 4.5, "4+": 4.0, "3.5+": 3.5, "3+": 3.0}
+
+FACETS = ("types", "primary_type", "price_level", "rating_band", "business_status", "vicinity")
+
+DEFAULT_FACET_LIMIT = 20
+
+
+def rows_to_bitmap(rows: Sequence[int]) -> int:
+    """Bitmap with the bits of `rows` set, built in one pass."""
+    positions = np.asarray(rows, dtype=np.int64)
+    if not len(positions):
+        return 0
+    buffer = np.zeros(int(positions.max()) // 8 + 1, dtype=np.uint8)
+    np.bitwise_or.at(buffer, positions >> 3, (1 << (positions & 7)).astype(np.uint8))
+    return int.from_bytes(buffer.tobytes(), "little")
+
+
+class FacetIndex:
+    """Per-value row bitmaps for every facet of a snapshot."""
+
+    def __init__(self, records: Sequence):
+        self.size = len(records)
+        self.all_rows = (1 << self.size) - 1
+        # Row positions per value first: OR-ing one bit at a time into a growing int is quadratic
+        rows: Dict[str, Dict[str, List[int]]] = {facet: {} for facet in FACETS}
+
+        def add(facet: str, value: Optional[str], row: int):
+            if value not in (None, ""):
+                rows[facet].setdefault(value, []).append(row)
+
+        for row, record in enumerate(records):
+            for value in record.types or ():
+                add("types", value, row)
+            add("primary_type", record.primary_type, row)
+            add("price_level", None if record.price_level is None else str(record.price_level), row)
+            add("business_status", record.business_status, row)
+            add("vicinity", record.vicinity, row)
+            for band, minimum in RATING_BANDS.items():
+                if record.rating is not None and record.rating >= minimum:
+                    add("rating_band", band, row)
+
+        self.bitmaps: Dict[str, Dict[str, int]] = {
+            facet: {value: rows_to_bitmap(positions) for value, positions in values.items()}
+            for facet, values in rows.items()
+        }
+
+    def facet_bitmap(self, facet: str, values: Iterable[str]) -> int:
+        """Rows having any of `values` for one facet."""
+        bitmaps = self.bitmaps[facet]
+        result = 0
+        for value in values:
+            result |= bitmaps.get(value, 0)
+        return result
+
+    def select(self, filters: Mapping[str, Sequence[str]], base: Optional[int] = None) -> int:
+        """Rows matching every facet filter (and `base`, e.g. an open-now bitmap)."""
+        result = self.all_rows if base is None else base
+        for facet, values in filters.items():
+            if values:
+                result &= self.facet_bitmap(facet, values)
+        return result
+
+    def counts(
+        self,
+        filters: Mapping[str, Sequence[str]],
+        base: Optional[int] = None,
+        limit: int = DEFAULT_FACET_LIMIT,
+    ) -> Dict[str, Dict[str, int]]:
+        """Top `limit` value counts per facet, each facet counted against the other facets' filters."""
+        counts = {}
+        for facet in FACETS:
+            others = {f: v for f, v in filters.items() if f != facet}
+            rows = self.select(others, base)
+            values = (
+                (value, (rows & bitmap).bit_count())
+                for value, bitmap in self.bitmaps[facet].items()
+            )
+            top = sorted((item for item in values if item[1]), key=lambda item: (-item[1], item[0]))[:limit]
+            counts[facet] = dict(top)
+        return counts
+
+    def to_mask(self, bitmap: int) -> np.ndarray:
+        """Boolean row mask for a bitmap (for CatalogSnapshot.page)."""
+        if not self.size:
+            return np.zeros(0, dtype=bool)
+        raw = np.frombuffer(bitmap.to_bytes((self.size + 7) // 8, "little"), dtype=np.uint8)
+        return np.unpackbits(raw, bitorder="little")[: self.size].astype(bool)
+
+    def from_mask(self, mask: np.ndarray) -> int:
+        """Bitmap for a boolean row mask."""
+        packed = np.packbits(np.asarray(mask, dtype=bool), bitorder="little")
+        return int.from_bytes(packed.tobytes(), "little")
+
+
+def parse_facet_filters(params: Mapping[str, Optional[List[str]]]) -> Dict[str, List[str]]:
+    """
+    Normalize facet query parameters. Each may be repeated and/or comma separated.
+    Raises ValueError for unknown rating bands.
+    """
+    filters = {}
+    for facet in FACETS:
+        raw = params.get(facet) or []
+        values = [v.strip() for item in raw for v in item.split(",") if v.strip()]
+        if facet == "rating_band":
+            unknown = [v for v in values if v not in RATING_BANDS]
+            if unknown:
+                raise ValueError(f"Unknown rating_band: {', '.join(unknown)} (use one of {', '.join(RATING_BANDS)})")
+        if values:
+            filters[facet] = values
+    return filters
@@ -0,0 +1,143 @@
+"""
+Local stand-ins for Gemini and Bedrock, for load tests and offline development.
+
+LLM_BACKEND=fake swaps agents.model for FakeGenerativeModel and
+EMBEDDING_BACKEND=fake makes get_embedding return FakeEmbeddings vectors, so
+/chat can be driven at capacity on one box without spending provider quota.
+Both are deterministic per input (same prompt -> same queries, same text ->
+same vector; texts sharing words get similar vectors, so the chat cache and
+KNN behave plausibly), with configurable latency, token rate and failure rate:
+
+    FAKE_LLM_LATENCY_MS          time to first chunk / non-streamed reply (300)
+    FAKE_LLM_TOKENS_PER_SECOND   streaming rate (50)
+    FAKE_LLM_RESPONSE_TOKENS     streamed itinerary length in tokens (200)
+    FAKE_LLM_FAILURE_RATE        probability a call fails, half of them mid-stream (0)
+    FAKE_EMBEDDING_LATENCY_MS    per embedding call (40)
+    FAKE_EMBEDDING_FAILURE_RATE  probability an embedding call fails (0)
+    FAKE_SEED                    seed for failure injection (0)
+"""
+import os
+import random
+import asyncio
+import hashlib
+from typing import AsyncGenerator, List
+
+import numpy as np
+
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini").lower()
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "bedrock").lower()
+
+FAKE_LLM_LATENCY_MS = float(os.getenv("FAKE_LLM_LATENCY_MS", "300"))
+FAKE_LLM_TOKENS_PER_SECOND = float(os.getenv("FAKE_LLM_TOKENS_PER_SECOND", "50"))
+FAKE_LLM_RESPONSE_TOKENS = int(os.getenv("FAKE_LLM_RESPONSE_TOKENS", "200"))
+FAKE_LLM_FAILURE_RATE = float(os.getenv("FAKE_LLM_FAILURE_RATE", "0"))
+FAKE_EMBEDDING_LATENCY_MS = float(os.getenv("FAKE_EMBEDDING_LATENCY_MS", "40"))
+FAKE_EMBEDDING_FAILURE_RATE = float(os.getenv("FAKE_EMBEDDING_FAILURE_RATE", "0"))
+FAKE_SEED = int(os.getenv("FAKE_SEED", "0"))
+
+# Tokens per streamed chunk (Gemini sends a few words at a time)
+CHUNK_TOKENS = 4
+
+_WORDS = (
+    "Start your morning at Central Park with a stroll past Bethesda Fountain. "
+    "Head to The Met for a couple of hours among the European paintings. "
+    "Grab lunch at a classic deli nearby, then walk the High Line toward Chelsea Market. "
+    "Catch the sunset from the Brooklyn Bridge and finish with dinner in DUMBO."
+).split()
+
+
+class FakeBackendError(RuntimeError):
+    """Injected failure."""
+
+
+def _seed(text: str) -> int:
+    return int.from_bytes(hashlib.sha1(text.encode()).digest()[:8], "big")
+
+
+class _Response:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class _Stream:
+    def __init__(self, chunks: List[str], interval: float, fail_at: int):
+        self.chunks = chunks
+        self.interval = interval
+        self.fail_at = fail_at
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self) -> AsyncGenerator[_Response, None]:
+        for i, chunk in enumerate(self.chunks):
+            if i == self.fail_at:
+                raise FakeBackendError("Injected mid-stream failure")
+            if i:
+                await asyncio.sleep(self.interval)
+            yield _Response(chunk)
+
+
+class FakeGenerativeModel:
+    """Implements the part of genai.GenerativeModel the agents use: generate_content_async."""
+
+    def __init__(
+        self,
+        latency_ms: float = FAKE_LLM_LATENCY_MS,
+        tokens_per_second: float = FAKE_LLM_TOKENS_PER_SECOND,
+        response_tokens: int = FAKE_LLM_RESPONSE_TOKENS,
+        failure_rate: float = FAKE_LLM_FAILURE_RATE,
+        seed: int = FAKE_SEED,
+    ):
+        self.latency = latency_ms / 1000
+        self.tokens_per_second = tokens_per_second
+        self.response_tokens = response_tokens
+        self.failure_rate = failure_rate
+        self._failures = random.Random(seed)
+
+    async def generate_content_async(self, prompt: str, stream: bool = False):
+        failing = self._failures.random() < self.failure_rate
+        await asyncio.sleep(self.latency)
+        if failing and (not stream or self._failures.random() < 0.5):
+            raise FakeBackendError("Injected LLM failure")
+
+        words = random.Random(_seed(prompt))
+        if not stream:
+            return _Response(f"QUERY1: {' '.join(words.sample(_WORDS, 4))}\nQUERY2: {' '.join(words.sample(_WORDS, 4))}")
+
+        # ~1 token per word; chunks of CHUNK_TOKENS words spaced to match the token rate
+        tokens = [_WORDS[(i + words.randrange(len(_WORDS))) % len(_WORDS)] for i in range(self.response_tokens)]
+        chunks = [" ".join(tokens[i:i + CHUNK_TOKENS]) + " " for i in range(0, len(tokens), CHUNK_TOKENS)]
+        fail_at = words.randrange(1, len(chunks)) if failing and len(chunks) > 1 else -1
+        return _Stream(chunks, CHUNK_TOKENS / self.tokens_per_second, fail_at)
+
+
+class FakeEmbeddings:
+    """Deterministic bag-of-hashed-words unit vectors."""
+
+    def __init__(
+        self,
+        dimensions: int = 256,
+        latency_ms: float = FAKE_EMBEDDING_LATENCY_MS,
+        failure_rate: float = FAKE_EMBEDDING_FAILURE_RATE,
+        seed: int = FAKE_SEED,
+    ):
+        self.dimensions = dimensions
+        self.latency = latency_ms / 1000
+        self.failure_rate = failure_rate
+        self._failures = random.Random(seed)
+
+    def vector(self, text: str) -> List[float]:
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for word in text.lower().split() or [""]:
+            vector += np.random.default_rng(_seed(word)).standard_normal(self.dimensions, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    async def embed(self, text: str) -> List[float]:
+        await asyncio.sleep(self.latency)
+        if self._failures.random() < self.failure_rate:
+            raise FakeBackendError("Injected embedding failure")
+        return self.vector(text)
+
+
+fake_embeddings = FakeEmbeddings()
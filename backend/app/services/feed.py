@@ -0,0 +1,168 @@
+"""
+Materialized For You feed.
+
+Each user has one UserFeed row holding an interest vector (the running mean of the
+embeddings of attractions they liked or visited) and a ranked list of candidate
+attraction ids. The list is recomputed with one vector query when an interaction
+arrives, never when the feed is read, so serving the feed is a primary-key lookup
+plus in-memory hydration from the catalog snapshot.
+"""
+import os
+import asyncio
+from datetime import datetime, timezone, timedelta
+from typing import Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import db as database
+from ..models.atractions import Attraction, Embedding
+from ..models.feed import Interaction, UserFeed
+from ..__init__ import logger
+
+INTERACTION_KINDS = ("like", "visit")
+
+# Candidates kept per user
+FEED_SIZE = int(os.getenv("FEED_SIZE", "200"))
+
+# Feeds older than this are re-ranked in the background (picks up new attractions)
+FEED_REFRESH_SECONDS = int(os.getenv("FEED_REFRESH_SECONDS", str(24 * 60 * 60)))
+
+# Attractions have several chunk embeddings; over-fetch so FEED_SIZE distinct ids remain
+EMBEDDINGS_PER_ATTRACTION = 4
+
+
+def mean_vector(vectors: Sequence[Sequence[float]]) -> Optional[np.ndarray]:
+    """Mean of a set of vectors, or None when there are none."""
+    if not len(vectors):
+        return None
+    return np.mean(np.asarray(vectors, dtype=np.float64), axis=0)
+
+
+def update_interest(
+    interest: Optional[Sequence[float]],
+    count: int,
+    vector: Sequence[float],
+) -> Tuple[np.ndarray, int]:
+    """Fold one more vector into a running mean of `count` vectors."""
+    vector = np.asarray(vector, dtype=np.float64)
+    if interest is None or count <= 0:
+        return vector, 1
+    interest = np.asarray(interest, dtype=np.float64)
+    return interest + (vector - interest) / (count + 1), count + 1
+
+
+def rank_candidates(ids: Iterable[int], seen: Iterable[int], size: int = FEED_SIZE) -> List[int]:
+    """First `size` distinct ids, in order, skipping attractions the user has already seen."""
+    skip: Set[int] = set(seen)
+    ranked = []
+    for attraction_id in ids:
+        if attraction_id in skip:
+            continue
+        skip.add(attraction_id)
+        ranked.append(attraction_id)
+        if len(ranked) >= size:
+            break
+    return ranked
+
+
+def is_stale(feed: UserFeed, now: Optional[datetime] = None) -> bool:
+    now = now or datetime.now(timezone.utc)
+    return feed.updated is None or now - feed.updated > timedelta(seconds=FEED_REFRESH_SECONDS)
+
+
+async def attraction_vector(db: AsyncSession, attraction_id: int) -> Optional[np.ndarray]:
+    """Mean of an attraction's chunk embeddings."""
+    result = await db.execute(select(Embedding.embedding).where(Embedding.attraction_id == attraction_id))
+    return mean_vector([np.asarray(v, dtype=np.float64) for v in result.scalars().all()])
+
+
+async def nearest_attractions(
+    db: AsyncSession,
+    interest: Sequence[float],
+    seen: Sequence[int],
+    size: int = FEED_SIZE,
+) -> List[int]:
+    """Attraction ids closest to the interest vector (one KNN query on the embedding index)."""
+    stmt = (
+        select(Embedding.attraction_id)
+        .order_by(Embedding.embedding.cosine_distance(list(map(float, interest))))
+        .limit((size + len(seen)) * EMBEDDINGS_PER_ATTRACTION)
+    )
+    result = await db.execute(stmt)
+    return rank_candidates(result.scalars().all(), seen, size)
+
+
+async def get_feed(db: AsyncSession, user_id: int) -> Optional[UserFeed]:
+    """The user's materialized feed row (a single keyed read)."""
+    return await db.get(UserFeed, user_id)
+
+
+async def record_interaction(db: AsyncSession, user_id: int, attraction_id: int, kind: str) -> UserFeed:
+    """
+    Store an interaction and update the user's feed incrementally: fold the
+    attraction into the interest vector and re-rank the candidates.
+    Raises ValueError for unknown kinds or attractions.
+    """
+    if kind not in INTERACTION_KINDS:
+        raise ValueError(f"Unknown interaction kind: {kind} (use one of {', '.join(INTERACTION_KINDS)})")
+    if await db.get(Attraction, attraction_id) is None:
+        raise ValueError(f"Unknown attraction: {attraction_id}")
+
+    db.add(Interaction(user_id=user_id, attraction_id=attraction_id, kind=kind))
+
+    feed = await db.get(UserFeed, user_id, with_for_update=True)
+    if feed is None:
+        feed = UserFeed(user_id=user_id, interaction_count=0, candidates=[], seen=[])
+        db.add(feed)
+
+    seen = list(feed.seen or [])
+    if attraction_id not in seen:
+        seen.append(attraction_id)
+    feed.seen = seen
+
+    vector = await attraction_vector(db, attraction_id)
+    if vector is not None:
+        interest, count = update_interest(feed.interest, feed.interaction_count or 0, vector)
+        feed.interest = interest.tolist()
+        feed.interaction_count = count
+        feed.candidates = await nearest_attractions(db, interest, seen)
+    else:
+        # Not embedded yet: only drop it from the candidates
+        feed.candidates = [i for i in (feed.candidates or []) if i != attraction_id]
+    feed.updated = datetime.now(timezone.utc)
+
+    await db.commit()
+    return feed
+
+
+async def refresh_feed(db: AsyncSession, user_id: int):
+    """Re-rank a feed from its stored interest vector."""
+    feed = await db.get(UserFeed, user_id, with_for_update=True)
+    if feed is None or feed.interest is None:
+        return
+    feed.candidates = await nearest_attractions(db, feed.interest, list(feed.seen or []))
+    feed.updated = datetime.now(timezone.utc)
+    await db.commit()
+
+
+_refreshing: Set[int] = set()
+
+
+def schedule_refresh(user_id: int):
+    """Re-rank a stale feed in the background; the stored feed keeps serving meanwhile."""
+    if user_id in _refreshing:
+        return
+    _refreshing.add(user_id)
+
+    async def run():
+        try:
+            async with database.AsyncSessionLocal() as db:
+                await refresh_feed(db, user_id)
+        except Exception as e:
+            logger.error(f"Feed refresh failed for user {user_id}: {e}")
+        finally:
+            _refreshing.discard(user_id)
+
+    asyncio.get_running_loop().create_task(run())
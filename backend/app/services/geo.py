@@ -0,0 +1,184 @@
+"""
+Geospatial search over attraction coordinates.
+
+GeoIndex is an in-memory uniform lat/lng grid: each cell holds the row positions
+of the attractions inside it, so a radius or k-nearest query only computes
+haversine distances for the handful of cells around the query point.
+"""
+import math
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .catalog_version import catalog_version
+from ..models.atractions import Attraction
+
+EARTH_RADIUS_M = 6_371_008.8
+# Consistent with haversine_m, so the bounding box never cuts into the radius
+METERS_PER_DEGREE_LAT = EARTH_RADIUS_M * math.pi / 180
+
+# ~1.1km cells: a 1-2km radius query touches at most a few dozen cells
+DEFAULT_CELL_DEGREES = 0.01
+
+# k-nearest search never looks further than this
+MAX_KNN_RADIUS_M = 50_000
+
+
+def haversine_m(lat1: float, lng1: float, lat2, lng2):
+    """Great-circle distance in meters. lat2/lng2 may be numpy arrays."""
+    lat1_r, lng1_r = math.radians(lat1), math.radians(lng1)
+    lat2_r, lng2_r = np.radians(lat2), np.radians(lng2)
+    a = np.sin((lat2_r - lat1_r) / 2) ** 2 + math.cos(lat1_r) * np.cos(lat2_r) * np.sin((lng2_r - lng1_r) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+
+
+def parse_lat_lng(text: Optional[str]) -> Optional[Tuple[float, float]]:
+    """Parse "lat,lng" into floats, or None if the text is not a coordinate pair."""
+    if not text or "," not in text:
+        return None
+    try:
+        lat, lng = (float(part) for part in text.split(",", 1))
+    except ValueError:
+        return None
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return None
+    return lat, lng
+
+
+class GeoIndex:
+    """Immutable grid index over (id, lat, lng) rows with optional rating/types for filtering."""
+
+    def __init__(
+        self,
+        ids: Sequence[int],
+        lats: Sequence[float],
+        lngs: Sequence[float],
+        ratings: Optional[Sequence[Optional[float]]] = None,
+        types: Optional[Sequence[Optional[Sequence[str]]]] = None,
+        cell_degrees: float = DEFAULT_CELL_DEGREES,
+    ):
+        self.cell_degrees = cell_degrees
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lngs = np.asarray(lngs, dtype=np.float64)
+        self.ratings = np.asarray(
+            [r if r is not None else 0.0 for r in ratings] if ratings is not None else np.zeros(len(self.ids)),
+            dtype=np.float64,
+        )
+        self.types = [frozenset(t or ()) for t in types] if types is not None else None
+
+        cells: Dict[Tuple[int, int], List[int]] = {}
+        for row, (clat, clng) in enumerate(zip(self._cell(self.lats), self._cell(self.lngs))):
+            cells.setdefault((int(clat), int(clng)), []).append(row)
+        self.cells = {key: np.asarray(rows, dtype=np.int64) for key, rows in cells.items()}
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Tuple], cell_degrees: float = DEFAULT_CELL_DEGREES) -> "GeoIndex":
+        """Build from (id, lat, lng, rating, types) tuples, skipping rows without coordinates."""
+        rows = [r for r in rows if r[1] is not None and r[2] is not None]
+        return cls(
+            ids=[r[0] for r in rows],
+            lats=[r[1] for r in rows],
+            lngs=[r[2] for r in rows],
+            ratings=[r[3] for r in rows],
+            types=[r[4] for r in rows],
+            cell_degrees=cell_degrees,
+        )
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _cell(self, degrees):
+        return np.floor(np.asarray(degrees) / self.cell_degrees).astype(np.int64)
+
+    def _candidates(self, lat: float, lng: float, radius_m: float) -> np.ndarray:
+        """Row positions in every cell overlapping the bounding box of the circle."""
+        dlat = radius_m / METERS_PER_DEGREE_LAT
+        dlng = radius_m / (METERS_PER_DEGREE_LAT * max(math.cos(math.radians(lat)), 1e-6))
+        lat0, lat1 = (int(c) for c in self._cell([lat - dlat, lat + dlat]))
+        lng0, lng1 = (int(c) for c in self._cell([lng - dlng, lng + dlng]))
+
+        # Walk whichever is smaller: the cells in the box or the occupied cells
+        if (lat1 - lat0 + 1) * (lng1 - lng0 + 1) > len(self.cells):
+            found = [
+                rows for (clat, clng), rows in self.cells.items()
+                if lat0 <= clat <= lat1 and lng0 <= clng <= lng1
+            ]
+        else:
+            found = [
+                self.cells[(clat, clng)]
+                for clat in range(lat0, lat1 + 1)
+                for clng in range(lng0, lng1 + 1)
+                if (clat, clng) in self.cells
+            ]
+        if not found:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(found)
+
+    def _filter(self, rows: np.ndarray, place_type: Optional[str], min_rating: Optional[float]) -> np.ndarray:
+        if min_rating is not None and len(rows):
+            rows = rows[self.ratings[rows] >= min_rating]
+        if place_type and self.types is not None and len(rows):
+            rows = rows[[place_type in self.types[row] for row in rows]]
+        return rows
+
+    def within(
+        self,
+        lat: float,
+        lng: float,
+        radius_m: float,
+        limit: Optional[int] = None,
+        place_type: Optional[str] = None,
+        min_rating: Optional[float] = None,
+    ) -> List[Tuple[int, float]]:
+        """(id, distance_m) for rows within radius_m, nearest first."""
+        rows = self._filter(self._candidates(lat, lng, radius_m), place_type, min_rating)
+        if not len(rows):
+            return []
+        distances = haversine_m(lat, lng, self.lats[rows], self.lngs[rows])
+        inside = distances <= radius_m
+        rows, distances = rows[inside], distances[inside]
+
+        order = np.argsort(distances, kind="stable")
+        if limit is not None:
+            order = order[:limit]
+        return [(int(self.ids[rows[i]]), float(distances[i])) for i in order]
+
+    def nearest(
+        self,
+        lat: float,
+        lng: float,
+        k: int,
+        max_radius_m: float = MAX_KNN_RADIUS_M,
+        place_type: Optional[str] = None,
+        min_rating: Optional[float] = None,
+    ) -> List[Tuple[int, float]]:
+        """(id, distance_m) for the k nearest rows, growing the search radius ring by ring."""
+        if k <= 0 or not len(self):
+            return []
+        radius = self.cell_degrees * METERS_PER_DEGREE_LAT
+        while True:
+            found = self.within(lat, lng, radius, limit=k, place_type=place_type, min_rating=min_rating)
+            # Everything within `radius` has been seen, so k hits inside it are the true k nearest
+            if len(found) >= k or radius >= max_radius_m:
+                return found
+            radius = min(radius * 2, max_radius_m)
+
+
+_geo_index: Optional[GeoIndex] = None
+_geo_index_version: Optional[str] = None
+
+
+async def get_geo_index(db: AsyncSession) -> GeoIndex:
+    """Process-wide GeoIndex, rebuilt from the attraction table when the catalog version changes."""
+    global _geo_index, _geo_index_version
+    version = await catalog_version.current(db)
+    if _geo_index is None or _geo_index_version != version:
+        result = await db.execute(
+            select(Attraction.id, Attraction.latitude, Attraction.longitude, Attraction.rating, Attraction.types)
+        )
+        _geo_index = GeoIndex.from_rows(result.all())
+        _geo_index_version = version
+    return _geo_index
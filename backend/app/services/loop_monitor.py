@@ -0,0 +1,64 @@
+"""
+Event-loop lag monitor.
+
+A background task sleeps for LOOP_LAG_INTERVAL seconds and records how much
+later than requested it woke up. Sustained lag means something is blocking the
+loop (sync I/O, heavy CPU in a handler) and every stream on the worker stalls
+with it. Exposed in /metrics as the event_loop_lag_seconds histogram and the
+event_loop_lag_max_seconds gauge (worst since the last scrape window reset).
+"""
+import os
+import time
+import asyncio
+from typing import Optional
+
+from .metrics import metrics
+from ..__init__ import logger
+
+LOOP_LAG_MONITOR = os.getenv("LOOP_LAG_MONITOR", "1").lower() not in ("0", "false", "no")
+LOOP_LAG_INTERVAL = float(os.getenv("LOOP_LAG_INTERVAL", "0.25"))
+# Lag above this is logged
+LOOP_LAG_WARN_SECONDS = float(os.getenv("LOOP_LAG_WARN_SECONDS", "0.2"))
+# The max gauge covers roughly this many seconds
+LOOP_LAG_MAX_WINDOW = 60.0
+
+LAG_METRIC = "event_loop_lag_seconds"
+LAG_MAX_METRIC = "event_loop_lag_max_seconds"
+
+
+class LoopLagMonitor:
+
+    def __init__(self, interval: float = LOOP_LAG_INTERVAL):
+        self.interval = interval
+        self.max_lag = 0.0
+        self._window_started = time.monotonic()
+        self._task: Optional[asyncio.Task] = None
+
+    def record(self, lag: float):
+        now = time.monotonic()
+        if now - self._window_started > LOOP_LAG_MAX_WINDOW:
+            self.max_lag = 0.0
+            self._window_started = now
+        self.max_lag = max(self.max_lag, lag)
+        metrics.observe(LAG_METRIC, lag)
+        metrics.set_gauge(LAG_MAX_METRIC, self.max_lag)
+        if lag > LOOP_LAG_WARN_SECONDS:
+            logger.warning(f"Event loop lagged {lag * 1000:.0f}ms")
+
+    async def run(self):
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(self.interval)
+            self.record(max(0.0, time.monotonic() - started - self.interval))
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+loop_monitor = LoopLagMonitor()
@@ -0,0 +1,147 @@
+"""
+Content negotiation for read endpoints.
+
+Responses are built once as JSON bytes and then re-encoded per representation:
+MessagePack when the client accepts application/msgpack, compressed with zstd
+or gzip per Accept-Encoding. Clients that send the "compact" capability
+(X-Client-Capabilities: compact) get attractions without the legacy fields that
+duplicate newer ones (images = photos, tags = types, type = primary_type).
+"""
+import os
+import gzip
+from typing import Dict, FrozenSet, NamedTuple, Optional, Tuple
+
+import orjson
+import ormsgpack
+import zstandard
+from fastapi import Request
+from starlette.responses import Response
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+MSGPACK_MEDIA_TYPES = (MSGPACK_MEDIA_TYPE, "application/x-msgpack")
+
+CAPABILITIES_HEADER = "X-Client-Capabilities"
+COMPACT_CAPABILITY = "compact"
+
+# Legacy attraction fields dropped for compact clients (each duplicates a newer field)
+LEGACY_FIELDS = ("type", "tags", "images")
+
+# Supported content codings, preferred first on equal q-values
+ENCODINGS = ("zstd", "gzip")
+
+# Bodies smaller than this are not worth compressing
+MIN_COMPRESS_BYTES = int(os.getenv("MIN_COMPRESS_BYTES", "1024"))
+ZSTD_LEVEL = int(os.getenv("ZSTD_LEVEL", "3"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+
+VARY = "Accept, Accept-Encoding, " + CAPABILITIES_HEADER
+
+_zstd = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+
+
+class Representation(NamedTuple):
+    media_type: str = JSON_MEDIA_TYPE
+    encoding: Optional[str] = None
+    compact: bool = False
+
+    def key(self) -> str:
+        """Cache key / ETag material."""
+        return f"{self.media_type};{self.encoding or 'identity'};{'compact' if self.compact else 'full'}"
+
+
+def client_capabilities(request: Request) -> FrozenSet[str]:
+    raw = request.headers.get(CAPABILITIES_HEADER, "")
+    return frozenset(c.strip().lower() for c in raw.split(",") if c.strip())
+
+
+def wants_compact(request: Request) -> bool:
+    return COMPACT_CAPABILITY in client_capabilities(request)
+
+
+def parse_q_values(header: str) -> Dict[str, float]:
+    """{token: q} for an Accept / Accept-Encoding style header (q defaults to 1, bad q-values to 0)."""
+    weights: Dict[str, float] = {}
+    for item in header.split(","):
+        token, *params = item.split(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[token] = q
+    return weights
+
+
+def choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Best supported coding from an Accept-Encoding header (q-values honored), or None."""
+    if not accept_encoding:
+        return None
+    weights = parse_q_values(accept_encoding)
+    wildcard = weights.get("*", 0.0)
+    best, best_q = None, 0.0
+    for coding in ENCODINGS:
+        q = weights.get(coding, wildcard)
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def choose_media_type(accept: Optional[str]) -> str:
+    """MessagePack when the Accept header names it with a q-value at least as high as JSON's, else JSON."""
+    if not accept:
+        return JSON_MEDIA_TYPE
+    weights = parse_q_values(accept)
+    msgpack_q = max(weights.get(media_type, 0.0) for media_type in MSGPACK_MEDIA_TYPES)
+    json_q = weights.get(JSON_MEDIA_TYPE, weights.get("application/*", weights.get("*/*", 0.0)))
+    if msgpack_q > 0 and msgpack_q >= json_q:
+        return MSGPACK_MEDIA_TYPE
+    return JSON_MEDIA_TYPE
+
+
+def negotiate(request: Request) -> Representation:
+    return Representation(
+        media_type=choose_media_type(request.headers.get("accept")),
+        encoding=choose_encoding(request.headers.get("accept-encoding")),
+        compact=wants_compact(request),
+    )
+
+
+def compress(body: bytes, encoding: Optional[str]) -> Tuple[bytes, Optional[str]]:
+    """(body, applied encoding); small bodies stay uncompressed."""
+    if encoding is None or len(body) < MIN_COMPRESS_BYTES:
+        return body, None
+    if encoding == "zstd":
+        return _zstd.compress(body), encoding
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0), encoding
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+def encode_body(json_body: bytes, representation: Representation) -> Tuple[bytes, Dict[str, str]]:
+    """Re-encode a JSON body for a representation. Returns (body, headers)."""
+    body = json_body
+    if representation.media_type == MSGPACK_MEDIA_TYPE:
+        body = ormsgpack.packb(orjson.loads(json_body))
+    body, applied = compress(body, representation.encoding)
+    headers = {"Content-Type": representation.media_type, "Vary": VARY}
+    if applied:
+        headers["Content-Encoding"] = applied
+    return body, headers
+
+
+def negotiated_response(
+    request: Request,
+    json_body: bytes,
+    headers: Optional[Dict[str, str]] = None,
+    status_code: int = 200,
+) -> Response:
+    """Response for an uncached JSON body in the representation the client asked for."""
+    body, representation_headers = encode_body(json_body, negotiate(request))
+    return Response(body, status_code=status_code, headers={**(headers or {}), **representation_headers})
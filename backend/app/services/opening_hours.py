@@ -0,0 +1,164 @@
+"""
+Compiled opening hours.
+
+Google `opening_hours.periods` are compiled once (at ingest, or when a snapshot is
+built for older rows) into sorted, non-overlapping [start, end) intervals of
+local minutes since Sunday 00:00. OpeningHoursIndex concatenates the intervals
+of the whole catalog into flat NumPy arrays, so "which attractions are open at
+time T" is a single vectorized pass.
+"""
+import os
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional, Sequence, Tuple
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+
+# Attractions are in NYC. Their stored utc_offset is a snapshot taken at ingest time, so
+# rows whose offset belongs to this zone are evaluated in the zone (DST aware).
+CATALOG_TIMEZONE = ZoneInfo(os.getenv("CATALOG_TIMEZONE", "America/New_York"))
+
+
+def _minute_of_week(point: dict) -> Optional[int]:
+    """Google period point {"day": 0-6 (Sunday=0), "time": "HHMM"} -> minute of week."""
+    try:
+        day = int(point["day"])
+        time = str(point.get("time", "0000")).zfill(4)
+        return day * MINUTES_PER_DAY + int(time[:2]) * 60 + int(time[2:])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def compile_periods(periods: Optional[Iterable[dict]]) -> Optional[List[List[int]]]:
+    """
+    Compile Google opening-hours periods into merged [start, end) minute-of-week intervals.
+    Returns None when hours are unknown and [[0, 10080]] for places that never close.
+    """
+    if not periods:
+        return None
+
+    intervals: List[Tuple[int, int]] = []
+    for period in periods:
+        start = _minute_of_week(period.get("open") or {})
+        if start is None:
+            continue
+        if not period.get("close"):
+            # Google encodes "open 24/7" as a single open period without a close
+            return [[0, MINUTES_PER_WEEK]]
+        end = _minute_of_week(period["close"])
+        if end is None:
+            continue
+        if end <= start:
+            # Wraps past Saturday midnight
+            intervals.append((start, MINUTES_PER_WEEK))
+            intervals.append((0, end))
+        else:
+            intervals.append((start, end))
+
+    if not intervals:
+        return None
+
+    merged: List[List[int]] = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def compile_opening_hours(opening_hours: Optional[dict]) -> Optional[List[List[int]]]:
+    """compile_periods for a stored Attraction.opening_hours value."""
+    if not isinstance(opening_hours, dict):
+        return None
+    return compile_periods(opening_hours.get("periods"))
+
+
+def utc_minute_of_week(at: datetime) -> int:
+    """Minutes since Sunday 00:00 UTC for an aware (or UTC-naive) datetime."""
+    if at.tzinfo is None:
+        at = at.replace(tzinfo=timezone.utc)
+    at = at.astimezone(timezone.utc)
+    # Python weekday(): Monday=0 ... Sunday=6; Google: Sunday=0
+    return ((at.weekday() + 1) % 7) * MINUTES_PER_DAY + at.hour * 60 + at.minute
+
+
+def _zone_offsets(zone: ZoneInfo) -> set:
+    """Standard and daylight UTC offsets (minutes) of a zone."""
+    year = datetime.now(timezone.utc).year
+    return {
+        int(datetime(year, month, 1, tzinfo=zone).utcoffset().total_seconds() // 60)
+        for month in (1, 7)
+    }
+
+
+class OpeningHoursIndex:
+    """Flat interval arrays for every snapshot row with known hours."""
+
+    def __init__(
+        self,
+        intervals: Sequence[Optional[Sequence[Sequence[int]]]],
+        utc_offsets: Sequence[Optional[int]],
+        zone: ZoneInfo = CATALOG_TIMEZONE,
+    ):
+        self.size = len(intervals)
+        self.zone = zone
+        rows, starts, ends = [], [], []
+        for row, row_intervals in enumerate(intervals):
+            for start, end in row_intervals or ():
+                rows.append(row)
+                starts.append(start)
+                ends.append(end)
+        self.rows = np.asarray(rows, dtype=np.int64)
+        self.starts = np.asarray(starts, dtype=np.int32)
+        self.ends = np.asarray(ends, dtype=np.int32)
+        self.known = np.zeros(self.size, dtype=bool)
+        self.known[self.rows] = True
+
+        # Rows with a foreign fixed offset keep it; everything else follows the catalog zone
+        zone_offsets = _zone_offsets(zone)
+        self.fixed_offset = np.array(
+            [o if o is not None and o not in zone_offsets else 0 for o in utc_offsets], dtype=np.int32
+        )
+        self.uses_zone = np.array(
+            [o is None or o in zone_offsets for o in utc_offsets], dtype=bool
+        )
+
+    def open_at(self, at: Optional[datetime] = None) -> np.ndarray:
+        """Boolean row mask of attractions open at `at` (default: now). Unknown hours count as closed."""
+        at = at or datetime.now(timezone.utc)
+        if at.tzinfo is None:
+            at = at.replace(tzinfo=self.zone)
+        if not self.size:
+            return np.zeros(0, dtype=bool)
+
+        utc_minute = utc_minute_of_week(at)
+        zone_offset = int(at.astimezone(self.zone).utcoffset().total_seconds() // 60)
+        offsets = np.where(self.uses_zone, zone_offset, self.fixed_offset)
+        local = (utc_minute + offsets) % MINUTES_PER_WEEK
+
+        minute = local[self.rows]
+        hit = (self.starts <= minute) & (minute < self.ends)
+        is_open = np.zeros(self.size, dtype=bool)
+        is_open[self.rows[hit]] = True
+        return is_open
+
+
+def parse_open_at(open_now: bool, open_at: Optional[str]) -> Optional[datetime]:
+    """
+    Resolve the open_now / open_at query parameters to a datetime, or None when no
+    opening-hours filter was requested. Naive open_at values are catalog-local time.
+    Raises ValueError for unparseable timestamps.
+    """
+    if open_at:
+        try:
+            at = datetime.fromisoformat(open_at)
+        except ValueError:
+            raise ValueError(f"Invalid open_at: {open_at} (expected ISO 8601)")
+        return at if at.tzinfo else at.replace(tzinfo=CATALOG_TIMEZONE)
+    if open_now:
+        return datetime.now(timezone.utc)
+    return None
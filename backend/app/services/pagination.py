@@ -0,0 +1,162 @@
+"""
+Keyset (cursor) pagination and field projection helpers for attraction list endpoints.
+
+A cursor encodes the sort name plus the (sort value, id) of the last row of a page,
+so the next page is a single indexed range scan instead of an OFFSET.
+"""
+import base64
+import json
+from typing import Any, List, Optional, Sequence, Tuple
+
+from sqlalchemy import func, tuple_
+
+from .negotiation import LEGACY_FIELDS
+from ..models.atractions import Attraction, JSON_FIELDS
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Most ids a single batch lookup resolves
+MAX_BATCH_IDS = 500
+
+# sort name -> (column, descending). Nullable columns are coalesced so the keyset stays total.
+SORTS = {
+    "id": (Attraction.id, False),
+    "rating": (func.coalesce(Attraction.rating, 0.0), True),
+    "popularity": (func.coalesce(Attraction.user_ratings_total, 0), True),
+}
+
+# Default projection for clients with the compact capability
+COMPACT_FIELDS = tuple(name for name in JSON_FIELDS if name not in LEGACY_FIELDS)
+
+# Columns every projection loads: the row identity used by the fragment cache
+KEY_FIELDS = ("id", "last_updated")
+
+# Columns a sort needs loaded to build the next cursor
+SORT_FIELDS = {
+    "id": ("id",),
+    "rating": ("id", "rating"),
+    "popularity": ("id", "user_ratings_total"),
+}
+
+
+def parse_fields(fields: Optional[str], compact: bool = False) -> Optional[Tuple[str, ...]]:
+    """
+    Parse a comma separated `fields=` projection.
+    Returns None when no projection was requested, raises ValueError on unknown fields.
+    `compact` drops the legacy fields that duplicate newer ones (see negotiation.LEGACY_FIELDS),
+    and raises ValueError when nothing but legacy fields was requested.
+    """
+    if not fields:
+        return COMPACT_FIELDS if compact else None
+    requested, legacy = [], []
+    for name in fields.split(","):
+        name = name.strip()
+        if not name or name in requested:
+            continue
+        if name not in JSON_FIELDS:
+            raise ValueError(f"Unknown field: {name}")
+        if compact and name in LEGACY_FIELDS:
+            legacy.append(name)
+            continue
+        requested.append(name)
+    if not requested:
+        # Only legacy fields were asked for; answering with every compact field instead would be a surprise
+        raise ValueError(f"Legacy field not available in compact mode: {', '.join(legacy)}")
+    return tuple(requested)
+
+
+def parse_ids(values: Optional[Sequence[Any]]) -> List[int]:
+    """
+    Parse batch ids, given as ints or (repeated and/or comma separated) strings.
+    Keeps the requested order, drops duplicates, raises ValueError for non-integers
+    or more than MAX_BATCH_IDS ids.
+    """
+    ids: List[int] = []
+    seen = set()
+    for item in values or ():
+        parts = item.split(",") if isinstance(item, str) else [item]
+        for part in parts:
+            if isinstance(part, str):
+                part = part.strip()
+                if not part:
+                    continue
+            try:
+                attraction_id = int(part)
+            except (TypeError, ValueError):
+                raise ValueError(f"Invalid id: {part}")
+            if attraction_id not in seen:
+                seen.add(attraction_id)
+                ids.append(attraction_id)
+    if len(ids) > MAX_BATCH_IDS:
+        raise ValueError(f"At most {MAX_BATCH_IDS} ids per request")
+    return ids
+
+
+def clamp_limit(limit: Optional[int]) -> int:
+    """Clamp a requested page size to 1..MAX_PAGE_SIZE."""
+    if not limit:
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(int(limit), MAX_PAGE_SIZE))
+
+
+def sort_value(attraction: Attraction, sort: str) -> Any:
+    """The keyset value of a row for the given sort (mirrors the coalesce in SORTS)."""
+    if sort == "rating":
+        return attraction.rating or 0.0
+    if sort == "popularity":
+        return attraction.user_ratings_total or 0
+    return attraction.id
+
+
+def encode_cursor(sort: str, value: Any, last_id: int) -> str:
+    """Encode the position after (value, last_id) as an opaque url-safe token."""
+    raw = json.dumps([sort, value, last_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str) -> Tuple[Any, int]:
+    """Decode a cursor produced by encode_cursor. Raises ValueError if it is malformed or for another sort."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_sort, value, last_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if cursor_sort != sort or not isinstance(last_id, int):
+        raise ValueError("Cursor does not match sort")
+    return value, last_id
+
+
+def apply_keyset(stmt, sort: str, cursor: Optional[str]):
+    """Add ORDER BY (and the WHERE for the cursor position) for a keyset page to a select."""
+    if sort not in SORTS:
+        raise ValueError(f"Unknown sort: {sort}")
+    column, descending = SORTS[sort]
+
+    if sort == "id":
+        if cursor:
+            _, last_id = decode_cursor(cursor, sort)
+            stmt = stmt.where(Attraction.id > last_id)
+        return stmt.order_by(Attraction.id.asc())
+
+    if cursor:
+        value, last_id = decode_cursor(cursor, sort)
+        stmt = stmt.where(tuple_(column, Attraction.id) < tuple_(value, last_id))
+    return stmt.order_by(column.desc() if descending else column.asc(), Attraction.id.desc())
+
+
+def next_cursor(rows: Sequence[Attraction], sort: str, limit: int) -> Optional[str]:
+    """Cursor for the page after `rows`, or None when this was the last page (rows holds limit + 1 when more exist)."""
+    if len(rows) <= limit:
+        return None
+    last = rows[limit - 1]
+    return encode_cursor(sort, sort_value(last, sort), last.id)
+
+
+def load_columns(fields: Optional[Sequence[str]], sort: str) -> List[Any]:
+    """Attraction columns to load for a projection: the requested fields plus what the keyset needs."""
+    names = list(fields or JSON_FIELDS)
+    for name in KEY_FIELDS + SORT_FIELDS[sort]:
+        if name not in names:
+            names.append(name)
+    return [getattr(Attraction, name) for name in names]
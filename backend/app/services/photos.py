@@ -0,0 +1,134 @@
+"""
+Attraction photo proxy.
+
+Clients load photos through /photos/{attraction_id}/{idx} instead of hitting the
+Places photo API (with the API key in the URL) on every render. Each size
+variant is fetched from Google once, at that variant's maxwidth, and kept in a
+size-bounded on-disk LRU cache. Concurrent requests for the same uncached
+variant share one upstream fetch.
+"""
+import os
+import asyncio
+import hashlib
+from typing import Awaitable, Callable, Dict, Optional, Sequence, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import aiohttp
+import diskcache
+
+from ..__init__ import logger
+
+# variant -> maxwidth requested from the Places photo API (which caps it at 1600)
+PHOTO_VARIANTS = {"thumb": 160, "card": 480, "full": 1600}
+DEFAULT_PHOTO_VARIANT = "card"
+
+PHOTO_CACHE_DIR = os.getenv("PHOTO_CACHE_DIR", os.path.join(".cache", "photos"))
+PHOTO_CACHE_MAX_BYTES = int(os.getenv("PHOTO_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+# Browser / CDN caching of proxied photos
+PHOTO_MAX_AGE = int(os.getenv("PHOTO_MAX_AGE", str(30 * 24 * 60 * 60)))
+
+PHOTO_FETCH_TIMEOUT = float(os.getenv("PHOTO_FETCH_TIMEOUT", "10"))
+
+PLACES_PHOTO_URL = "https://maps.googleapis.com/maps/api/place/photo"
+
+# (body, content type)
+Photo = Tuple[bytes, str]
+
+
+class PhotoNotFound(Exception):
+    """The Places photo API did not return the photo."""
+
+
+def photo_reference(photos: Optional[Sequence], images: Optional[Sequence], idx: int) -> Optional[str]:
+    """
+    Places photo reference of the idx-th photo. Falls back to the legacy images
+    list, whose entries only carry the photo URL.
+    """
+    for items in (photos, images):
+        if not items or not 0 <= idx < len(items):
+            continue
+        item = items[idx]
+        if not isinstance(item, dict):
+            continue
+        ref = item.get("photo_reference")
+        if not ref and item.get("url"):
+            ref = (parse_qs(urlparse(item["url"]).query).get("photoreference") or [None])[0]
+        if ref:
+            return ref
+    return None
+
+
+def cache_key(ref: str, variant: str) -> str:
+    return f"{variant}:{hashlib.sha1(ref.encode()).hexdigest()}"
+
+
+async def fetch_places_photo(ref: str, width: int) -> Photo:
+    """Fetch one photo from the Places photo API (follows its redirect to the image)."""
+    params = {"maxwidth": str(width), "photoreference": ref, "key": os.getenv("GOOGLE_MAPS_API_KEY", "")}
+    timeout = aiohttp.ClientTimeout(total=PHOTO_FETCH_TIMEOUT)
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        async with session.get(PLACES_PHOTO_URL, params=params) as response:
+            if response.status != 200:
+                raise PhotoNotFound(f"Places photo request failed with {response.status}")
+            return await response.read(), response.headers.get("Content-Type", "image/jpeg")
+
+
+class PhotoCache:
+    """Size-bounded LRU of photo variants on disk, with single-flight upstream fetches."""
+
+    def __init__(
+        self,
+        directory: str = PHOTO_CACHE_DIR,
+        max_bytes: int = PHOTO_CACHE_MAX_BYTES,
+        fetch: Callable[[str, int], Awaitable[Photo]] = fetch_places_photo,
+    ):
+        self.cache = diskcache.Cache(directory, size_limit=max_bytes, eviction_policy="least-recently-used")
+        self.fetch = fetch
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.fetches = 0
+
+    async def get(self, ref: str, variant: str) -> Tuple[Photo, str]:
+        """(photo, cache key) of a variant, fetching it upstream only when it is not cached."""
+        if variant not in PHOTO_VARIANTS:
+            raise ValueError(f"Unknown size: {variant} (use one of {', '.join(PHOTO_VARIANTS)})")
+        key = cache_key(ref, variant)
+
+        cached = await asyncio.to_thread(self.cache.get, key)
+        if cached is not None:
+            self.hits += 1
+            return cached, key
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            return await asyncio.shield(inflight), key
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            self.fetches += 1
+            photo = await self.fetch(ref, PHOTO_VARIANTS[variant])
+            await asyncio.to_thread(self.cache.set, key, photo)
+            future.set_result(photo)
+            return photo, key
+        except BaseException as e:
+            # Cancellation of this request must not leave the waiters hanging
+            future.set_exception(e if isinstance(e, Exception) else PhotoNotFound("Photo fetch cancelled"))
+            # Mark the exception retrieved when no other request was waiting on it
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+
+_photo_cache: Optional[PhotoCache] = None
+
+
+def get_photo_cache() -> PhotoCache:
+    """Process-wide photo cache (the cache directory is opened on first use)."""
+    global _photo_cache
+    if _photo_cache is None:
+        _photo_cache = PhotoCache()
+        logger.info(f"Photo cache at {PHOTO_CACHE_DIR} ({PHOTO_CACHE_MAX_BYTES} bytes)")
+    return _photo_cache
@@ -0,0 +1,75 @@
+"""
+Memoized query rewriting.
+
+The query generator's QUERY1/QUERY2 output only depends on the normalized user
+query and the prompt, so it is memoized on disk (shared by workers, survives
+restarts) under (prompt version, normalized query) with a TTL and an LRU size
+bound. Short keyword-style queries ("art museums") skip the LLM altogether:
+they already are good KNN search phrases.
+"""
+import os
+import asyncio
+import hashlib
+import re
+from typing import List, Optional
+
+import diskcache
+
+from .text import normalize_query
+
+REWRITE_MEMO_DIR = os.getenv("REWRITE_MEMO_DIR", os.path.join(".cache", "rewrites"))
+REWRITE_MEMO_MAX_BYTES = int(os.getenv("REWRITE_MEMO_MAX_BYTES", str(32 * 1024 * 1024)))
+REWRITE_MEMO_TTL = float(os.getenv("REWRITE_MEMO_TTL", str(7 * 24 * 60 * 60)))
+
+# Keyword fast path: at most this many words, none of them conversational
+KEYWORD_MAX_WORDS = 4
+CONVERSATIONAL_WORDS = frozenset(
+    "i im i'm me my we our us you want wanna would like love looking need can could should "
+    "what where which how who when why please some any with for to a an the and or but "
+    "do does going go visit see find show tell recommend plan trip day days hours".split()
+)
+_WORD = re.compile(r"^[a-z][a-z'\-]*$")
+
+
+def prompt_version(prompt: str) -> str:
+    """Short hash of the rewrite prompt, so editing the prompt invalidates old memo entries."""
+    return hashlib.sha1(prompt.encode()).hexdigest()[:12]
+
+
+def is_keyword_query(query: str) -> bool:
+    """True for short keyword-style queries like "art museums" or "jazz clubs"."""
+    words = normalize_query(query).split()
+    if not words or len(words) > KEYWORD_MAX_WORDS:
+        return False
+    return all(_WORD.match(word) and word not in CONVERSATIONAL_WORDS for word in words)
+
+
+class RewriteMemo:
+    """On-disk (prompt version, normalized query) -> rewritten queries memo."""
+
+    def __init__(
+        self,
+        prompt: str,
+        directory: str = REWRITE_MEMO_DIR,
+        max_bytes: int = REWRITE_MEMO_MAX_BYTES,
+        ttl: float = REWRITE_MEMO_TTL,
+    ):
+        self.version = prompt_version(prompt)
+        self.ttl = ttl
+        self.cache = diskcache.Cache(directory, size_limit=max_bytes, eviction_policy="least-recently-used")
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, query: str) -> str:
+        return f"{self.version}:{normalize_query(query)}"
+
+    async def get(self, query: str) -> Optional[List[str]]:
+        queries = await asyncio.to_thread(self.cache.get, self.key(query))
+        if queries is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return list(queries)
+
+    async def set(self, query: str, queries: List[str]):
+        await asyncio.to_thread(self.cache.set, self.key(query), list(queries), self.ttl)
@@ -0,0 +1,168 @@
+"""
+HTTP response cache for read endpoints.
+
+Responses are cached as encoded bodies in a size-bounded LRU with per-entry TTLs.
+Each response carries a strong ETag derived from the catalog version plus the
+request path and query, so a client repeating a request with If-None-Match gets
+a 304 without the endpoint doing any work, even after the entry was evicted.
+Every negotiated representation (JSON or MessagePack, compressed or not) is
+cached and tagged separately; non-identity ones are derived from the cached
+JSON body instead of rebuilding it.
+"""
+import os
+import time
+import hashlib
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import Request
+from starlette.responses import Response
+
+from .catalog_version import catalog_version
+from .negotiation import VARY, Representation, encode_body, negotiate
+from .serialization import dumps
+from ..__init__ import logger
+
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1024"))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Per-endpoint TTLs in seconds
+ATTRACTIONS_TTL = float(os.getenv("RESPONSE_CACHE_TTL_ATTRACTIONS", "300"))
+SEARCH_TTL = float(os.getenv("RESPONSE_CACHE_TTL_SEARCH", "900"))
+NEAR_BY_TTL = float(os.getenv("RESPONSE_CACHE_TTL_NEAR_BY", "300"))
+
+
+class CachedResponse:
+    __slots__ = ("body", "headers", "expires_at")
+
+    def __init__(self, body: bytes, headers: Dict[str, str], expires_at: float):
+        self.body = body
+        self.headers = headers
+        self.expires_at = expires_at
+
+
+class ResponseCache:
+    """LRU of encoded response bodies bounded by entry count and total bytes."""
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES, max_bytes: int = RESPONSE_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry.expires_at <= time.monotonic():
+            self._remove(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def set(self, key: str, body: bytes, ttl: float, headers: Optional[Dict[str, str]] = None):
+        if len(body) > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = CachedResponse(body, headers or {}, time.monotonic() + ttl)
+        self._bytes += len(body)
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+
+    def invalidate(self):
+        """Drop every entry (called when the catalog changes)."""
+        self._entries.clear()
+        self._bytes = 0
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        self._bytes -= len(entry.body)
+
+
+def cache_key(request: Request, version: str) -> str:
+    """Key for a request: catalog version, path and the sorted query string."""
+    query = "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+    return f"{version}|{request.url.path}?{query}"
+
+
+def make_etag(key: str) -> str:
+    """Strong ETag for a cache key."""
+    return '"' + hashlib.sha256(key.encode()).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return etag in [tag.strip() for tag in if_none_match.split(",")]
+
+
+# Process-wide response cache, cleared whenever the catalog version changes
+response_cache = ResponseCache()
+catalog_version.on_change(response_cache.invalidate)
+
+
+async def serve_cached(
+    request: Request,
+    db,
+    ttl: float,
+    build: Callable[[], Awaitable[Tuple[Any, Dict[str, str]]]],
+    version: Optional[str] = None,
+    vary: Optional[str] = None,
+) -> Response:
+    """
+    Serve a read endpoint through the response cache.
+    `build` returns (payload, extra_headers) and only runs on a cache miss;
+    the payload may already be encoded JSON bytes.
+    `version` is the catalog version the response is built from (defaults to the current one).
+    `vary` is extra key material for responses that depend on more than the query (e.g. the time).
+    """
+    if version is None:
+        version = await catalog_version.current(db)
+    representation = negotiate(request)
+    # The JSON body depends on the compact capability (the endpoint's projection), not on the encoding
+    identity = Representation(compact=representation.compact)
+    key = cache_key(request, version)
+    if vary:
+        key = f"{key}|{vary}"
+    identity_key = f"{key}|{identity.key()}"
+    representation_key = f"{key}|{representation.key()}"
+    etag = make_etag(representation_key)
+    cache_headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": VARY}
+
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=cache_headers)
+
+    entry = response_cache.get(representation_key)
+    if entry is None:
+        base = response_cache.get(identity_key) if representation != identity else None
+        if base is None:
+            payload, headers = await build()
+            json_body = payload if isinstance(payload, bytes) else dumps(payload)
+            json_body, identity_headers = encode_body(json_body, identity)
+            base_headers = {**headers, **identity_headers}
+            response_cache.set(identity_key, json_body, ttl, base_headers)
+            logger.debug(f"response cache miss: {key}")
+        else:
+            json_body, base_headers = base.body, base.headers
+        body, headers = json_body, base_headers
+        if representation != identity:
+            body, representation_headers = encode_body(json_body, representation)
+            headers = {k: v for k, v in base_headers.items() if k != "Content-Type"}
+            headers.update(representation_headers)
+            response_cache.set(representation_key, body, ttl, headers)
+    else:
+        body, headers = entry.body, entry.headers
+
+    return Response(content=body, headers={**headers, **cache_headers})
@@ -0,0 +1,90 @@
+"""
+Fast JSON serialization for attraction payloads.
+
+Attractions are encoded with orjson and the encoded bytes are cached per
+(id, last_updated, projection), so list responses are assembled by joining
+pre-encoded fragments instead of rebuilding and re-encoding a dict per row.
+"""
+import os
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Sequence, Tuple
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+
+from ..models.atractions import Attraction
+
+FRAGMENT_CACHE_MAX_ENTRIES = int(os.getenv("FRAGMENT_CACHE_MAX_ENTRIES", "20000"))
+
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+def dumps(payload: Any) -> bytes:
+    """Encode any payload to JSON bytes, falling back to FastAPI's encoder for unknown types."""
+    return orjson.dumps(payload, default=jsonable_encoder, option=ORJSON_OPTIONS)
+
+
+class FragmentCache:
+    """LRU of encoded attraction JSON objects keyed by (id, last_updated, fields)."""
+
+    def __init__(self, max_entries: int = FRAGMENT_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple, bytes]" = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: Tuple) -> Optional[bytes]:
+        fragment = self._entries.get(key)
+        if fragment is not None:
+            self._entries.move_to_end(key)
+        return fragment
+
+    def set(self, key: Tuple, fragment: bytes):
+        self._entries[key] = fragment
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+
+# Process-wide fragment cache. Entries are keyed by last_updated so they never go stale.
+fragment_cache = FragmentCache()
+
+
+def encode_attraction(attraction: Attraction, fields: Optional[Sequence[str]] = None) -> bytes:
+    """Encoded JSON object for one attraction, served from the fragment cache when possible."""
+    key = (attraction.id, attraction.last_updated, tuple(fields) if fields else None)
+    fragment = fragment_cache.get(key)
+    if fragment is None:
+        fragment = dumps(attraction.__json__(fields))
+        fragment_cache.set(key, fragment)
+    return fragment
+
+
+def with_extra(fragment: bytes, extra: Dict[str, Any]) -> bytes:
+    """Append per-request keys (e.g. a distance) to an encoded JSON object without re-encoding it."""
+    if not extra:
+        return fragment
+    encoded = dumps(extra)
+    if fragment == b"{}":
+        return encoded
+    return fragment[:-1] + b"," + encoded[1:]
+
+
+def encode_attractions(
+    attractions: Iterable[Attraction],
+    fields: Optional[Sequence[str]] = None,
+    extras: Optional[Sequence[Dict[str, Any]]] = None,
+) -> bytes:
+    """
+    Encoded JSON array of attractions, joined from per-attraction fragments.
+    `extras` holds one dict of additional keys per attraction.
+    """
+    if extras is None:
+        fragments = (encode_attraction(a, fields) for a in attractions)
+    else:
+        fragments = (with_extra(encode_attraction(a, fields), extra) for a, extra in zip(attractions, extras))
+    return b"[" + b",".join(fragments) + b"]"
@@ -0,0 +1,10 @@
+"""Text helpers shared by the chat caches."""
+import re
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """Case, punctuation and whitespace insensitive form of a chat query."""
+    return _SPACES.sub(" ", _PUNCTUATION.sub(" ", query.lower())).strip()
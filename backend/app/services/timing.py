@@ -0,0 +1,128 @@
+"""
+Per-request stage timing for the chat pipeline.
+
+A StageTimer is bound to the current request with a context variable, so the
+stages that run deep inside retrieval (query rewrite, Bedrock embeddings,
+pgvector searches) can report themselves with `with stage("knn"):` without
+threading a timer through every call. Tasks spawned while a timer is bound
+inherit it. Stages that run several times or concurrently within one request
+are reported as their wall-clock span (first start to last end) plus a call
+count. All clocks are time.perf_counter (monotonic).
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from .metrics import RATE_BUCKETS, metrics
+
+STAGE_METRIC = "chat_stage_seconds"
+TOTAL_METRIC = "chat_request_seconds"
+TTFT_METRIC = "chat_time_to_first_token_seconds"
+RATE_METRIC = "chat_tokens_per_second"
+
+_current: ContextVar[Optional["StageTimer"]] = ContextVar("stage_timer", default=None)
+
+
+class StageTimer:
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans: Dict[str, List[float]] = {}  # stage -> [first start, last end, calls]
+        self.first_token_at: Optional[float] = None
+        self.tokens = 0
+
+    def record(self, name: str, start: float, end: float):
+        span = self.spans.get(name)
+        if span is None:
+            self.spans[name] = [start, end, 1]
+        else:
+            span[0] = min(span[0], start)
+            span[1] = max(span[1], end)
+            span[2] += 1
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start, time.perf_counter())
+
+    def token(self, tokens: int):
+        """Count generated tokens; the first call marks time to first token."""
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        self.tokens += tokens
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def ttft(self) -> Optional[float]:
+        return None if self.first_token_at is None else self.first_token_at - self.started
+
+    def tokens_per_second(self) -> Optional[float]:
+        span = self.spans.get("generation")
+        if not self.tokens or span is None or span[1] <= span[0]:
+            return None
+        return self.tokens / (span[1] - span[0])
+
+    def event(self, cached: bool = False) -> Dict:
+        """The `timing` SSE event (milliseconds)."""
+        ttft = self.ttft()
+        rate = self.tokens_per_second()
+        return {
+            "type": "timing",
+            "cached": cached,
+            "total_ms": round(self.elapsed() * 1000, 1),
+            "ttft_ms": None if ttft is None else round(ttft * 1000, 1),
+            "tokens": self.tokens,
+            "tokens_per_second": None if rate is None else round(rate, 1),
+            "stages": {
+                name: {
+                    "ms": round((end - start) * 1000, 1),
+                    "offset_ms": round((start - self.started) * 1000, 1),
+                    "calls": calls,
+                }
+                for name, (start, end, calls) in self.spans.items()
+            },
+            "done": False,
+        }
+
+    def observe(self, cached: bool = False):
+        """Record this request's stages in the process histograms."""
+        labels = {"cached": "true" if cached else "false"}
+        for name, (start, end, _) in self.spans.items():
+            metrics.observe(STAGE_METRIC, end - start, {"stage": name})
+        metrics.observe(TOTAL_METRIC, self.elapsed(), labels)
+        ttft = self.ttft()
+        if ttft is not None:
+            metrics.observe(TTFT_METRIC, ttft, labels)
+        rate = self.tokens_per_second()
+        if rate is not None and not cached:
+            metrics.observe(RATE_METRIC, rate, buckets=RATE_BUCKETS)
+
+
+def current_timer() -> Optional[StageTimer]:
+    return _current.get()
+
+
+@contextmanager
+def bind_timer(timer: StageTimer):
+    """Make `timer` the current request's timer for the duration of the block."""
+    token = _current.set(timer)
+    try:
+        yield timer
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def stage(name: str):
+    """Time a block as stage `name` of the current request (no-op outside a timed request)."""
+    timer = _current.get()
+    if timer is None:
+        yield
+        return
+    with timer.stage(name):
+        yield
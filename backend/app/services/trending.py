@@ -0,0 +1,279 @@
+"""
+Trending attractions.
+
+View, search-hit and check-in events are buffered in memory and applied in
+batches. Scores decay exponentially with TRENDING_HALF_LIFE_HOURS, kept relative
+to a fixed landmark time: an event at time t adds weight * e^(λ(t - landmark)),
+so adding an event never touches any other score and the ranking never needs a
+decay pass. Each flush re-ranks only the groups (all, category, neighborhood,
+category + neighborhood) the batch touched and upserts the changed scores, so
+serving a top-N list is a dict lookup.
+"""
+import os
+import math
+import time
+import asyncio
+import heapq
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import db as database
+from .catalog import catalog_store
+from ..models.trending import TrendingScore
+from ..__init__ import logger
+
+EVENT_WEIGHTS = {"view": 1.0, "search_hit": 0.25, "check_in": 5.0}
+
+TRENDING_HALF_LIFE_HOURS = float(os.getenv("TRENDING_HALF_LIFE_HOURS", "24"))
+TRENDING_TOP_N = int(os.getenv("TRENDING_TOP_N", "50"))
+
+# Buffered events are applied every TRENDING_FLUSH_SECONDS, or sooner once this many are pending
+TRENDING_FLUSH_SECONDS = float(os.getenv("TRENDING_FLUSH_SECONDS", "5"))
+TRENDING_BUFFER_MAX = int(os.getenv("TRENDING_BUFFER_MAX", "1000"))
+
+# Scores that decayed below this are dropped when the landmark moves
+TRENDING_MIN_SCORE = 0.01
+
+# Move the landmark before e^(λ(t - landmark)) gets large enough to lose precision
+MAX_LANDMARK_EXPONENT = 30.0
+
+# (category, vicinity); None means "any"
+GroupKey = Tuple[Optional[str], Optional[str]]
+
+
+def group_keys(category: Optional[str], vicinity: Optional[str]) -> Tuple[GroupKey, ...]:
+    """Every top-N list an attraction belongs to."""
+    keys = [(None, None)]
+    if category:
+        keys.append((category, None))
+    if vicinity:
+        keys.append((None, vicinity))
+    if category and vicinity:
+        keys.append((category, vicinity))
+    return tuple(keys)
+
+
+class TrendingIndex:
+    """In-memory decayed scores with precomputed top-N lists per group."""
+
+    def __init__(
+        self,
+        half_life_seconds: float = TRENDING_HALF_LIFE_HOURS * 3600,
+        top_n: int = TRENDING_TOP_N,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.rate = math.log(2) / half_life_seconds
+        self.top_n = top_n
+        self.clock = clock
+        self.landmark = clock()
+
+        self.scores: Dict[int, float] = {}  # landmark-relative
+        self.groups_of: Dict[int, Tuple[GroupKey, ...]] = {}
+        self.members: Dict[GroupKey, Set[int]] = {}
+        self.top: Dict[GroupKey, List[Tuple[int, float]]] = {}
+
+        self.pending: Dict[int, float] = {}
+        self.pending_events = 0
+
+    def _scale(self, at: float) -> float:
+        return math.exp(self.rate * (at - self.landmark))
+
+    def record(self, attraction_id: int, kind: str, at: Optional[float] = None):
+        """Buffer one event (cheap; applied on the next flush). Raises ValueError for unknown kinds."""
+        weight = EVENT_WEIGHTS.get(kind)
+        if weight is None:
+            raise ValueError(f"Unknown event kind: {kind} (use one of {', '.join(EVENT_WEIGHTS)})")
+        at = self.clock() if at is None else at
+        self.pending[attraction_id] = self.pending.get(attraction_id, 0.0) + weight * self._scale(at)
+        self.pending_events += 1
+
+    def load(self, rows: Iterable[Tuple[int, float, float]], lookup: Callable[[int], Optional[GroupKey]]):
+        """Restore persisted (attraction_id, score, updated) rows."""
+        touched = {}
+        for attraction_id, score, updated in rows:
+            touched[attraction_id] = score * self._scale(updated)
+        self._merge(touched, lookup)
+
+    def apply(self, lookup: Callable[[int], Optional[GroupKey]]) -> Dict[int, float]:
+        """
+        Apply buffered events and re-rank the touched groups. `lookup` maps an
+        attraction id to its (category, vicinity), or None for ids that are not in
+        the catalog, whose events are dropped. Returns {attraction_id: score now}
+        for the changed attractions, for persisting.
+        """
+        pending, self.pending, self.pending_events = self.pending, {}, 0
+        if not pending:
+            return {}
+        touched = {i: self.scores.get(i, 0.0) + delta for i, delta in pending.items()}
+        self._merge(touched, lookup)
+
+        now = self.clock()
+        if self.rate * (now - self.landmark) > MAX_LANDMARK_EXPONENT:
+            self.rebase(now, lookup)
+        return {i: self.current(self.scores[i], now) for i in touched if i in self.scores}
+
+    def _merge(self, touched: Dict[int, float], lookup: Callable[[int], Optional[GroupKey]]):
+        dirty: Set[GroupKey] = set()
+        for attraction_id, score in touched.items():
+            previous = self.groups_of.get(attraction_id, ())
+            found = lookup(attraction_id)
+            if found is None:
+                # Not (or no longer) in the catalog: never ranked, never persisted
+                self.scores.pop(attraction_id, None)
+                self.groups_of.pop(attraction_id, None)
+                for key in previous:
+                    self.members.get(key, set()).discard(attraction_id)
+                dirty.update(previous)
+                continue
+            self.scores[attraction_id] = score
+            groups = group_keys(*found)
+            if groups != previous:
+                for key in previous:
+                    self.members.get(key, set()).discard(attraction_id)
+                self.groups_of[attraction_id] = groups
+                dirty.update(previous)
+            for key in groups:
+                self.members.setdefault(key, set()).add(attraction_id)
+            dirty.update(groups)
+        for key in dirty:
+            self._rank(key)
+
+    def _rank(self, key: GroupKey):
+        members = self.members.get(key)
+        if not members:
+            self.members.pop(key, None)
+            self.top.pop(key, None)
+            return
+        self.top[key] = heapq.nlargest(self.top_n, ((i, self.scores[i]) for i in members), key=lambda item: item[1])
+
+    def rebase(self, now: float, lookup: Callable[[int], Optional[GroupKey]]):
+        """Move the landmark to `now`, dropping scores that decayed to nothing."""
+        factor = math.exp(-self.rate * (now - self.landmark))
+        self.landmark = now
+        self.pending = {i: delta * factor for i, delta in self.pending.items()}
+        scores = {i: s * factor for i, s in self.scores.items() if s * factor >= TRENDING_MIN_SCORE}
+        self.scores, self.groups_of, self.members, self.top = {}, {}, {}, {}
+        self._merge(scores, lookup)
+
+    def current(self, score: float, now: Optional[float] = None) -> float:
+        """Landmark-relative score -> decayed score at `now`."""
+        now = self.clock() if now is None else now
+        return score * math.exp(-self.rate * (now - self.landmark))
+
+    def trending(
+        self,
+        category: Optional[str] = None,
+        vicinity: Optional[str] = None,
+        limit: int = TRENDING_TOP_N,
+    ) -> List[Tuple[int, float]]:
+        """(attraction_id, score now) for the top `limit` of a group, best first."""
+        top = self.top.get((category or None, vicinity or None), [])[:limit]
+        now = self.clock()
+        return [(i, self.current(s, now)) for i, s in top]
+
+
+class SearchHits:
+    """Recent search results by query, so cached search responses still count as hits."""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._results: "OrderedDict[str, Tuple[int, ...]]" = OrderedDict()
+
+    def remember(self, query: str, ids: Sequence[int]):
+        key = query.strip().lower()
+        self._results[key] = tuple(ids)
+        self._results.move_to_end(key)
+        while len(self._results) > self.max_entries:
+            self._results.popitem(last=False)
+
+    def get(self, query: str) -> Tuple[int, ...]:
+        return self._results.get(query.strip().lower(), ())
+
+
+def _lookup(attraction_id: int) -> Optional[GroupKey]:
+    """(primary_type, vicinity) of an attraction from the catalog snapshot, None when it is not in the catalog."""
+    snapshot = catalog_store.snapshot
+    if snapshot is None:
+        # Not built yet: only the "all" group (ids are checked when events are recorded)
+        return None, None
+    record = snapshot.get(attraction_id)
+    if record is None:
+        return None
+    return record.primary_type, record.vicinity
+
+
+class TrendingService:
+    """Owns the process-wide index: buffered recording, periodic flushes and persistence."""
+
+    def __init__(self, index: Optional[TrendingIndex] = None):
+        self.index = index or TrendingIndex()
+        self.search_hits = SearchHits()
+        self._flusher: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+
+    def record(self, attraction_id: int, kind: str):
+        self.index.record(attraction_id, kind)
+        if self.index.pending_events >= TRENDING_BUFFER_MAX:
+            try:
+                asyncio.get_running_loop().create_task(self.flush())
+            except RuntimeError:
+                pass  # no loop; the periodic flush picks it up
+
+    def record_search(self, query: str):
+        for attraction_id in self.search_hits.get(query):
+            self.index.record(attraction_id, "search_hit")
+
+    def trending(self, category: Optional[str] = None, vicinity: Optional[str] = None, limit: int = TRENDING_TOP_N):
+        return self.index.trending(category, vicinity, limit)
+
+    async def load(self, db: AsyncSession):
+        result = await db.execute(select(TrendingScore.attraction_id, TrendingScore.score, TrendingScore.updated))
+        self.index.load(result.all(), _lookup)
+
+    async def flush(self):
+        """Apply buffered events and upsert the changed scores in one statement."""
+        async with self._flush_lock:
+            changed = self.index.apply(_lookup)
+            if not changed:
+                return
+            now = self.index.clock()
+            stmt = insert(TrendingScore).values(
+                [{"attraction_id": i, "score": score, "updated": now} for i, score in changed.items()]
+            )
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[TrendingScore.attraction_id],
+                set_={"score": stmt.excluded.score, "updated": stmt.excluded.updated},
+            )
+            try:
+                async with database.AsyncSessionLocal() as db:
+                    await db.execute(stmt)
+                    await db.commit()
+            except Exception as e:
+                # Scores stay in memory; they are written again on their next change
+                logger.error(f"Trending flush failed: {e}")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(TRENDING_FLUSH_SECONDS)
+            await self.flush()
+
+    async def start(self):
+        """Load persisted scores and start the periodic flusher."""
+        if self._flusher is not None:
+            return
+        try:
+            async with database.AsyncSessionLocal() as db:
+                # Group membership comes from the snapshot, so make sure it is built
+                await catalog_store.get(db)
+                await self.load(db)
+        except Exception as e:
+            logger.error(f"Loading trending scores failed: {e}")
+        self._flusher = asyncio.get_running_loop().create_task(self._run())
+
+
+# Process-wide trending scores
+trending_service = TrendingService()
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Load generator for the /chat SSE endpoint.
+
+Opens N concurrent /chat sessions and reports per-session time to first token,
+tokens/sec, error and rejection rates, plus event-loop lag (the server's, from
+/metrics, and this client's, so a saturated load generator is not mistaken for
+a slow server).
+
+Run the API against the offline backends so no provider quota is spent:
+
+    LLM_BACKEND=fake EMBEDDING_BACKEND=fake FAKE_LLM_TOKENS_PER_SECOND=80 python run.py
+    python load_test_chat.py --concurrency 50 --requests 500
+
+KNN still runs against the configured Postgres (fake embeddings return
+arbitrary but deterministic neighbours). Use --unique to defeat the chat cache.
+"""
+import os, sys, asyncio
+
+# set policy immediately, before anything else
+if sys.platform.startswith("win"):
+    asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+
+import argparse
+import itertools
+import json
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import httpx
+
+DEFAULT_QUERIES = [
+    "Plan a rainy day in Manhattan with museums",
+    "Two days with kids, parks and ice cream",
+    "Cheap things to do in Brooklyn at night",
+    "Best views of the skyline for photographers",
+    "A food tour through Queens",
+    "Jazz clubs and late night bars",
+    "Historic landmarks within walking distance of each other",
+    "Romantic evening for two near Central Park",
+]
+
+
+@dataclass
+class Session:
+    status: str = "ok"  # ok | error | rejected | http_error | timeout
+    http_status: Optional[int] = None
+    started: float = 0.0
+    first_token: Optional[float] = None
+    finished: Optional[float] = None
+    tokens: int = 0
+    events: int = 0
+    error: Optional[str] = None
+
+    @property
+    def ttft(self) -> Optional[float]:
+        return None if self.first_token is None else self.first_token - self.started
+
+    @property
+    def tokens_per_second(self) -> Optional[float]:
+        if self.first_token is None or self.finished is None or self.finished <= self.first_token or not self.tokens:
+            return None
+        return self.tokens / (self.finished - self.first_token)
+
+
+@dataclass
+class LagSampler:
+    """Measures this process's event-loop lag while the test runs."""
+    interval: float = 0.05
+    samples: List[float] = field(default_factory=list)
+
+    async def run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, time.perf_counter() - started - self.interval))
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile, None for no values."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(q * len(ordered) + 0.5)) - 1))]
+
+
+def parse_event(line: str) -> Optional[Dict]:
+    """The JSON payload of an SSE `data:` line, None for other lines."""
+    if not line.startswith("data:"):
+        return None
+    try:
+        return json.loads(line[5:].strip())
+    except ValueError:
+        return None
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + 3) // 4
+
+
+async def run_session(client: httpx.AsyncClient, url: str, query: str, timeout: float) -> Session:
+    session = Session(started=time.perf_counter())
+    try:
+        async with client.stream("GET", f"{url}/chat", params={"query": query}, timeout=timeout) as response:
+            session.http_status = response.status_code
+            if response.status_code == 429:
+                session.status = "rejected"
+                return session
+            if response.status_code != 200:
+                session.status = "http_error"
+                return session
+            async for line in response.aiter_lines():
+                event = parse_event(line)
+                if event is None:
+                    continue
+                session.events += 1
+                kind = event.get("type")
+                if kind == "token":
+                    if session.first_token is None:
+                        session.first_token = time.perf_counter()
+                    content = str(event.get("content", ""))
+                    session.tokens += estimate_tokens(content)
+                    if content.startswith("Sorry, I encountered an error"):
+                        session.status, session.error = "error", content[:120]
+                elif kind == "error":
+                    session.status, session.error = "error", event.get("message")
+                elif kind == "complete":
+                    break
+            else:
+                if session.status == "ok":
+                    session.status, session.error = "error", "stream ended without complete"
+    except httpx.TimeoutException:
+        session.status = "timeout"
+    except httpx.HTTPError as e:
+        session.status, session.error = "http_error", str(e)
+    finally:
+        session.finished = time.perf_counter()
+    return session
+
+
+async def fetch_server_metrics(client: httpx.AsyncClient, url: str) -> Dict:
+    try:
+        response = await client.get(f"{url}/metrics", timeout=10)
+        return response.json()
+    except (httpx.HTTPError, ValueError):
+        return {}
+
+
+def _server_stat(snapshot: Dict, kind: str, name: str, key: str = "value"):
+    for item in snapshot.get(kind, []):
+        if item["name"] == name:
+            return item.get(key)
+    return None
+
+
+def _fmt(seconds: Optional[float], scale: float = 1000, unit: str = "ms") -> str:
+    return "-" if seconds is None else f"{seconds * scale:.1f}{unit}"
+
+
+def report(sessions: List[Session], elapsed: float, client_lag: List[float], server: Dict):
+    total = len(sessions)
+    by_status: Dict[str, int] = {}
+    for s in sessions:
+        by_status[s.status] = by_status.get(s.status, 0) + 1
+    ttfts = [s.ttft for s in sessions if s.ttft is not None]
+    rates = [s.tokens_per_second for s in sessions if s.tokens_per_second is not None]
+    durations = [s.finished - s.started for s in sessions if s.finished is not None and s.status == "ok"]
+    tokens = sum(s.tokens for s in sessions)
+
+    print(f"\nSessions: {total} in {elapsed:.1f}s ({total / elapsed:.1f}/s), {tokens / elapsed:.0f} tokens/s overall")
+    print("Status:   " + ", ".join(f"{status}={count}" for status, count in sorted(by_status.items())))
+    print(f"Errors:   {(total - by_status.get('ok', 0)) / max(1, total):.1%} (rejected {by_status.get('rejected', 0)})")
+    print(f"TTFT:     p50 {_fmt(percentile(ttfts, .5))}  p95 {_fmt(percentile(ttfts, .95))}  p99 {_fmt(percentile(ttfts, .99))}")
+    print(f"Duration: p50 {_fmt(percentile(durations, .5))}  p95 {_fmt(percentile(durations, .95))}")
+    print(f"Tok/s:    p50 {_fmt(percentile(rates, .5), 1, '')}  p5 {_fmt(percentile(rates, .05), 1, '')} per session")
+    print(f"Client loop lag: p50 {_fmt(percentile(client_lag, .5))}  p99 {_fmt(percentile(client_lag, .99))}  "
+          f"max {_fmt(max(client_lag) if client_lag else None)}")
+    if server:
+        print(f"Server loop lag: p50 {_fmt(_server_stat(server, 'histograms', 'event_loop_lag_seconds', 'p50'))}  "
+              f"p99 {_fmt(_server_stat(server, 'histograms', 'event_loop_lag_seconds', 'p99'))}  "
+              f"max {_fmt(_server_stat(server, 'gauges', 'event_loop_lag_max_seconds'))}")
+    else:
+        print("Server loop lag: unavailable (/metrics not reachable)")
+    for s in sessions:
+        if s.error:
+            print(f"First error: {s.error}")
+            break
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Load test the /chat SSE endpoint")
+    parser.add_argument("--url", default=os.getenv("API_URL", "http://127.0.0.1:8000"))
+    parser.add_argument("--concurrency", "-c", type=int, default=20, help="concurrent SSE sessions")
+    parser.add_argument("--requests", "-n", type=int, default=100, help="total sessions")
+    parser.add_argument("--query", action="append", help="query to send (repeatable), defaults to a built-in mix")
+    parser.add_argument("--unique", action="store_true", help="make every query unique to bypass the chat cache")
+    parser.add_argument("--timeout", type=float, default=120.0, help="per-session timeout in seconds")
+    args = parser.parse_args()
+
+    queries = itertools.cycle(args.query or DEFAULT_QUERIES)
+    counter = itertools.count()
+    sessions: List[Session] = []
+    sampler = LagSampler()
+    lag_task = asyncio.create_task(sampler.run())
+
+    limits = httpx.Limits(max_connections=args.concurrency + 2, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(limits=limits) as client:
+        async def worker():
+            while True:
+                n = next(counter)
+                if n >= args.requests:
+                    return
+                query = next(queries)
+                if args.unique:
+                    query = f"{query} #{n}"
+                sessions.append(await run_session(client, args.url, query, args.timeout))
+
+        print(f"Running {args.requests} sessions against {args.url} with concurrency {args.concurrency}...")
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+        server = await fetch_server_metrics(client, args.url)
+
+    lag_task.cancel()
+    report(sessions, elapsed, sampler.samples, server)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+
+from ..app.services.admission import (
+    QUEUE_DEPTH_METRIC,
+    REJECTED_METRIC,
+    AdmissionController,
+    AdmissionRejected,
+)
+from ..app.services.metrics import metrics
+
+
+class TestAdmission:
+
+    def test_cap_and_priority_order(self):
+        async def run():
+            controller = AdmissionController(max_concurrent=1, max_queue=5, queue_timeout=5, service_seconds=0.01)
+            first = await controller.acquire()
+            order = []
+
+            async def waiter(name, priority):
+                slot = await controller.acquire(priority=priority)
+                order.append(name)
+                slot.release()
+
+            tasks = [asyncio.create_task(waiter(name, p)) for name, p in (("free", 0), ("pro", 2), ("plus", 1))]
+            await asyncio.sleep(0.01)
+            assert controller.active == 1 and controller.queue_depth == 3
+            first.release()
+            await asyncio.gather(*tasks)
+            assert controller.active == 0 and controller.queue_depth == 0
+            return order
+
+        assert asyncio.run(run()) == ["pro", "plus", "free"]
+
+    def test_rejections(self):
+        async def run():
+            metrics.reset()
+            controller = AdmissionController(max_concurrent=1, max_queue=1, queue_timeout=5, service_seconds=1)
+            slot = await controller.acquire()
+            queued = asyncio.create_task(controller.acquire())
+            await asyncio.sleep(0)
+
+            with pytest.raises(AdmissionRejected) as full:
+                await controller.acquire()
+            assert full.value.reason == "queue_full" and full.value.retry_after >= 1
+
+            slot.release()
+            (await queued).release()
+            assert metrics.counter(REJECTED_METRIC, {"reason": "queue_full"}) == 1
+
+            # Predicted wait beyond the timeout is rejected without waiting
+            slow = AdmissionController(max_concurrent=1, max_queue=10, queue_timeout=5, service_seconds=30)
+            held = await slow.acquire()
+            with pytest.raises(AdmissionRejected) as deadline:
+                await slow.acquire()
+            assert deadline.value.reason == "deadline" and deadline.value.retry_after == 30
+            held.release()
+
+        asyncio.run(run())
+
+    def test_timeout_leaves_queue(self):
+        async def run():
+            controller = AdmissionController(max_concurrent=1, max_queue=5, queue_timeout=0.05, service_seconds=0.01)
+            held = await controller.acquire()
+            with pytest.raises(AdmissionRejected) as timeout:
+                await controller.acquire()
+            assert timeout.value.reason == "timeout"
+            assert controller.queue_depth == 0
+            held.release()
+            held.release()  # idempotent
+            assert controller.active == 0
+
+        asyncio.run(run())
+        assert {"name": QUEUE_DEPTH_METRIC, "labels": {}, "value": 0} in metrics.snapshot()["gauges"]
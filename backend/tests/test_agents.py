@@ -0,0 +1,140 @@
+import asyncio
+import time
+
+from ..app.services import agents
+from ..app.services.query_memo import RewriteMemo, is_keyword_query
+
+
+class _Chunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class _Stream:
+    def __init__(self, texts, delay):
+        self.texts = texts
+        self.delay = delay
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for text in self.texts:
+            await asyncio.sleep(self.delay)
+            yield _Chunk(text)
+
+
+class _FakeModel:
+    """Async Gemini stand-in: each chunk takes `delay` seconds of (non-blocking) network time."""
+
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.calls = 0
+
+    async def generate_content_async(self, prompt, stream=False):
+        self.calls += 1
+        if stream:
+            return _Stream(["Day 1: ", "Central Park. ", "Day 2: ", "The Met."], self.delay)
+        await asyncio.sleep(self.delay)
+        return _Chunk("QUERY1: park walks\nQUERY2: art museums")
+
+
+class TestAgents:
+
+    def test_parse_generated_queries(self):
+        assert agents.parse_generated_queries("QUERY1: a b\nquery2: c d\n") == ("a b", "c d")
+        assert agents.parse_generated_queries("nothing useful") == ("", "")
+
+    def test_query_generation_is_async(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(agents, "model", _FakeModel())
+        monkeypatch.setattr(agents, "_rewrite_memo", RewriteMemo(agents.QUERY_GENERATOR_PROMPT, str(tmp_path)))
+        assert asyncio.run(agents.generate_search_queries("walks and art")) == ["park walks", "art museums"]
+
+    def test_keyword_queries(self):
+        assert is_keyword_query("Art museums")
+        assert is_keyword_query("jazz clubs!")
+        assert not is_keyword_query("what should I do with kids")
+        assert not is_keyword_query("pizza, bagels, museums, parks and bars")
+        assert not is_keyword_query("")
+
+    def test_keyword_query_skips_rewrite(self, monkeypatch):
+        fake = _FakeModel()
+        monkeypatch.setattr(agents, "model", fake)
+        assert asyncio.run(agents.generate_search_queries("jazz clubs")) == ["jazz clubs"]
+        assert fake.calls == 0
+
+    def test_rewrites_are_memoized_per_prompt_version(self, monkeypatch, tmp_path):
+        fake = _FakeModel(delay=0)
+        memo = RewriteMemo(agents.QUERY_GENERATOR_PROMPT, str(tmp_path))
+        monkeypatch.setattr(agents, "model", fake)
+        monkeypatch.setattr(agents, "_rewrite_memo", memo)
+
+        first = asyncio.run(agents.generate_search_queries("Somewhere fun for my kids?"))
+        again = asyncio.run(agents.generate_search_queries("somewhere fun for my  kids"))
+        assert first == again == ["park walks", "art museums"]
+        assert fake.calls == 1
+        assert memo.hits == 1
+
+        edited = RewriteMemo(agents.QUERY_GENERATOR_PROMPT + "v2", str(tmp_path))
+        assert asyncio.run(edited.get("somewhere fun for my kids")) is None
+
+    def test_concurrent_itineraries_stream_in_parallel(self, monkeypatch):
+        monkeypatch.setattr(agents, "model", _FakeModel(delay=0.05))
+
+        async def collect():
+            return "".join([token async for token in agents.generate_itinerary("2 days", "data")])
+
+        async def run():
+            return await asyncio.gather(*(collect() for _ in range(5)))
+
+        started = time.perf_counter()
+        results = asyncio.run(run())
+        elapsed = time.perf_counter() - started
+        assert results == ["Day 1: Central Park. Day 2: The Met."] * 5
+        # 5 streams x 4 chunks x 50ms would take 1s if they ran one after another
+        assert elapsed < 0.6
+
+    def test_merge_scored(self):
+        merged = agents.merge_scored([[(1, 0.9), (2, 0.6)], [(2, 0.8), (3, 0.7)], [(4, 0.5)]])
+        assert merged == [(1, 0.9), (2, 0.8), (3, 0.7), (4, 0.5)]
+        assert agents.merge_scored([]) == []
+
+    def test_retrieval_runs_raw_search_alongside_rewrite(self, monkeypatch):
+        started = []
+
+        async def rewrite(query):
+            started.append("rewrite")
+            await asyncio.sleep(0.05)
+            return ["museums", "parks"]
+
+        async def knn(query, max_results, vector=None):
+            started.append(query)
+            await asyncio.sleep(0.05)
+            return {"art": [(1, 0.7), (2, 0.6)], "museums": [(2, 0.9), (3, 0.5)], "parks": [(4, 0.8)]}[query]
+
+        monkeypatch.setattr(agents, "generate_search_queries", rewrite)
+        monkeypatch.setattr(agents, "knn_attraction_ids", knn)
+        monkeypatch.setattr(agents, "REWRITE_DEADLINE_SECONDS", 1.0)
+
+        begin = time.perf_counter()
+        ids = asyncio.run(agents.retrieve_attraction_ids("art"))
+        # raw search overlapped the rewrite: ~2 x 50ms, not 3 x 50ms
+        assert time.perf_counter() - begin < 0.14
+        assert started[:2] == ["art", "rewrite"]
+        assert ids == [(2, 0.9), (4, 0.8), (1, 0.7), (3, 0.5)]
+
+    def test_retrieval_deadline_falls_back_to_raw_query(self, monkeypatch):
+        async def slow_rewrite(query):
+            await asyncio.sleep(1.0)
+            return ["museums"]
+
+        async def knn(query, max_results, vector=None):
+            return [(7, 0.9), (8, 0.8)]
+
+        monkeypatch.setattr(agents, "generate_search_queries", slow_rewrite)
+        monkeypatch.setattr(agents, "knn_attraction_ids", knn)
+        monkeypatch.setattr(agents, "REWRITE_DEADLINE_SECONDS", 0.05)
+
+        begin = time.perf_counter()
+        assert asyncio.run(agents.retrieve_attraction_ids("art")) == [(7, 0.9), (8, 0.8)]
+        assert time.perf_counter() - begin < 0.5
@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+
+from ..app.services import agent_flow, agents
+from ..app.services.cancellation import CANCELLED_METRIC, ClientDisconnected, unless_disconnected
+from ..app.services.metrics import metrics
+
+
+class _Request:
+    def __init__(self, disconnected):
+        self.disconnected = disconnected
+
+    async def is_disconnected(self):
+        return self.disconnected
+
+
+class TestCancellation:
+
+    def test_cancelled_retrieval_cancels_spawned_searches(self, monkeypatch):
+        stopped = []
+
+        async def knn(query, max_results, vector=None):
+            try:
+                await asyncio.sleep(10)
+            finally:
+                stopped.append(query)
+
+        async def rewrite(query):
+            try:
+                await asyncio.sleep(10)
+            finally:
+                stopped.append("rewrite")
+
+        monkeypatch.setattr(agents, "knn_attraction_ids", knn)
+        monkeypatch.setattr(agents, "generate_search_queries", rewrite)
+
+        async def run():
+            task = asyncio.create_task(agents.retrieve_attraction_ids("art"))
+            await asyncio.sleep(0.01)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(run())
+        assert sorted(stopped) == ["art", "rewrite"]
+
+    def test_closing_the_chat_stream_stops_generation(self, monkeypatch):
+        closed = []
+
+        async def search(query, session=None, query_vector=None):
+            return "data"
+
+        async def itinerary(query, data):
+            try:
+                for i in range(100):
+                    await asyncio.sleep(0)
+                    yield f"token {i} "
+            finally:
+                closed.append(True)
+
+        monkeypatch.setattr(agents, "search_attractions", search)
+        monkeypatch.setattr(agents, "generate_itinerary", itinerary)
+        monkeypatch.setattr(agent_flow, "CHAT_CACHE_ENABLED", False)
+        metrics.reset()
+
+        async def run():
+            stream = agent_flow.run_trip_planner("museums")
+            async for event in stream:
+                if event["type"] == "token":
+                    break
+            # What the SSE response does once the client is gone
+            await stream.aclose()
+
+        asyncio.run(run())
+        assert closed == [True]
+        assert metrics.counter(CANCELLED_METRIC, {"stage": "generation"}) == 1
+
+    def test_unless_disconnected(self):
+        async def slow():
+            await asyncio.sleep(10)
+
+        async def run():
+            task = asyncio.ensure_future(slow())
+            with pytest.raises(ClientDisconnected):
+                await unless_disconnected(_Request(True), task, poll=0.01)
+            assert task.cancelled()
+            assert await unless_disconnected(_Request(False), asyncio.sleep(0.02, "ok"), poll=0.01) == "ok"
+
+        asyncio.run(run())
@@ -0,0 +1,103 @@
+import asyncio
+import threading
+
+import pytest
+
+from ..app.models.atractions import JSON_FIELDS
+from ..app.services import catalog
+from ..app.services.catalog import AttractionRecord, CatalogSnapshot, load_snapshot
+
+
+def _record(id, rating=None, popularity=None, types=None, lat=None, lng=None, location=None):
+    row = dict.fromkeys(JSON_FIELDS)
+    row.update(
+        id=id,
+        location=location or f"Place {id}",
+        rating=rating,
+        user_ratings_total=popularity,
+        types=types,
+        latitude=lat,
+        longitude=lng,
+    )
+    return AttractionRecord.from_row([row[name] for name in JSON_FIELDS])
+
+
+def _snapshot():
+    return CatalogSnapshot(
+        [
+            _record(3, rating=4.5, popularity=100, types=["museum"], lat=40.7794, lng=-73.9632, location="The Met"),
+            _record(1, rating=4.7, popularity=50, types=["park"], lat=40.7829, lng=-73.9654, location="Central Park"),
+            _record(2, rating=4.5, popularity=900, types=["museum", "tourist_attraction"]),
+            _record(4, rating=None, popularity=None, types=None),
+            _record(5, rating=4.7, popularity=10, types=["park"]),
+        ],
+        version="v1",
+    )
+
+
+def _walk(snapshot, sort, limit, mask=None):
+    ids, cursor = [], None
+    while True:
+        records, cursor = snapshot.page(limit, cursor, sort, mask)
+        ids.extend(r.id for r in records)
+        if cursor is None:
+            return ids
+
+
+class TestCatalogSnapshot:
+
+    def test_records_serialize_like_attractions_and_are_immutable(self):
+        record = _record(1, rating=4.0, types=["park"])
+        assert list(record.__json__()) == list(JSON_FIELDS)
+        assert record.__json__(("id", "rating")) == {"id": 1, "rating": 4.0}
+        with pytest.raises(AttributeError):
+            record.rating = 5.0
+
+    def test_id_pages_cover_everything_in_order(self):
+        assert _walk(_snapshot(), "id", 2) == [1, 2, 3, 4, 5]
+
+    def test_rating_sort_breaks_ties_by_id_desc(self):
+        # matches ORDER BY COALESCE(rating, 0) DESC, id DESC
+        assert _walk(_snapshot(), "rating", 1) == [5, 1, 3, 2, 4]
+        assert _walk(_snapshot(), "rating", 50) == [5, 1, 3, 2, 4]
+
+    def test_popularity_sort(self):
+        assert _walk(_snapshot(), "popularity", 3) == [2, 3, 1, 5, 4]
+
+    def test_mask_filters(self):
+        snapshot = _snapshot()
+        assert _walk(snapshot, "id", 1, snapshot.mask(place_type="museum")) == [2, 3]
+        assert _walk(snapshot, "rating", 1, snapshot.mask(min_rating=4.7)) == [5, 1]
+        assert snapshot.mask() is None
+
+    def test_get_many_keeps_order_and_skips_unknown(self):
+        assert [r.id for r in _snapshot().get_many([5, 99, 1])] == [5, 1]
+
+    def test_geo_and_name_lookup(self):
+        snapshot = _snapshot()
+        assert len(snapshot.geo) == 2
+        assert snapshot.find_by_name("central").id == 1
+        assert snapshot.find_by_name("nowhere") is None
+        assert [i for i, _ in snapshot.geo.nearest(40.7794, -73.9632, k=1)] == [3]
+
+    def test_snapshot_is_built_off_the_event_loop(self, monkeypatch):
+        row = dict.fromkeys(JSON_FIELDS)
+        row.update(id=1, location="Central Park")
+        threads = []
+
+        def build(rows, version):
+            threads.append(threading.current_thread())
+            return CatalogSnapshot([AttractionRecord.from_row(r) for r in rows], version)
+
+        class Result:
+            def all(self):
+                return [[row[name] for name in JSON_FIELDS]]
+
+        class Db:
+            async def execute(self, statement):
+                return Result()
+
+        monkeypatch.setattr(catalog, "build_snapshot", build)
+        snapshot = asyncio.run(load_snapshot(Db(), "v2"))
+        assert len(snapshot) == 1 and snapshot.version == "v2"
+        assert threads and threads[0] is not threading.main_thread()
@@ -0,0 +1,85 @@
+import asyncio
+from datetime import datetime
+
+import numpy as np
+
+from ..app.services import agent_flow
+from ..app.services import chat_cache
+from ..app.services.chat_cache import SemanticCache, seconds_left_in_hour
+from ..app.services.text import normalize_query
+from ..app.services.opening_hours import CATALOG_TIMEZONE
+
+EVENTS = [
+    {"type": "status", "message": "Searching", "done": False},
+    {"type": "token", "content": "Visit the zoo.", "done": False},
+    {"type": "complete", "done": True},
+]
+
+
+def _vector(*values):
+    vector = np.zeros(8)
+    vector[: len(values)] = values
+    return vector
+
+
+class TestChatCache:
+
+    def test_normalize_query(self):
+        assert normalize_query("  Things to do,  with KIDS!! ") == "things to do with kids"
+
+    def test_similar_queries_hit(self):
+        cache = SemanticCache(threshold=0.9)
+        cache.store("things to do with kids", _vector(1.0, 0.1), EVENTS)
+        events, similarity = cache.lookup("family friendly activities", _vector(0.98, 0.15))
+        assert events == EVENTS and similarity > 0.9
+        assert cache.lookup("modern art museums", _vector(0.1, 1.0)) is None
+        # Exact repeats do not need a vector
+        assert cache.get_exact("things to do with kids") == EVENTS
+        assert (cache.hits, cache.misses) == (2, 1)
+
+    def test_ttl_bound_and_invalidate(self):
+        cache = SemanticCache(ttl=-1)
+        cache.store("a", _vector(1.0), EVENTS)
+        assert cache.lookup("a", _vector(1.0)) is None
+
+        cache = SemanticCache(max_entries=2)
+        cache.store("a", _vector(1.0), EVENTS)
+        cache.store("b", _vector(0.0, 1.0), EVENTS)
+        cache.get_exact("a")
+        cache.store("c", _vector(0.0, 0.0, 1.0), EVENTS)
+        assert cache.get_exact("b") is None and cache.get_exact("a") is not None
+
+        cache.invalidate()
+        assert len(cache) == 0
+
+    def test_entries_expire_with_the_hour(self, monkeypatch):
+        assert seconds_left_in_hour(datetime(2025, 3, 1, 23, 45, tzinfo=CATALOG_TIMEZONE)) == 15 * 60
+        # "Open now" and today's date in the prompt may change once the hour is over
+        monkeypatch.setattr(chat_cache, "seconds_left_in_hour", lambda: -1)
+        cache = SemanticCache(ttl=3600)
+        cache.store("a", _vector(1.0), EVENTS)
+        assert cache.get_exact("a") is None
+
+    def test_flow_replays_cached_runs(self, monkeypatch):
+        runs = []
+
+        async def flow(query, timer=None, session=None, query_vector=None):
+            runs.append((query, query_vector))
+            for event in EVENTS:
+                yield event
+
+        async def embed(text):
+            return [1.0, 0.0] if "kids" in text or "family" in text else [0.0, 1.0]
+
+        monkeypatch.setattr(agent_flow, "run_trip_planner_flow", flow)
+        monkeypatch.setattr(agent_flow, "get_embedding", embed)
+        monkeypatch.setattr(agent_flow, "chat_cache", SemanticCache())
+
+        async def collect(query):
+            return [event async for event in agent_flow.run_trip_planner(query)]
+
+        assert asyncio.run(collect("Things to do with kids")) == EVENTS
+        assert asyncio.run(collect("family friendly activities")) == EVENTS
+        assert asyncio.run(collect("art museums")) == EVENTS
+        # Misses hand the lookup embedding to retrieval instead of embedding the query again
+        assert runs == [("Things to do with kids", [1.0, 0.0]), ("art museums", [0.0, 1.0])]
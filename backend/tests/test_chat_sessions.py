@@ -0,0 +1,113 @@
+import asyncio
+
+from ..app.services import agent_flow, agents
+from ..app.services.chat_sessions import ChatSession, SessionStore, is_refinement
+
+
+class _Chunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class _RecordingModel:
+    def __init__(self):
+        self.prompts = []
+
+    async def generate_content_async(self, prompt, stream=False):
+        self.prompts.append(prompt)
+
+        async def chunks():
+            for text in ("Day 1: ", f"answer {len(self.prompts)}"):
+                yield _Chunk(text)
+        return chunks()
+
+
+class TestChatSessions:
+
+    def test_store_scopes_sessions_to_owner(self):
+        store = SessionStore()
+        session = store.get_or_create(None, owner=1)
+        assert store.get(session.id, owner=1) is session
+        assert store.get(session.id, owner=2) is None
+        assert store.get_or_create(session.id, owner=None) is not session
+
+    def test_store_bounds_and_expiry(self):
+        store = SessionStore(ttl=60, max_sessions=3, per_user=2)
+        first, second, third = (store.get_or_create(None, owner=1) for _ in range(3))
+        assert store.get(first.id, 1) is None and store.get(third.id, 1) is third
+
+        others = [store.get_or_create(None, owner=None) for _ in range(3)]
+        assert len(store) == 3 and store.get(second.id, 1) is None
+
+        others[0].last_used -= 120
+        store.get(None, None)
+        assert store.get(others[0].id, None) is None
+
+    def test_session_keeps_recent_turns_and_best_scores(self):
+        session = ChatSession("s", None)
+        for i in range(10):
+            session.record_turn(f"q{i}", "x" * 10000)
+        assert len(session.turns) == 6 and session.earlier_queries[0] == "q4"
+        assert len(session.last_answer) == 6000
+
+        session.add_candidates([(1, 0.5), (2, 0.9)])
+        session.add_candidates([(1, 0.7), (2, 0.1)])
+        assert session.candidates == {1: 0.7, 2: 0.9}
+
+    def test_refinements(self):
+        assert is_refinement("Make it shorter")
+        assert is_refinement("can you put that in a table")
+        assert is_refinement("shorter please")
+        assert not is_refinement("add a lunch spot near the Met")
+        # Shape words that do not refer to the answer still search
+        assert not is_refinement("a restaurant with an outdoor table near there")
+        assert not is_refinement("tell me details about MoMA")
+        assert not is_refinement("somewhere less crowded")
+
+    def test_follow_ups_reuse_retrieval(self, monkeypatch):
+        retrievals, knn_queries, packed = [], [], []
+
+        async def retrieve(query, max_results=10, query_vector=None):
+            retrievals.append(query)
+            return [(1, 0.9), (2, 0.8), (4, 0.5)]
+
+        async def knn(query, max_results, vector=None):
+            knn_queries.append(query)
+            return [(2, 0.9), (3, 0.7), (4, 0.6)]
+
+        async def pack(candidates, budget=agents.CONTEXT_TOKEN_BUDGET):
+            # Attraction 4 does not fit the first turn's budget
+            ids = [i for i, _ in candidates if i != 4 or budget == agents.FOLLOW_UP_TOKEN_BUDGET]
+            packed.append((ids, budget))
+            return ", ".join(f"place {i}" for i in ids), ids
+
+        model = _RecordingModel()
+        monkeypatch.setattr(agents, "retrieve_attraction_ids", retrieve)
+        monkeypatch.setattr(agents, "knn_attraction_ids", knn)
+        monkeypatch.setattr(agents, "pack_candidates", pack)
+        monkeypatch.setattr(agents, "model", model)
+        monkeypatch.setattr(agent_flow, "CHAT_CACHE_ENABLED", False)
+        session = ChatSession("s", None)
+
+        async def collect(query):
+            return [event async for event in agent_flow.run_trip_planner(query, session=session)]
+
+        events = asyncio.run(collect("museums with kids"))
+        assert events[0] == {"type": "session", "session_id": "s", "turn": 1, "done": False}
+        assert events[-1]["type"] == "complete"
+        assert session.last_answer == "Day 1: answer 1" and session.packed_ids == [1, 2]
+
+        # Only attractions the planner has not been shown are packed, with the follow-up budget;
+        # 4 was retrieved on the first turn but never packed
+        asyncio.run(collect("add a lunch spot"))
+        assert retrievals == ["museums with kids"] and knn_queries == ["add a lunch spot"]
+        assert packed[-1] == ([3, 4], agents.FOLLOW_UP_TOKEN_BUDGET)
+        prompt = model.prompts[-1]
+        assert "YOUR PREVIOUS ITINERARY:\nDay 1: answer 1" in prompt
+        assert "place 3" in prompt and "place 4" in prompt and "place 1" not in prompt
+
+        # Refinements search nothing
+        events = asyncio.run(collect("make it shorter"))
+        assert events[0]["turn"] == 3 and knn_queries == ["add a lunch spot"]
+        assert "NEW NYC ATTRACTIONS" not in model.prompts[-1]
+        assert session.earlier_queries == ["museums with kids", "add a lunch spot", "make it shorter"]
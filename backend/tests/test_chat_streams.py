@@ -0,0 +1,119 @@
+import asyncio
+import json
+
+from ..app.services import chat_streams as streams_module
+from ..app.services.admission import AdmissionController
+from ..app.services.cancellation import CANCELLED_METRIC
+from ..app.services.metrics import metrics
+from ..app.services.chat_streams import ChatStream, StreamRegistry, parse_event_id
+
+
+async def _generation(count, delay=0.0, started=None):
+    if started is not None:
+        started.append(True)
+    for i in range(count):
+        await asyncio.sleep(delay)
+        yield {"type": "token", "content": str(i)}
+    yield {"type": "complete", "done": True}
+
+
+async def _read(stream, after_seq=-1, limit=None):
+    seen = []
+    async for seq, data in stream.follow(after_seq):
+        seen.append((seq, json.loads(data)))
+        if limit is not None and len(seen) == limit:
+            break
+    return seen
+
+
+class TestChatStreams:
+
+    def test_parse_event_id(self):
+        assert parse_event_id("abc:12") == ("abc", 12)
+        assert parse_event_id(" abc:-1 ") == ("abc", -1)
+        assert parse_event_id("abc") is None
+        assert parse_event_id("abc:x") is None
+        assert parse_event_id(None) is None
+
+    def test_reconnect_resumes_without_regenerating(self):
+        async def run():
+            registry = StreamRegistry()
+            started = []
+            done = []
+            stream = registry.start(_generation(6, delay=0.01, started=started), on_done=lambda: done.append(True))
+
+            first = await _read(stream, limit=2)  # connection drops after two events
+            resumed, last_seq = registry.resume_point(f"{stream.id}:{first[-1][0]}")
+            assert resumed is stream
+            rest = await _read(resumed, last_seq)
+            return first, rest, started, done
+
+        first, rest, started, done = asyncio.run(run())
+        contents = [event.get("content") for _, event in first + rest]
+        assert contents == ["0", "1", "2", "3", "4", "5", None]
+        assert [seq for seq, _ in first + rest] == list(range(7))
+        assert started == [True] and done == [True]
+
+    def test_abandoned_generation_is_cancelled_after_grace(self, monkeypatch):
+        monkeypatch.setattr(streams_module, "CHAT_STREAM_GRACE", 0.02)
+
+        async def run():
+            registry = StreamRegistry()
+            stream = registry.start(_generation(1000, delay=0.01))
+            await _read(stream, limit=1)
+            await asyncio.sleep(0.1)
+            return stream
+
+        stream = asyncio.run(run())
+        assert stream.done and stream.task.cancelled()
+        assert stream.next_seq < 1000
+
+    def test_buffer_and_registry_bounds(self):
+        async def run():
+            stream = ChatStream("s", max_events=3)
+            for i in range(5):
+                stream.append({"n": i})
+            assert stream.first_seq == 2
+            assert stream.can_resume(1) and not stream.can_resume(0)
+
+            registry = StreamRegistry(ttl=-1)
+            finished = registry.start(_generation(0))
+            await finished.task
+            assert registry.get(finished.id) is None
+            assert registry.resume_point(f"{finished.id}:0") is None
+
+        asyncio.run(run())
+
+    def test_follower_that_falls_behind_gets_an_error(self):
+        async def run():
+            stream = ChatStream("s", max_events=3)
+            stream.append({"n": 0})
+            follower = stream.follow()
+            first = await follower.__anext__()
+            for i in range(1, 6):
+                stream.append({"n": i})  # seq 1 and 2 rotate out before the follower reads them
+            stream.finish()
+            return first, [item async for item in follower]
+
+        first, rest = asyncio.run(run())
+        assert first[0] == 0 and len(rest) == 1
+        seq, data = rest[0]
+        assert seq == 0 and json.loads(data)["type"] == "error"
+
+    def test_disconnect_without_reconnect_cancels_and_releases_slot(self, monkeypatch):
+        monkeypatch.setattr(streams_module, "CHAT_STREAM_GRACE", 0.05)
+        metrics.reset()
+
+        async def run():
+            admission = AdmissionController(max_concurrent=1)
+            slot = await admission.acquire()
+            stream = StreamRegistry().start(_generation(1000, delay=0.01), on_done=slot.release)
+            await _read(stream, limit=2)  # the client reads a little, then disconnects for good
+            assert admission.active == 1
+            await asyncio.sleep(0.2)
+            return stream, admission
+
+        stream, admission = asyncio.run(run())
+        assert stream.task.cancelled() and stream.next_seq < 100
+        assert admission.active == 0
+        assert metrics.counter(CANCELLED_METRIC, {"stage": "abandoned"}) == 1
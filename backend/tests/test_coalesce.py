@@ -0,0 +1,55 @@
+import asyncio
+
+from ..app.services.coalesce import coalesce_tokens
+
+
+def _token(text):
+    return {"type": "token", "content": text, "done": False}
+
+
+async def _events(items):
+    """items are events, or numbers meaning "pause this many seconds"."""
+    for item in items:
+        if isinstance(item, (int, float)):
+            await asyncio.sleep(item)
+        else:
+            yield item
+
+
+def _collect(items, **kw):
+    async def run():
+        return [event async for event in coalesce_tokens(_events(items), **kw)]
+
+    return asyncio.run(run())
+
+
+class TestCoalesce:
+
+    def test_first_token_immediate_rest_merged(self):
+        events = _collect(
+            [{"type": "status"}, _token("a"), _token("b"), _token("c"), {"type": "complete"}],
+            window_ms=1000, max_bytes=1000,
+        )
+        assert events == [{"type": "status"}, _token("a"), _token("bc"), {"type": "complete"}]
+
+    def test_flush_by_bytes(self):
+        events = _collect([_token("first")] + [_token("xy")] * 5, window_ms=1000, max_bytes=4)
+        assert [e["content"] for e in events] == ["first", "xyxy", "xyxy", "xy"]
+
+    def test_flush_by_time_while_upstream_is_quiet(self):
+        async def run():
+            seen = []
+            started = asyncio.get_running_loop().time()
+            stream = _events([_token("a"), _token("b"), _token("c"), 0.3, _token("d")])
+            async for event in coalesce_tokens(stream, window_ms=20, max_bytes=1000):
+                seen.append((event["content"], asyncio.get_running_loop().time() - started))
+            return seen
+
+        seen = asyncio.run(run())
+        assert [content for content, _ in seen] == ["a", "bc", "d"]
+        # "bc" went out on the window, not when "d" finally arrived
+        assert seen[1][1] < 0.2
+
+    def test_disabled(self):
+        items = [_token("a"), _token("b")]
+        assert _collect(items, window_ms=0) == items
@@ -0,0 +1,72 @@
+from types import SimpleNamespace
+
+from ..app.services.context_packer import (
+    build_summary,
+    clip_sentences,
+    estimate_tokens,
+    pack_context,
+    summarize_attraction,
+)
+
+
+def attraction(id, location, description="A place.", address=None, **kw):
+    fields = dict(
+        id=id,
+        location=location,
+        description=description,
+        primary_type="museum",
+        vicinity="Manhattan",
+        formatted_address=address or f"{id} Main St, New York, NY",
+        address=None,
+        rating=4.5,
+        user_ratings_total=100,
+        price_level=2,
+        summary=None,
+    )
+    fields.update(kw)
+    return SimpleNamespace(**fields)
+
+
+class TestContextPacker:
+
+    def test_summary(self):
+        summary = build_summary(
+            "The Met", "Huge art museum. Founded 1870. Many wings.", "art_museum", "Upper East Side",
+            rating=4.8, user_ratings_total=90000, price_level=3,
+        )
+        assert summary == (
+            "The Met (art museum, Upper East Side). Huge art museum. Founded 1870. Many wings. "
+            "Rated 4.8/5 (90000 reviews). Price $$$."
+        )
+        # The address stand-in description is dropped
+        a = attraction(1, "Pier 17", description="89 South St, New York, NY", address="89 South St, New York, NY")
+        assert "South St" not in summarize_attraction(a)
+
+    def test_clip_sentences(self):
+        assert clip_sentences("One. Two. Three.", 9) == "One. Two."
+        assert clip_sentences("x" * 20, 10) == "x" * 9 + "…"
+
+    def test_pack_ranks_by_score_and_dedupes(self):
+        rows = {
+            1: attraction(1, "Low"),
+            2: attraction(2, "High"),
+            3: attraction(3, "High", address="2 Main St, New York, NY"),  # same venue as 2
+        }
+        context, packed = pack_context([(1, 0.6), (2, 0.9), (3, 0.8), (4, 0.95)], rows, {2: True})
+        assert packed == [2, 1]
+        assert context.index("**High**") < context.index("**Low**")
+        assert "Open now: Yes" in context
+
+    def test_pack_respects_budget(self):
+        rows = {i: attraction(i, f"Place {i}", description="Words. " * 20) for i in range(1, 11)}
+        candidates = [(i, 1.0 - i / 100) for i in rows]
+        context, packed = pack_context(candidates, rows, budget=200)
+        assert packed and packed == sorted(packed)
+        assert len(packed) < 10
+        assert estimate_tokens(context) <= 200
+        # The best candidate is always included, however small the budget
+        assert pack_context(candidates, rows, budget=1)[1] == [1]
+
+    def test_precomputed_summary_is_used(self):
+        rows = {1: attraction(1, "Met", summary="Precomputed summary.")}
+        assert "Precomputed summary." in pack_context([(1, 0.9)], rows)[0]
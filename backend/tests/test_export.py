@@ -0,0 +1,49 @@
+import asyncio
+
+import orjson
+import pytest
+import zstandard
+
+from ..app.services.export import delete_line, end_line, parse_since, upsert_line, zstd_stream
+
+
+class _Attraction:
+    def __init__(self, **fields):
+        self.fields = fields
+
+    def __json__(self, fields=None):
+        return dict(self.fields)
+
+
+async def _chunks(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+async def _collect(stream):
+    return [chunk async for chunk in stream]
+
+
+class TestExport:
+
+    def test_parse_since_normalizes(self):
+        assert parse_since(None) is None
+        assert parse_since("2025-06-01") == "2025-06-01T00:00:00"
+        assert parse_since("2025-06-01T10:30:00.123456") == "2025-06-01T10:30:00.123456"
+        with pytest.raises(ValueError):
+            parse_since("yesterday")
+
+    def test_lines_are_ndjson(self):
+        line = upsert_line(_Attraction(id=3, location="Central Park"))
+        assert line.endswith(b"\n") and line.count(b"\n") == 1
+        assert orjson.loads(line) == {"op": "upsert", "id": 3, "location": "Central Park"}
+        assert orjson.loads(delete_line(7, "2025-06-01T00:00:00")) == {"op": "delete", "id": 7, "deleted": "2025-06-01T00:00:00"}
+        assert orjson.loads(end_line(2, None)) == {"op": "end", "count": 2, "since": None}
+
+    def test_zstd_stream_round_trips(self):
+        lines = [upsert_line(_Attraction(id=i)) for i in range(100)]
+        compressed = asyncio.run(_collect(zstd_stream(_chunks(b"".join(lines[:50]), b"".join(lines[50:])))))
+        # A block is flushed per input chunk
+        assert len(compressed) >= 2
+        decompressed = zstandard.ZstdDecompressor().decompressobj().decompress(b"".join(compressed))
+        assert decompressed == b"".join(lines)
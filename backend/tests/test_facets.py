@@ -0,0 +1,77 @@
+import random
+
+import pytest
+
+from ..app.services.facets import FacetIndex, parse_facet_filters, rows_to_bitmap
+
+
+class _Record:
+    def __init__(self, types=None, primary_type=None, price_level=None, rating=None, business_status=None, vicinity=None):
+        self.types = types
+        self.primary_type = primary_type
+        self.price_level = price_level
+        self.rating = rating
+        self.business_status = business_status
+        self.vicinity = vicinity
+
+
+RECORDS = [
+    _Record(["museum", "tourist_attraction"], "museum", 2, 4.8, "OPERATIONAL", "Upper East Side"),
+    _Record(["park"], "park", None, 4.6, "OPERATIONAL", "Midtown"),
+    _Record(["museum"], "museum", 1, 4.2, "CLOSED_TEMPORARILY", "Midtown"),
+    _Record(["restaurant"], "restaurant", 3, 3.4, "OPERATIONAL", "Midtown"),
+    _Record(None, None, None, None, None, None),
+]
+
+
+def _rows(index, bitmap):
+    return [row for row in range(index.size) if bitmap >> row & 1]
+
+
+class TestFacets:
+
+    def test_values_or_within_facet_and_facets_and(self):
+        index = FacetIndex(RECORDS)
+        assert _rows(index, index.select({"types": ["museum", "park"]})) == [0, 1, 2]
+        assert _rows(index, index.select({"types": ["museum"], "vicinity": ["Midtown"]})) == [2]
+        assert _rows(index, index.select({})) == [0, 1, 2, 3, 4]
+        assert index.select({"types": ["zoo"]}) == 0
+
+    def test_rating_bands_are_cumulative(self):
+        index = FacetIndex(RECORDS)
+        assert _rows(index, index.select({"rating_band": ["4.5+"]})) == [0, 1]
+        assert _rows(index, index.select({"rating_band": ["4+"]})) == [0, 1, 2]
+
+    def test_counts_are_disjunctive(self):
+        index = FacetIndex(RECORDS)
+        counts = index.counts({"types": ["museum"]})
+        # the selected facet is counted without its own filter...
+        assert counts["types"] == {"museum": 2, "park": 1, "restaurant": 1, "tourist_attraction": 1}
+        # ...while the others are restricted to museums
+        assert counts["vicinity"] == {"Midtown": 1, "Upper East Side": 1}
+        assert counts["price_level"] == {"1": 1, "2": 1}
+
+    def test_counts_limit(self):
+        index = FacetIndex(RECORDS)
+        assert list(index.counts({}, limit=1)["vicinity"]) == ["Midtown"]
+
+    def test_mask_roundtrip(self):
+        rng = random.Random(0)
+        records = [_Record(["museum"] if rng.random() < 0.3 else ["park"]) for _ in range(1000)]
+        index = FacetIndex(records)
+        bitmap = index.select({"types": ["museum"]})
+        mask = index.to_mask(bitmap)
+        assert mask.sum() == bitmap.bit_count()
+        assert all(mask[row] == (records[row].types == ["museum"]) for row in range(1000))
+        assert index.from_mask(mask) == bitmap
+
+    def test_rows_to_bitmap(self):
+        assert rows_to_bitmap([]) == 0
+        rows = [0, 3, 7, 8, 9, 1000]
+        assert rows_to_bitmap(rows) == sum(1 << row for row in rows)
+
+    def test_parse_facet_filters(self):
+        params = {"types": ["museum,park", " zoo "], "rating_band": ["4+"], "vicinity": None}
+        assert parse_facet_filters(params) == {"types": ["museum", "park", "zoo"], "rating_band": ["4+"]}
+        with pytest.raises(ValueError):
+            parse_facet_filters({"rating_band": ["5+"]})
@@ -0,0 +1,77 @@
+import asyncio
+import time
+
+import numpy as np
+import pytest
+
+from ..app.services.fake_backends import FakeBackendError, FakeEmbeddings, FakeGenerativeModel
+from ..app.services.loop_monitor import LAG_METRIC, LoopLagMonitor
+from ..app.services.metrics import metrics
+from ..app.services import agents
+from ..load_test_chat import parse_event, percentile
+
+
+class TestFakeBackends:
+
+    def test_query_rewrite_is_deterministic(self):
+        model = FakeGenerativeModel(latency_ms=0)
+
+        async def rewrite(prompt):
+            return (await model.generate_content_async(prompt)).text
+
+        first = asyncio.run(rewrite("museums"))
+        assert first == asyncio.run(rewrite("museums"))
+        assert agents.parse_generated_queries(first)[1]
+
+    def test_stream_latency_and_rate(self):
+        model = FakeGenerativeModel(latency_ms=50, tokens_per_second=400, response_tokens=40)
+
+        async def stream():
+            started = time.perf_counter()
+            response = await model.generate_content_async("plan", stream=True)
+            chunks = [chunk.text async for chunk in response]
+            return chunks, time.perf_counter() - started
+
+        chunks, elapsed = asyncio.run(stream())
+        assert len(chunks) == 10 and sum(len(c.split()) for c in chunks) == 40
+        # 50ms latency + 9 gaps of 4 tokens at 400 tokens/s = 140ms
+        assert 0.12 < elapsed < 0.5
+
+    def test_failure_injection(self):
+        model = FakeGenerativeModel(latency_ms=0, failure_rate=1.0)
+        with pytest.raises(FakeBackendError):
+            asyncio.run(model.generate_content_async("x"))
+
+        embeddings = FakeEmbeddings(latency_ms=0, failure_rate=1.0)
+        with pytest.raises(FakeBackendError):
+            asyncio.run(embeddings.embed("x"))
+
+    def test_embeddings_share_words(self):
+        embeddings = FakeEmbeddings(latency_ms=0)
+        kids = np.array(asyncio.run(embeddings.embed("things to do with kids")))
+        assert kids.shape == (256,) and abs(np.linalg.norm(kids) - 1) < 1e-5
+        assert np.allclose(kids, embeddings.vector("things to do with kids"))
+        similar = np.array(embeddings.vector("fun things to do with kids"))
+        unrelated = np.array(embeddings.vector("jazz bars in harlem"))
+        assert kids @ similar > kids @ unrelated
+
+    def test_loop_monitor_sees_blocking(self):
+        metrics.reset()
+
+        async def run():
+            monitor = LoopLagMonitor(interval=0.01)
+            monitor.start()
+            await asyncio.sleep(0.03)
+            time.sleep(0.1)  # block the loop
+            await asyncio.sleep(0.03)
+            monitor.stop()
+            return monitor.max_lag
+
+        assert asyncio.run(run()) >= 0.05
+        assert metrics.histogram(LAG_METRIC).count >= 2
+
+    def test_load_test_helpers(self):
+        assert parse_event('data: {"type": "token"}') == {"type": "token"}
+        assert parse_event("id: abc:1") is None
+        assert percentile([3, 1, 2, 4], 0.5) == 2
+        assert percentile([], 0.5) is None
@@ -0,0 +1,34 @@
+from datetime import datetime, timezone, timedelta
+
+import numpy as np
+
+from ..app.models.feed import UserFeed
+from ..app.services.feed import FEED_REFRESH_SECONDS, is_stale, mean_vector, rank_candidates, update_interest
+
+
+class TestFeed:
+
+    def test_mean_vector(self):
+        assert mean_vector([]) is None
+        assert mean_vector([[1.0, 0.0], [0.0, 1.0]]).tolist() == [0.5, 0.5]
+
+    def test_update_interest_is_a_running_mean(self):
+        vectors = [[1.0, 0.0, 2.0], [0.0, 1.0, 4.0], [3.0, 3.0, 0.0]]
+        interest, count = None, 0
+        for vector in vectors:
+            interest, count = update_interest(interest, count, vector)
+        assert count == 3
+        assert np.allclose(interest, np.mean(vectors, axis=0))
+
+    def test_rank_candidates(self):
+        # Chunk embeddings repeat attraction ids; seen attractions are skipped
+        assert rank_candidates([5, 3, 5, 7, 3, 9, 1], seen=[7], size=3) == [5, 3, 9]
+        assert rank_candidates([], seen=[]) == []
+
+    def test_is_stale(self):
+        now = datetime(2025, 6, 1, tzinfo=timezone.utc)
+        fresh = UserFeed(user_id=1, updated=now - timedelta(seconds=FEED_REFRESH_SECONDS - 1))
+        old = UserFeed(user_id=2, updated=now - timedelta(seconds=FEED_REFRESH_SECONDS + 1))
+        assert not is_stale(fresh, now)
+        assert is_stale(old, now)
+        assert is_stale(UserFeed(user_id=3), now)
@@ -0,0 +1,56 @@
+import pytest
+
+from ..app.services.geo import GeoIndex, haversine_m, parse_lat_lng
+
+# (id, lat, lng, rating, types)
+ROWS = [
+    (1, 40.7580, -73.9855, 4.7, ["tourist_attraction"]),   # Times Square
+    (2, 40.7484, -73.9857, 4.7, ["tourist_attraction"]),   # Empire State Building
+    (3, 40.7794, -73.9632, 4.8, ["museum"]),               # The Met
+    (4, 40.6892, -74.0445, 4.7, ["tourist_attraction"]),   # Statue of Liberty
+    (5, 40.7061, -73.9969, 3.9, ["park"]),                 # Brooklyn Bridge
+    (6, None, None, 5.0, ["museum"]),                      # no coordinates
+]
+
+
+class TestGeo:
+
+    def test_haversine_known_distance(self):
+        # Times Square -> Empire State Building is a little over 1km
+        assert haversine_m(40.7580, -73.9855, 40.7484, -73.9857) == pytest.approx(1067, rel=0.01)
+        assert haversine_m(40.0, -73.0, 40.0, -73.0) == pytest.approx(0.0)
+
+    def test_parse_lat_lng(self):
+        assert parse_lat_lng("40.75, -73.98") == (40.75, -73.98)
+        assert parse_lat_lng("Central Park") is None
+        assert parse_lat_lng("100,0") is None
+        assert parse_lat_lng(None) is None
+
+    def test_within_radius_sorted_by_distance(self):
+        index = GeoIndex.from_rows(ROWS)
+        assert len(index) == 5
+
+        hits = index.within(40.7580, -73.9855, 1500)
+        assert [i for i, _ in hits] == [1, 2]
+        assert hits[0][1] == pytest.approx(0.0, abs=1)
+
+    def test_point_just_inside_radius_is_found(self):
+        # Fine cells, so the bounding box edge decides
+        index = GeoIndex.from_rows([(1, 40.01055, -73.0, 4.0, [])], cell_degrees=1e-6)
+        distance = float(haversine_m(40.0, -73.0, 40.01055, -73.0))
+        assert [i for i, _ in index.within(40.0, -73.0, distance + 0.1)] == [1]
+
+    def test_within_filters_type_and_rating(self):
+        index = GeoIndex.from_rows(ROWS)
+        assert [i for i, _ in index.within(40.7580, -73.9855, 10_000, place_type="museum")] == [3]
+        assert 5 not in [i for i, _ in index.within(40.7580, -73.9855, 10_000, min_rating=4.0)]
+
+    def test_nearest_matches_brute_force(self):
+        index = GeoIndex.from_rows(ROWS)
+        lat, lng = 40.7128, -74.0060  # City Hall
+        brute = sorted(
+            ((r[0], float(haversine_m(lat, lng, r[1], r[2]))) for r in ROWS if r[1] is not None),
+            key=lambda hit: hit[1],
+        )
+        assert [i for i, _ in index.nearest(lat, lng, k=3)] == [i for i, _ in brute[:3]]
+        assert len(index.nearest(lat, lng, k=10)) == 5
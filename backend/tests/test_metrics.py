@@ -0,0 +1,73 @@
+import asyncio
+
+from ..app.services import agent_flow, agents
+from ..app.services.metrics import Histogram, MetricsRegistry, metrics
+from ..app.services.timing import STAGE_METRIC, TTFT_METRIC, StageTimer, stage
+
+
+class TestMetrics:
+
+    def test_histogram_quantiles(self):
+        histogram = Histogram((0.1, 0.5, 1.0))
+        for value in (0.05, 0.05, 0.3, 0.7, 5.0):
+            histogram.observe(value)
+        assert histogram.counts == [2, 1, 1, 1]
+        assert histogram.count == 5 and abs(histogram.sum - 6.1) < 1e-9
+        assert 0.1 <= histogram.quantile(0.5) <= 0.5
+        assert Histogram().quantile(0.5) is None
+
+    def test_prometheus_format(self):
+        registry = MetricsRegistry()
+        registry.increment("chat_requests_total")
+        registry.observe("chat_stage_seconds", 0.2, {"stage": "knn"}, buckets=(0.1, 1.0))
+        text = registry.prometheus()
+        assert "# TYPE chat_requests_total counter\nchat_requests_total 1\n" in text
+        assert 'chat_stage_seconds_bucket{stage="knn",le="0.1"} 0' in text
+        assert 'chat_stage_seconds_bucket{stage="knn",le="+Inf"} 1' in text
+        assert 'chat_stage_seconds_count{stage="knn"} 1' in text
+        snapshot = registry.snapshot()
+        assert snapshot["histograms"][0]["labels"] == {"stage": "knn"}
+
+    def test_stage_outside_timed_request_is_noop(self):
+        with stage("knn"):
+            pass
+
+    def test_overlapping_stages_report_their_span(self):
+        timer = StageTimer()
+        timer.record("knn", 1.0, 2.0)
+        timer.record("knn", 1.5, 3.0)
+        assert timer.spans["knn"] == [1.0, 3.0, 2]
+
+    def test_chat_emits_timing_and_records_histograms(self, monkeypatch):
+        async def search(query, session=None, query_vector=None):
+            async def knn():
+                with stage("knn"):
+                    await asyncio.sleep(0.01)
+            # Stages in spawned tasks report to the request's timer
+            await asyncio.gather(knn(), knn())
+            return "data"
+
+        async def itinerary(query, data):
+            for token in ("Day 1: ", "the Met."):
+                await asyncio.sleep(0.005)
+                yield token
+
+        monkeypatch.setattr(agents, "search_attractions", search)
+        monkeypatch.setattr(agents, "generate_itinerary", itinerary)
+        monkeypatch.setattr(agent_flow, "CHAT_CACHE_ENABLED", False)
+        metrics.reset()
+
+        async def collect(timing):
+            return [event async for event in agent_flow.run_trip_planner("museums", timing=timing)]
+
+        events = asyncio.run(collect(True))
+        assert [e["type"] for e in events[-2:]] == ["timing", "complete"]
+        timing = events[-2]
+        assert {"retrieval", "knn", "first_token", "generation"} <= set(timing["stages"])
+        assert timing["stages"]["knn"]["calls"] == 2
+        assert timing["ttft_ms"] >= timing["stages"]["retrieval"]["ms"]
+        assert timing["tokens"] > 0 and timing["tokens_per_second"] > 0
+
+        assert "timing" not in [e["type"] for e in asyncio.run(collect(False))]
+        assert metrics.histogram(STAGE_METRIC, {"stage": "knn"}).count == 2
+        assert metrics.histogram(TTFT_METRIC, {"cached": "false"}).count == 2
@@ -0,0 +1,108 @@
+import asyncio
+import gzip
+
+import orjson
+import ormsgpack
+import pytest
+import zstandard
+from starlette.requests import Request
+
+from ..app.services.negotiation import (
+    MSGPACK_MEDIA_TYPE,
+    Representation,
+    choose_encoding,
+    choose_media_type,
+    encode_body,
+    negotiate,
+)
+from ..app.services.pagination import COMPACT_FIELDS, parse_fields
+from ..app.services.response_cache import ResponseCache, serve_cached
+from ..app.services import response_cache as response_cache_module
+
+BODY = orjson.dumps([{"id": i, "location": f"Place {i}", "rating": 4.5} for i in range(100)])
+
+
+def _request(path="/attractions", query=b"limit=10", **headers):
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": path,
+        "query_string": query,
+        "headers": [(k.replace("_", "-").lower().encode(), v.encode()) for k, v in headers.items()],
+    }
+    return Request(scope)
+
+
+class TestNegotiation:
+
+    def test_choose_encoding(self):
+        assert choose_encoding(None) is None
+        assert choose_encoding("gzip, deflate, br") == "gzip"
+        assert choose_encoding("gzip, zstd") == "zstd"
+        assert choose_encoding("zstd;q=0.5, gzip") == "gzip"
+        assert choose_encoding("zstd;q=0, gzip;q=0") is None
+        assert choose_encoding("*") == "zstd"
+        assert choose_encoding("identity") is None
+
+    def test_choose_media_type(self):
+        assert choose_media_type(None) == "application/json"
+        assert choose_media_type("application/x-msgpack, */*") == MSGPACK_MEDIA_TYPE
+        assert choose_media_type("application/msgpack;q=0, */*") == "application/json"
+        assert choose_media_type("application/msgpack;q=0.5, application/json") == "application/json"
+        assert choose_media_type("application/json;q=0.5, application/msgpack; q=0.9") == MSGPACK_MEDIA_TYPE
+        assert choose_media_type("*/*") == "application/json"
+
+    def test_negotiate_reads_capabilities(self):
+        representation = negotiate(_request(accept="application/msgpack", accept_encoding="gzip", x_client_capabilities="foo, Compact"))
+        assert representation == Representation(MSGPACK_MEDIA_TYPE, "gzip", True)
+
+    def test_encode_body(self):
+        body, headers = encode_body(BODY, Representation(MSGPACK_MEDIA_TYPE, "zstd"))
+        assert headers["Content-Encoding"] == "zstd"
+        assert headers["Content-Type"] == MSGPACK_MEDIA_TYPE
+        assert ormsgpack.unpackb(zstandard.ZstdDecompressor().decompress(body)) == orjson.loads(BODY)
+
+        body, headers = encode_body(BODY, Representation(encoding="gzip"))
+        assert gzip.decompress(body) == BODY and len(body) < len(BODY)
+
+        # Small bodies are sent as is
+        body, headers = encode_body(b"[]", Representation(encoding="gzip"))
+        assert body == b"[]" and "Content-Encoding" not in headers
+
+    def test_parse_fields_compact(self):
+        assert parse_fields(None, compact=True) == COMPACT_FIELDS
+        assert "images" not in COMPACT_FIELDS and "photos" in COMPACT_FIELDS
+        assert parse_fields("id,tags,types", compact=True) == ("id", "types")
+        with pytest.raises(ValueError):
+            parse_fields("type,tags", compact=True)
+        assert parse_fields("type,tags") == ("type", "tags")
+
+    def test_serve_cached_per_representation(self, monkeypatch):
+        monkeypatch.setattr(response_cache_module, "response_cache", ResponseCache())
+        builds = []
+
+        async def build():
+            builds.append(1)
+            return BODY, {"X-Next-Cursor": "abc"}
+
+        async def run():
+            plain = await serve_cached(_request(), None, 60, build, version="v1")
+            packed = await serve_cached(_request(accept_encoding="zstd", accept="application/msgpack"), None, 60, build, version="v1")
+            again = await serve_cached(_request(accept_encoding="zstd", accept="application/msgpack"), None, 60, build, version="v1")
+            not_modified = await serve_cached(
+                _request(accept_encoding="zstd", accept="application/msgpack", if_none_match=packed.headers["etag"]),
+                None, 60, build, version="v1",
+            )
+            return plain, packed, again, not_modified
+
+        plain, packed, again, not_modified = asyncio.run(run())
+        # Every representation is derived from one build
+        assert len(builds) == 1
+        assert plain.body == BODY and plain.headers["content-type"] == "application/json"
+        assert packed.headers["content-encoding"] == "zstd"
+        assert packed.headers["x-next-cursor"] == "abc"
+        assert "Accept-Encoding" in packed.headers["vary"]
+        assert ormsgpack.unpackb(zstandard.ZstdDecompressor().decompress(packed.body)) == orjson.loads(BODY)
+        assert packed.headers["etag"] != plain.headers["etag"]
+        assert again.body == packed.body
+        assert not_modified.status_code == 304
@@ -0,0 +1,70 @@
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+
+from ..app.services.opening_hours import (
+    MINUTES_PER_WEEK,
+    OpeningHoursIndex,
+    compile_opening_hours,
+    compile_periods,
+    parse_open_at,
+    utc_minute_of_week,
+)
+
+NYC = ZoneInfo("America/New_York")
+
+# Mon-Fri 09:00-17:00
+WEEKDAYS = [{"open": {"day": d, "time": "0900"}, "close": {"day": d, "time": "1700"}} for d in range(1, 6)]
+# Saturday 22:00 until Sunday 02:00 (wraps the end of the week)
+LATE_SATURDAY = [{"open": {"day": 6, "time": "2200"}, "close": {"day": 0, "time": "0200"}}]
+ALWAYS_OPEN = [{"open": {"day": 0, "time": "0000"}}]
+
+
+class TestOpeningHours:
+
+    def test_compile_weekdays(self):
+        intervals = compile_periods(WEEKDAYS)
+        assert intervals[0] == [1 * 1440 + 540, 1 * 1440 + 1020]
+        assert len(intervals) == 5
+
+    def test_compile_wraps_and_merges(self):
+        assert compile_periods(LATE_SATURDAY) == [[0, 120], [6 * 1440 + 1320, MINUTES_PER_WEEK]]
+        overlapping = [
+            {"open": {"day": 1, "time": "0900"}, "close": {"day": 1, "time": "1200"}},
+            {"open": {"day": 1, "time": "1100"}, "close": {"day": 1, "time": "1500"}},
+        ]
+        assert compile_periods(overlapping) == [[1440 + 540, 1440 + 900]]
+
+    def test_compile_always_open_and_unknown(self):
+        assert compile_periods(ALWAYS_OPEN) == [[0, MINUTES_PER_WEEK]]
+        assert compile_periods([]) is None
+        assert compile_opening_hours({"open_now": True, "periods": []}) is None
+        assert compile_opening_hours("") is None
+
+    def test_utc_minute_of_week(self):
+        # 2025-06-01 was a Sunday
+        assert utc_minute_of_week(datetime(2025, 6, 1, 0, 30, tzinfo=timezone.utc)) == 30
+        assert utc_minute_of_week(datetime(2025, 6, 7, 23, 59, tzinfo=timezone.utc)) == MINUTES_PER_WEEK - 1
+
+    def test_open_at_is_vectorized_and_dst_aware(self):
+        index = OpeningHoursIndex(
+            [compile_periods(WEEKDAYS), compile_periods(LATE_SATURDAY), compile_periods(ALWAYS_OPEN), None],
+            [-240, -240, None, -240],
+        )
+        # Monday 10:00 New York time, in summer (EDT) and winter (EST)
+        assert index.open_at(datetime(2025, 6, 2, 10, 0, tzinfo=NYC)).tolist() == [True, False, True, False]
+        assert index.open_at(datetime(2025, 1, 6, 10, 0, tzinfo=NYC)).tolist() == [True, False, True, False]
+        # Monday 08:30 New York time is closed even though it is 13:30 UTC
+        assert index.open_at(datetime(2025, 1, 6, 8, 30, tzinfo=NYC)).tolist() == [False, False, True, False]
+        # Sunday 01:00 New York time is inside the Saturday-night interval
+        assert index.open_at(datetime(2025, 6, 1, 1, 0, tzinfo=NYC)).tolist() == [False, True, True, False]
+
+    def test_foreign_offsets_are_kept(self):
+        # utc_offset +60 (not a New York offset): open 09:00-17:00 local = 08:00-16:00 UTC
+        index = OpeningHoursIndex([compile_periods(WEEKDAYS)], [60])
+        assert index.open_at(datetime(2025, 6, 2, 8, 30, tzinfo=timezone.utc)).tolist() == [True]
+        assert index.open_at(datetime(2025, 6, 2, 16, 30, tzinfo=timezone.utc)).tolist() == [False]
+
+    def test_parse_open_at(self):
+        assert parse_open_at(False, None) is None
+        assert parse_open_at(True, None).tzinfo is not None
+        assert parse_open_at(False, "2025-06-02T10:00").tzinfo == NYC
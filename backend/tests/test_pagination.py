@@ -0,0 +1,63 @@
+import pytest
+
+from ..app.services.pagination import (
+    clamp_limit,
+    decode_cursor,
+    encode_cursor,
+    next_cursor,
+    parse_fields,
+    parse_ids,
+    MAX_BATCH_IDS,
+    MAX_PAGE_SIZE,
+)
+
+
+class _Row:
+    def __init__(self, id, rating=None, user_ratings_total=None):
+        self.id = id
+        self.rating = rating
+        self.user_ratings_total = user_ratings_total
+
+
+class TestPagination:
+
+    def test_cursor_roundtrip(self):
+        cursor = encode_cursor("rating", 4.5, 17)
+        assert "=" not in cursor
+        assert decode_cursor(cursor, "rating") == (4.5, 17)
+
+    def test_cursor_rejects_other_sort_and_garbage(self):
+        cursor = encode_cursor("rating", 4.5, 17)
+        with pytest.raises(ValueError):
+            decode_cursor(cursor, "popularity")
+        with pytest.raises(ValueError):
+            decode_cursor("not-a-cursor", "rating")
+
+    def test_parse_fields_dedupes_and_validates(self):
+        assert parse_fields(None) is None
+        assert parse_fields("") is None
+        assert parse_fields("id, location,id") == ("id", "location")
+        with pytest.raises(ValueError):
+            parse_fields("id,password")
+
+    def test_parse_ids_keeps_order(self):
+        assert parse_ids(None) == []
+        assert parse_ids(["3,1", "2", " 1 ,"]) == [3, 1, 2]
+        assert parse_ids([5, 4, 5]) == [5, 4]
+        with pytest.raises(ValueError):
+            parse_ids(["1,abc"])
+        with pytest.raises(ValueError):
+            parse_ids(list(range(MAX_BATCH_IDS + 1)))
+
+    def test_clamp_limit(self):
+        assert clamp_limit(0) == 50
+        assert clamp_limit(-5) == 1
+        assert clamp_limit(10_000) == MAX_PAGE_SIZE
+
+    def test_next_cursor_only_when_more_rows(self):
+        rows = [_Row(1, rating=5.0), _Row(2, rating=None), _Row(3, rating=3.0)]
+        assert next_cursor(rows, "rating", 3) is None
+
+        cursor = next_cursor(rows, "rating", 2)
+        # Null ratings are coalesced to 0.0, matching the SQL ordering
+        assert decode_cursor(cursor, "rating") == (0.0, 2)
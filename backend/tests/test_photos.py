@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+
+from ..app.services.photos import PhotoCache, PhotoNotFound, cache_key, photo_reference
+
+URL = "https://maps.googleapis.com/maps/api/place/photo?maxwidth=800&photoreference=REF2&key=secret"
+
+
+class TestPhotos:
+
+    def test_photo_reference(self):
+        photos = [{"photo_reference": "REF1", "url": URL}]
+        assert photo_reference(photos, None, 0) == "REF1"
+        assert photo_reference(photos, None, 1) is None
+        # Legacy images only carry the URL
+        assert photo_reference(None, [{"url": URL}], 0) == "REF2"
+        assert photo_reference([], [], 0) is None
+        assert photo_reference(photos, None, -1) is None
+
+    def test_fetches_each_variant_once(self, tmp_path):
+        calls = []
+
+        async def fetch(ref, width):
+            calls.append((ref, width))
+            await asyncio.sleep(0.01)
+            return b"jpeg-" + str(width).encode(), "image/jpeg"
+
+        cache = PhotoCache(str(tmp_path), max_bytes=1024 * 1024, fetch=fetch)
+
+        async def run():
+            # Concurrent misses share one upstream fetch
+            results = await asyncio.gather(*(cache.get("REF", "thumb") for _ in range(5)))
+            assert {photo for photo, _ in results} == {(b"jpeg-160", "image/jpeg")}
+            assert (await cache.get("REF", "thumb"))[0] == (b"jpeg-160", "image/jpeg")
+            assert (await cache.get("REF", "full"))[0][0] == b"jpeg-1600"
+
+        asyncio.run(run())
+        assert calls == [("REF", 160), ("REF", 1600)]
+        assert cache.hits == 1
+        assert cache_key("REF", "thumb") in cache.cache
+
+    def test_unknown_variant_and_failed_fetch(self, tmp_path):
+        async def fetch(ref, width):
+            raise PhotoNotFound("404")
+
+        cache = PhotoCache(str(tmp_path), fetch=fetch)
+
+        async def run():
+            with pytest.raises(ValueError):
+                await cache.get("REF", "huge")
+            with pytest.raises(PhotoNotFound):
+                await cache.get("REF", "card")
+
+        asyncio.run(run())
+        assert cache_key("REF", "card") not in cache.cache
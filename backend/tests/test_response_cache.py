@@ -0,0 +1,46 @@
+from ..app.services.response_cache import ResponseCache, etag_matches, make_etag
+
+
+class TestResponseCache:
+
+    def test_lru_evicts_least_recently_used(self):
+        cache = ResponseCache(max_entries=2, max_bytes=1024)
+        cache.set("a", b"1", ttl=60)
+        cache.set("b", b"2", ttl=60)
+        assert cache.get("a").body == b"1"  # touch a so b is the oldest
+        cache.set("c", b"3", ttl=60)
+
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        assert cache.get("c") is not None
+
+    def test_byte_bound_and_oversized_bodies(self):
+        cache = ResponseCache(max_entries=10, max_bytes=10)
+        cache.set("a", b"x" * 6, ttl=60)
+        cache.set("b", b"y" * 6, ttl=60)
+        assert cache.get("a") is None
+        assert cache.get("b") is not None
+
+        cache.set("huge", b"z" * 11, ttl=60)
+        assert cache.get("huge") is None
+
+    def test_expired_entries_are_dropped(self):
+        cache = ResponseCache()
+        cache.set("a", b"1", ttl=-1)
+        assert cache.get("a") is None
+        assert len(cache) == 0
+
+    def test_invalidate_clears_everything(self):
+        cache = ResponseCache()
+        cache.set("a", b"1", ttl=60)
+        cache.invalidate()
+        assert cache.get("a") is None
+
+    def test_etag_is_strong_and_matches_lists(self):
+        etag = make_etag("v1|/attractions?limit=10")
+        assert etag.startswith('"') and not etag.startswith('W/')
+        assert etag == make_etag("v1|/attractions?limit=10")
+        assert etag != make_etag("v2|/attractions?limit=10")
+        assert etag_matches(f'"other", {etag}', etag)
+        assert etag_matches("*", etag)
+        assert not etag_matches(None, etag)
@@ -0,0 +1,51 @@
+import json
+
+from ..app.services.serialization import FragmentCache, encode_attractions, fragment_cache
+
+
+class _Attraction:
+    def __init__(self, id, location, last_updated):
+        self.id = id
+        self.location = location
+        self.last_updated = last_updated
+        self.calls = 0
+
+    def __json__(self, fields=None):
+        self.calls += 1
+        data = {"id": self.id, "location": self.location, "last_updated": self.last_updated}
+        return {k: data[k] for k in (fields or data)}
+
+
+class TestSerialization:
+
+    def setup_method(self):
+        fragment_cache.clear()
+
+    def test_encode_attractions_matches_json(self):
+        rows = [_Attraction(1, "Central Park", "2025-01-01"), _Attraction(2, "Café Grumpy", None)]
+        assert json.loads(encode_attractions(rows)) == [r.__json__() for r in rows]
+        assert encode_attractions([]) == b"[]"
+
+    def test_fragments_are_reused_until_last_updated_changes(self):
+        row = _Attraction(1, "Central Park", "2025-01-01")
+        encode_attractions([row])
+        encode_attractions([row])
+        assert row.calls == 1
+
+        row.last_updated = "2025-02-01"
+        row.location = "Central Park NYC"
+        assert json.loads(encode_attractions([row]))[0]["location"] == "Central Park NYC"
+        assert row.calls == 2
+
+    def test_projection_is_part_of_the_key(self):
+        row = _Attraction(1, "Central Park", "2025-01-01")
+        assert json.loads(encode_attractions([row], ("id",))) == [{"id": 1}]
+        assert json.loads(encode_attractions([row])) == [row.__json__()]
+
+    def test_fragment_cache_is_bounded(self):
+        cache = FragmentCache(max_entries=2)
+        cache.set((1,), b"1")
+        cache.set((2,), b"2")
+        cache.set((3,), b"3")
+        assert cache.get((1,)) is None
+        assert len(cache) == 2
@@ -0,0 +1,105 @@
+import pytest
+
+from ..app.services.trending import SearchHits, TrendingIndex, group_keys
+
+HOUR = 3600.0
+
+GROUPS = {1: ("museum", "Midtown"), 2: ("park", "Midtown"), 3: ("museum", "Harlem")}
+
+
+def lookup(attraction_id):
+    return GROUPS.get(attraction_id, (None, None))
+
+
+class Clock:
+    def __init__(self, now=1_700_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class TestTrending:
+
+    def test_group_keys(self):
+        assert group_keys("museum", "Midtown") == ((None, None), ("museum", None), (None, "Midtown"), ("museum", "Midtown"))
+        assert group_keys(None, None) == ((None, None),)
+
+    def test_events_are_buffered_until_applied(self):
+        index = TrendingIndex(half_life_seconds=HOUR, clock=Clock())
+        index.record(1, "view")
+        assert index.trending() == []
+        changed = index.apply(lookup)
+        assert changed == {1: pytest.approx(1.0)}
+        assert index.trending() == [(1, pytest.approx(1.0))]
+
+    def test_scores_decay_with_half_life(self):
+        clock = Clock()
+        index = TrendingIndex(half_life_seconds=HOUR, clock=clock)
+        index.record(1, "check_in")
+        index.apply(lookup)
+        clock.now += HOUR
+        index.record(2, "view")
+        index.record(2, "view")
+        index.apply(lookup)
+        # check_in (5) decayed to 2.5 still beats two fresh views
+        assert index.trending() == [(1, pytest.approx(2.5)), (2, pytest.approx(2.0))]
+        clock.now += HOUR
+        assert index.trending() == [(1, pytest.approx(1.25)), (2, pytest.approx(1.0))]
+
+    def test_top_lists_per_category_and_vicinity(self):
+        index = TrendingIndex(half_life_seconds=HOUR, clock=Clock())
+        for attraction_id, views in ((1, 3), (2, 2), (3, 1)):
+            for _ in range(views):
+                index.record(attraction_id, "view")
+        index.apply(lookup)
+        assert [i for i, _ in index.trending()] == [1, 2, 3]
+        assert [i for i, _ in index.trending(category="museum")] == [1, 3]
+        assert [i for i, _ in index.trending(vicinity="Midtown")] == [1, 2]
+        assert [i for i, _ in index.trending("museum", "Harlem")] == [3]
+        assert index.trending(category="zoo") == []
+
+    def test_rebase_keeps_ranking_and_drops_dead_scores(self):
+        clock = Clock()
+        index = TrendingIndex(half_life_seconds=HOUR, clock=clock)
+        index.record(1, "view")
+        index.apply(lookup)
+        clock.now += 2 * HOUR
+        index.record(2, "check_in")
+        index.apply(lookup)
+        clock.now += 2 * HOUR
+        index.rebase(clock.now, lookup)
+        assert index.landmark == clock.now
+        assert index.trending() == [(2, pytest.approx(1.25)), (1, pytest.approx(1 / 16))]
+        clock.now += 4 * HOUR
+        index.rebase(clock.now, lookup)
+        assert [i for i, _ in index.trending()] == [2]
+
+    def test_load_restores_persisted_scores(self):
+        clock = Clock()
+        index = TrendingIndex(half_life_seconds=HOUR, clock=clock)
+        index.load([(1, 4.0, clock.now - HOUR)], lookup)
+        assert index.trending(category="museum") == [(1, pytest.approx(2.0))]
+
+    def test_ids_outside_the_catalog_are_dropped(self):
+        index = TrendingIndex(half_life_seconds=HOUR, clock=Clock())
+        index.record(1, "view")
+        index.record(99, "check_in")
+        assert index.apply(lambda i: GROUPS.get(i)) == {1: pytest.approx(1.0)}
+        assert index.trending() == [(1, pytest.approx(1.0))] and 99 not in index.scores
+
+        # An attraction removed from the catalog leaves the rankings on its next change
+        index.record(1, "view")
+        assert index.apply(lambda i: None) == {}
+        assert index.trending() == [] and index.trending(category="museum") == []
+
+    def test_unknown_kind(self):
+        with pytest.raises(ValueError):
+            TrendingIndex().record(1, "like")
+
+    def test_search_hits(self):
+        hits = SearchHits(max_entries=1)
+        hits.remember("Museums ", [1, 3])
+        assert hits.get("museums") == (1, 3)
+        hits.remember("parks", [2])
+        assert hits.get("museums") == ()